@@ -24,3 +24,16 @@ import pytest
 def pytest_addoption(parser):
     parser.addoption("--runslow", action="store_true",
                      help="run slow tests")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "slow: needs --runslow to run")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--runslow"):
+        return
+    skip = pytest.mark.skip(reason="need --runslow option to run")
+    for item in items:
+        if 'slow' in item.keywords:
+            item.add_marker(skip)
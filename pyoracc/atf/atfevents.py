@@ -0,0 +1,86 @@
+'''
+Copyright 2015, 2016 University College London.
+
+This file is part of PyORACC.
+
+PyORACC is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyORACC is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyORACC. If not, see <http://www.gnu.org/licenses/>.
+'''
+
+
+from .atflex import AtfLexer
+from .atfyacc import AtfParser
+from .atffile import _reset_lexer, _text_blocks
+
+
+class AtfHandler(object):
+    """
+    Receives parse events from parse_events. Subclass and override the
+    callbacks of interest; the defaults do nothing.
+
+    Events are reported in document order as each construct is read. Nodes
+    handed to the callbacks are not attached to any parent, so they can be
+    dropped as soon as the callback returns.
+    """
+
+    def on_text(self, text):
+        """
+        Called at each &-line. Protocols which follow it (project, language,
+        links) are filled into the same Text object as they are read.
+        """
+
+    def on_object(self, obj):
+        """Called at each @object line, e.g. @tablet or @fragment a."""
+
+    def on_surface(self, surface):
+        """Called at each @surface line of the transliteration."""
+
+    def on_line(self, label, words, lemmas):
+        """
+        Called for each transliteration line once its #lem: line, if any,
+        has been read. For multilingual lines only the main line is reported.
+        """
+
+    def on_translation_line(self, line):
+        """Called for each line of a translation."""
+
+    def on_state(self, state):
+        """Called for each $-line describing the state of the object."""
+
+    def on_ruling(self, ruling):
+        """Called for each $-line describing a ruling."""
+
+    def on_comment(self, comment):
+        """Called for each # comment and #CHECK line."""
+
+
+def parse_events(content, handler):
+    """
+    Parse ATF, reporting what is read to handler (an AtfHandler) instead of
+    building a Text tree.
+
+    content may be a string or an open file; a file is read one text block at
+    a time so memory use does not depend on its length.
+    """
+    lexer = AtfLexer().lexer
+    parser = AtfParser(handler=handler).parser
+    if hasattr(content, 'read'):
+        blocks = _text_blocks(content)
+    else:
+        blocks = [(content, 1)]
+    for block, lineno in blocks:
+        if not block.strip():
+            continue
+        if block[-1] != '\n':
+            block += "\n"
+        parser.parse(block, lexer=_reset_lexer(lexer, lineno))
@@ -18,8 +18,13 @@ along with PyORACC. If not, see <http://www.gnu.org/licenses/>.
 '''
 
 
+from bisect import bisect_left, bisect_right
+import codecs
 from .atflex import AtfLexer
 from .atfyacc import AtfParser
+from .atfsource import SourceSnapshot, _parts
+from ..model.composite import Composite
+from ..model.text import Text
 from mako.template import Template
 
 
@@ -27,19 +32,204 @@ class AtfFile(object):
 
     template = Template("${text.serialize()}")
 
-    def __init__(self, content):
+    def __init__(self, content, include=None, spans=False, lossless=False,
+                 lexer=None, parser=None):
+        """
+        Parse content. include optionally restricts the model to the listed
+        kinds of node (see AtfParser.projections), e.g. {'lines', 'lemmas'}.
+        With spans, each node's span records the offsets and line numbers
+        it was parsed from, so content[node.span.start:node.span.end] is
+        its source.
+        lossless implies spans, and makes serialize() copy the source of every
+        node not changed since parsing, so an unedited file round-trips
+        exactly.
+        lexer and parser optionally give a lexer and parser to use rather than
+        building new ones, e.g. to share one warm pair between many files.
+        The parser must have been built with the same include and spans.
+        """
         self.content = content
+        self.include = include
+        self.spans = spans or lossless
+        self.lossless = lossless
+        self.lexer = lexer
+        self.parser = parser
+        self.parse()
+
+    def parse(self):
+        content = self.content
         if content[-1] != '\n':
             content += "\n"
-        lexer = AtfLexer().lexer
-        parser = AtfParser().parser
-        self.text = parser.parse(content, lexer=lexer)
+        if self.parser is None:
+            lexer = AtfLexer().lexer
+            parser = AtfParser(include=self.include, spans=self.spans).parser
+        else:
+            # Warmed up by an earlier edit
+            lexer, parser = _reset_lexer(self.lexer), self.parser
+        self.text = parser.parse(content, lexer=lexer, tracking=self.spans)
+        self.snapshot = None
+        if self.lossless:
+            self.snapshot = SourceSnapshot(self.content, self.text)
+
+    def reparse(self, content):
+        old, self.content = self.content, content
+        try:
+            self.parse()
+        except Exception:
+            self.content = old
+            raise
+
+    def edit(self, offset, deleted, inserted):
+        """
+        Replace the deleted characters of the content from offset on with
+        inserted, and bring the model up to date.
+
+        For a composite parsed with spans only the texts the edit touches are
+        parsed again, so editing one text of a long composite takes about as
+        long as parsing that text. Texts after the edit keep their nodes, with
+        their spans moved. Otherwise the whole content is parsed again.
+
+        If the edited content does not parse the error is raised and the
+        content and model are left as they were.
+        """
+        if self.parser is None:
+            # Keep a parser for the edits to come
+            self.lexer = AtfLexer().lexer
+            self.parser = AtfParser(include=self.include,
+                                    spans=self.spans).parser
+        old = self.content
+        content = old[:offset] + inserted + old[offset + deleted:]
+        if not isinstance(self.text, Composite) or self.text.span is None:
+            return self.reparse(content)
+        texts = self.text.texts
+        # Each text's block runs from its &-line to the next one; the first
+        # also takes anything before it.
+        starts = [0] + [text.span.start for text in texts[1:]]
+        first = max(bisect_right(starts, offset) - 1, 0)
+        if first and starts[first] == offset:
+            # An insertion at the very start of a text may extend the one
+            # before it
+            first -= 1
+        last = max(bisect_left(starts, offset + deleted) - 1, first)
+        if last + 1 < len(texts) and starts[last + 1] == offset + deleted:
+            last += 1
+        start = starts[first]
+        end = starts[last + 1] if last + 1 < len(texts) else len(old)
+        delta = len(inserted) - deleted
+        lines = inserted.count('\n') - old.count('\n', offset,
+                                                 offset + deleted)
+        block = content[start:end + delta]
+        parsed = []
+        if block.strip():
+            if block[-1] != '\n':
+                block += "\n"
+            lineno = texts[first].span.first_line if first else 1
+            root = self.parser.parse(block,
+                                     lexer=_reset_lexer(self.lexer, lineno),
+                                     tracking=True)
+            if isinstance(root, Composite):
+                parsed = root.texts
+            elif isinstance(root, Text):
+                parsed = [root]
+            else:
+                parsed = None
+        if parsed is None or len(texts) - (last - first + 1) + \
+                len(parsed) < 2:
+            # No longer a composite: start again
+            return self.reparse(content)
+        for text in parsed:
+            _shift_spans(text, start, 0)
+        for text in texts[last + 1:]:
+            _shift_spans(text, delta, lines)
+        texts[first:last + 1] = parsed
+        self.text.span = self.text.span._replace(
+            start=texts[0].span.start, end=texts[-1].span.end,
+            first_line=texts[0].span.first_line,
+            last_line=texts[-1].span.last_line)
+        self.content = content
+        if self.lossless:
+            self.snapshot = SourceSnapshot(self.content, self.text)
 
     def __str__(self):
-        return AtfFile.template.render_unicode(**vars(self))
+        return self.serialize()
 
     def serialize(self):
-        return AtfFile.template.render_unicode(**vars(self))
+        if self.snapshot is not None:
+            return self.snapshot.serialize(self.text)
+        return AtfFile.template.render_unicode(text=self.text)
+
+
+def _shift_spans(node, offset, lines):
+    """Move the spans of node and everything below it."""
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        span = node.span
+        if span is not None:
+            node.span = span._replace(start=span.start + offset,
+                                      end=span.end + offset,
+                                      first_line=span.first_line + lines,
+                                      last_line=span.last_line + lines)
+        stack.extend(_parts(node))
+
+
+def _reset_lexer(lexer, lineno=1):
+    """
+    Put a lexer back in its initial state so that it can be reused for a new
+    piece of input.
+    """
+    lexer.begin('INITIAL')
+    lexer.lexstatestack = []
+    lexer.lineno = lineno
+    return lexer
+
+
+def _text_blocks(stream):
+    """
+    Split a stream of ATF lines into text blocks, each starting at an &-line.
+    Anything before the first &-line is kept with the first block.
+    Yields pairs of the block content and the line number it starts on.
+    """
+    block = []
+    start = 1
+    seen_text = False
+    for lineno, line in enumerate(stream, 1):
+        if lineno == 1:
+            line = line.lstrip(u'\ufeff')
+        if line.startswith('&'):
+            if seen_text:
+                yield u''.join(block), start
+                block = []
+                start = lineno
+            seen_text = True
+        block.append(line)
+    if block:
+        yield u''.join(block), start
+
+
+def iter_texts(path_or_stream):
+    """
+    Parse an ATF file one text at a time, yielding each Text as soon as its
+    block has been read. Only the block currently being parsed is held in
+    memory, so this works on volume files of any size.
+
+    path_or_stream may be a filename or an open file yielding unicode lines.
+    """
+    if hasattr(path_or_stream, 'read'):
+        stream = path_or_stream
+    else:
+        stream = codecs.open(path_or_stream, encoding='utf-8-sig')
+    lexer = AtfLexer().lexer
+    parser = AtfParser().parser
+    try:
+        for content, lineno in _text_blocks(stream):
+            if not content.strip():
+                continue
+            if content[-1] != '\n':
+                content += "\n"
+            yield parser.parse(content, lexer=_reset_lexer(lexer, lineno))
+    finally:
+        if stream is not path_or_stream:
+            stream.close()
 
 
 def _debug_lex_and_yac_file(file, debug=0, skipinvalid=False):
@@ -205,6 +205,7 @@ class AtfLexer(object):
         r'^\s*\.\s*[\n\r]'
         # A line with just a dot, occurs in brm_4_19 at the end
         t.type = "NEWLINE"
+        t.lexer.lineno += t.value.count("\n")
         return t
 
     # In the base state, a newline doesn't change state
@@ -450,6 +451,7 @@ class AtfLexer(object):
 
     @lex.TOKEN(translation_regex)
     def t_parallel_interlinear_ID(self, t):
+        t.lexer.lineno += t.value.count("\n")
         t.value = t.value.strip()
         t.value = t.value.replace("\r ", "\r")
         t.value = t.value.replace("\n ", "\n")
@@ -0,0 +1,415 @@
+'''
+Copyright 2015, 2016 University College London.
+
+This file is part of PyORACC.
+
+PyORACC is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyORACC is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyORACC. If not, see <http://www.gnu.org/licenses/>.
+
+A Language Server Protocol server for ATF, talking JSON-RPC over stdin and
+stdout. Run as
+
+    python -m pyoracc.atf.atfserver
+
+It publishes parse errors as diagnostics, outlines texts, objects and
+surfaces as document symbols, and goes to definition between a
+transliteration line and the translation lines with the same label.
+'''
+
+
+from bisect import bisect_right
+import json
+import sys
+
+from .atffile import AtfFile
+from .atflex import AtfLexer
+from .atfyacc import AtfParser
+from ..model.composite import Composite
+from ..model.line import Line
+from ..model.link_reference import LinkReference
+from ..model.multilingual import Multilingual
+from ..model.oraccobject import OraccObject
+from ..model.translation import Translation
+from ..model.visitor import walk
+
+
+# LSP constants
+FULL_SYNC = 1
+INCREMENTAL_SYNC = 2
+ERROR_SEVERITY = 1
+ERROR_MESSAGE = 1
+NAMESPACE_SYMBOL = 3
+OBJECT_SYMBOL = 19
+METHOD_NOT_FOUND = -32601
+INTERNAL_ERROR = -32603
+
+
+def _units(text):
+    """Length of text in UTF-16 code units, as LSP counts characters."""
+    return len(text) + sum(1 for char in text if ord(char) > 0xFFFF)
+
+
+class Document(object):
+    """
+    An open document: its current content and the last parse of it.
+    Edits are applied to the parse incrementally while it is valid.
+    lexer and parser, if given, are used for every parse of it.
+    """
+
+    def __init__(self, uri, content, lexer=None, parser=None):
+        self.uri = uri
+        self.content = content
+        self.lexer = lexer
+        self.parser = parser
+        self.atf = None
+        self.error = None
+        self.starts = None
+        self.parse()
+
+    def parse(self):
+        self.atf = None
+        self.error = None
+        if self.content.strip():
+            try:
+                self.atf = AtfFile(self.content, spans=True,
+                                   lexer=self.lexer, parser=self.parser)
+            except (SyntaxError, IndexError, AttributeError) as error:
+                self.error = error
+
+    def change(self, start, end, inserted):
+        """Replace the content between offsets start and end."""
+        self.starts = None
+        content = self.content[:start] + inserted + self.content[end:]
+        if self.atf is None or not content.strip():
+            self.content = content
+            return self.parse()
+        try:
+            self.atf.edit(start, end - start, inserted)
+        except (SyntaxError, IndexError, AttributeError) as error:
+            self.atf = None
+            self.error = error
+        self.content = content
+
+    def line_starts(self):
+        if self.starts is None:
+            self.starts = [0]
+            position = self.content.find('\n')
+            while position >= 0:
+                self.starts.append(position + 1)
+                position = self.content.find('\n', position + 1)
+        return self.starts
+
+    def offset(self, position):
+        """Offset into the content of an LSP position."""
+        starts = self.line_starts()
+        line = position['line']
+        if line >= len(starts):
+            return len(self.content)
+        start = starts[line]
+        character = position['character']
+        offset = start
+        while character > 0 and offset < len(self.content) and \
+                self.content[offset] != '\n':
+            character -= _units(self.content[offset])
+            offset += 1
+        return offset
+
+    def position(self, offset):
+        """LSP position of an offset into the content."""
+        line = bisect_right(self.line_starts(), offset) - 1
+        start = self.starts[line]
+        return {'line': line,
+                'character': _units(self.content[start:offset])}
+
+    def range(self, span):
+        return {'start': self.position(span.start),
+                'end': self.position(span.end)}
+
+    def diagnostics(self):
+        if self.error is None:
+            return []
+        line = max((getattr(self.error, 'lineno', None) or 1) - 1, 0)
+        line = min(line, len(self.line_starts()) - 1)
+        end = self.content.find('\n', self.starts[line])
+        if end < 0:
+            end = len(self.content)
+        message = getattr(self.error, 'msg', None) or str(self.error)
+        return [{'range': {'start': {'line': line, 'character': 0},
+                           'end': self.position(end)},
+                 'severity': ERROR_SEVERITY,
+                 'source': 'pyoracc',
+                 'message': message}]
+
+    def texts(self):
+        if self.atf is None:
+            return []
+        if isinstance(self.atf.text, Composite):
+            return self.atf.text.texts
+        return [self.atf.text]
+
+    def symbols(self, node):
+        """
+        Document symbols for the objects, surfaces and translations below
+        node. Nodes the parser added without a source of their own, such as
+        a default tablet, are skipped in favour of their children.
+        """
+        symbols = []
+        for child in getattr(node, 'children', []):
+            if isinstance(child, Translation):
+                name = u'@translation'
+            elif isinstance(child, OraccObject):
+                name = u'@' + child.objecttype
+                if getattr(child, 'name', None):
+                    name += u' ' + child.name
+            else:
+                continue
+            children = self.symbols(child)
+            if child.span is None:
+                symbols.extend(children)
+                continue
+            symbols.append(self.symbol(name, OBJECT_SYMBOL, child.span,
+                                       children))
+        return symbols
+
+    def symbol(self, name, kind, span, children, detail=None):
+        symbol = {'name': name,
+                  'kind': kind,
+                  'range': self.range(span),
+                  'selectionRange': self.range(span._replace(
+                      end=self.content.find('\n', span.start)
+                      if span.last_line > span.first_line else span.end)),
+                  'children': children}
+        if detail:
+            symbol['detail'] = detail
+        return symbol
+
+    def text_symbols(self):
+        return [self.symbol(text.code or u'text', NAMESPACE_SYMBOL,
+                            text.span, self.symbols(text),
+                            text.description)
+                for text in self.texts() if text.span is not None]
+
+    def definitions(self, offset):
+        """
+        The lines with the same label as the line at offset, on the other
+        side of the transliteration and its translations.
+        """
+        for text in self.texts():
+            if text.span is None or \
+                    not text.span.start <= offset <= text.span.end:
+                continue
+            lines = list(_lines(text))
+            for line, translating in lines:
+                if line.span is not None and \
+                        line.span.start <= offset <= line.span.end:
+                    if translating and isinstance(line.label, LinkReference):
+                        # Labelled translations name the surface too
+                        return [_main_line(other) for other in
+                                text.labels().reference(line.label)
+                                if _main_line(other).span is not None]
+                    key = _label_key(line)
+                    return [other for other, other_translating in lines
+                            if other_translating != translating and
+                            other.span is not None and
+                            _label_key(other) == key]
+        return []
+
+
+def _lines(node):
+    """
+    Yield the transliteration and translation lines below node, each with
+    whether it is in a translation.
+    """
+    ancestors = []
+    for child in walk(node, _is_line, ancestors):
+        if type(child) is Multilingual:
+            child = child.lines.get(None)
+        if isinstance(child, Line):
+            yield child, any(type(ancestor) is Translation
+                             for ancestor in ancestors)
+
+
+def _main_line(node):
+    if type(node) is Multilingual:
+        return node.lines[None]
+    return node
+
+
+def _is_line(node):
+    return isinstance(node, (Line, Multilingual))
+
+
+def _label_key(line):
+    """
+    The label to match a line on. Labeled translations refer to their
+    transliteration line by a reference ending in its label.
+    """
+    if isinstance(line.label, LinkReference):
+        return line.label.label[-1] if line.label.label else None
+    return line.label
+
+
+class AtfServer(object):
+    """
+    Serves LSP requests read from instream, writing responses and
+    notifications to outstream. Both are binary streams.
+    """
+
+    def __init__(self, instream, outstream):
+        self.instream = instream
+        self.outstream = outstream
+        self.documents = {}
+        self.shutting_down = False
+        self.methods = {
+            'initialize': self.initialize,
+            'shutdown': self.shutdown,
+            'textDocument/didOpen': self.did_open,
+            'textDocument/didChange': self.did_change,
+            'textDocument/didClose': self.did_close,
+            'textDocument/documentSymbol': self.document_symbol,
+            'textDocument/definition': self.definition,
+        }
+        # Build the lexer and load the parse tables once, up front, and share
+        # them between all documents and every parse of them
+        self.lexer = AtfLexer().lexer
+        self.parser = AtfParser(spans=True).parser
+
+    def read(self):
+        """Read one message, or return None at the end of the input."""
+        length = None
+        while True:
+            header = self.instream.readline()
+            if not header:
+                return None
+            header = header.decode('ascii').strip()
+            if not header:
+                if length is not None:
+                    break
+                continue
+            name, _, value = header.partition(':')
+            if name.strip().lower() == 'content-length':
+                length = int(value)
+        return json.loads(self.instream.read(length).decode('utf-8'))
+
+    def send(self, message):
+        message['jsonrpc'] = '2.0'
+        body = json.dumps(message).encode('utf-8')
+        self.outstream.write("Content-Length: {}\r\n\r\n".format(
+            len(body)).encode('ascii'))
+        self.outstream.write(body)
+        self.outstream.flush()
+
+    def serve(self):
+        """
+        Handle messages until exit, returning the exit code LSP asks for.
+        """
+        while True:
+            message = self.read()
+            if message is None or message.get('method') == 'exit':
+                return 0 if self.shutting_down else 1
+            self.handle(message)
+
+    def handle(self, message):
+        method = self.methods.get(message.get('method'))
+        if 'id' not in message:
+            # A notification, or a response to us, which we never ask for.
+            # There is no one to answer, so errors are logged to the client
+            if method is not None:
+                try:
+                    method(message.get('params', {}))
+                except Exception as error:
+                    self.send({'method': 'window/logMessage',
+                               'params': {'type': ERROR_MESSAGE,
+                                          'message': u"{} failed: {!r}".format(
+                                              message.get('method'), error)}})
+            return
+        if method is None:
+            self.send({'id': message['id'],
+                       'error': {'code': METHOD_NOT_FOUND,
+                                 'message': u"Unknown method {}".format(
+                                     message.get('method'))}})
+            return
+        try:
+            result = method(message.get('params', {}))
+        except Exception as error:
+            self.send({'id': message['id'],
+                       'error': {'code': INTERNAL_ERROR,
+                                 'message': str(error)}})
+            return
+        self.send({'id': message['id'], 'result': result})
+
+    def publish(self, document):
+        self.send({'method': 'textDocument/publishDiagnostics',
+                   'params': {'uri': document.uri,
+                              'diagnostics': document.diagnostics()}})
+
+    def initialize(self, params):
+        return {'capabilities': {
+                    'textDocumentSync': {'openClose': True,
+                                         'change': INCREMENTAL_SYNC},
+                    'documentSymbolProvider': True,
+                    'definitionProvider': True},
+                'serverInfo': {'name': 'pyoracc'}}
+
+    def shutdown(self, params):
+        self.shutting_down = True
+        self.documents = {}
+        return None
+
+    def did_open(self, params):
+        item = params['textDocument']
+        document = Document(item['uri'], item['text'], self.lexer,
+                            self.parser)
+        self.documents[item['uri']] = document
+        self.publish(document)
+
+    def did_change(self, params):
+        document = self.documents[params['textDocument']['uri']]
+        for change in params['contentChanges']:
+            if 'range' in change:
+                document.change(document.offset(change['range']['start']),
+                                document.offset(change['range']['end']),
+                                change['text'])
+            else:
+                document.content = change['text']
+                document.starts = None
+                document.parse()
+        self.publish(document)
+
+    def did_close(self, params):
+        document = self.documents.pop(params['textDocument']['uri'], None)
+        if document is not None:
+            document.error = None
+            self.publish(document)
+
+    def document_symbol(self, params):
+        document = self.documents[params['textDocument']['uri']]
+        return document.text_symbols()
+
+    def definition(self, params):
+        document = self.documents[params['textDocument']['uri']]
+        offset = document.offset(params['position'])
+        return [{'uri': document.uri, 'range': document.range(line.span)}
+                for line in document.definitions(offset)]
+
+
+def main():
+    if sys.version_info[0] == 2:
+        instream, outstream = sys.stdin, sys.stdout
+    else:
+        instream, outstream = sys.stdin.buffer, sys.stdout.buffer
+    sys.exit(AtfServer(instream, outstream).serve())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+'''
+Copyright 2015, 2016 University College London.
+
+This file is part of PyORACC.
+
+PyORACC is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyORACC is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyORACC. If not, see <http://www.gnu.org/licenses/>.
+'''
+
+
+from operator import itemgetter
+
+
+def _is_node(value):
+    return hasattr(value, '__dict__') and not isinstance(value, type)
+
+
+def _parts(node):
+    """
+    The model nodes held by node's attributes: children, notes, links,
+    the lines of a Multilingual and so on.
+    """
+    for value in vars(node).values():
+        if isinstance(value, list):
+            for item in value:
+                if _is_node(item):
+                    yield item
+        elif isinstance(value, dict):
+            for item in value.values():
+                if _is_node(item):
+                    yield item
+        elif _is_node(value):
+            yield value
+
+
+def _summary(value):
+    if isinstance(value, list):
+        return tuple(_summary(item) for item in value)
+    if isinstance(value, dict):
+        return frozenset((key, _summary(item))
+                         for key, item in value.items())
+    if _is_node(value):
+        return id(value)
+    return value
+
+
+def _state(node):
+    """
+    A hash of node's own attributes, leaving out its span and private
+    caches. Sub-nodes count by identity only, so a change inside a child
+    changes the child's state, not its parent's.
+    """
+    return hash(tuple(sorted(((key, _summary(value))
+                              for key, value in vars(node).items()
+                              if key != 'span' and
+                              not key.startswith('_')),
+                             key=itemgetter(0))))
+
+
+class SourceSnapshot(object):
+    """
+    Remembers the state of every node of a parse with spans, so that nodes
+    which have not been changed since can be serialized by copying their
+    source. This is exact, keeping lines the model does not represent (such
+    as #atf: use and #key: protocols) and the original spacing, and much
+    faster than rendering templates.
+
+    Changed nodes, and nodes added since, are rendered with their template.
+    A node counts as changed if any of its own attributes differ, including
+    which children it has.
+    """
+
+    def __init__(self, source, root):
+        self.source = source
+        self.states = {}
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            self.states[id(node)] = _state(node)
+            stack.extend(_parts(node))
+
+    def changed(self, node):
+        return self.states.get(id(node)) != _state(node)
+
+    def serialize(self, root):
+        """
+        Serialize root, which should be the node the snapshot was taken of,
+        including whatever surrounds it in the source.
+        """
+        changed = []
+        if self.find_changes(root, changed):
+            return root.serialize()
+        regions = []
+        for node in changed:
+            span = node.span
+            regions.append((span.start, span.end,
+                            node.serialize().strip('\n')))
+            # The parser attaches some nodes to a parent whose span does
+            # not cover them, e.g. a translation to the last object of its
+            # text. The template renders them, so drop their source.
+            stack = list(_parts(node))
+            while stack:
+                part = stack.pop()
+                if part.span is None:
+                    stack.extend(_parts(part))
+                elif part.span.start >= span.end or \
+                        part.span.end <= span.start:
+                    regions.append((part.span.start, part.span.end, u''))
+        regions.sort(key=itemgetter(0))
+        pieces = []
+        position = 0
+        for start, end, text in regions:
+            if start < position:
+                continue
+            pieces.append(self.source[position:start])
+            pieces.append(text)
+            position = end
+        pieces.append(self.source[position:])
+        return u''.join(pieces)
+
+    def find_changes(self, node, changed):
+        """
+        Add the outermost changed nodes below node to changed. A changed
+        node without a span, such as the default tablet the parser adds when
+        a text starts with a surface, or a new node, has no source to
+        replace, so returns True for its nearest ancestor with a span to be
+        rendered instead.
+        """
+        if self.changed(node):
+            if node.span is None:
+                return True
+            changed.append(node)
+            return False
+        mark = len(changed)
+        for part in _parts(node):
+            if self.find_changes(part, changed):
+                if node.span is None:
+                    return True
+                del changed[mark:]
+                changed.append(node)
+                return False
+        return False
@@ -34,6 +34,7 @@ from ..model.oraccnamedobject import OraccNamedObject
 from ..model.oraccobject import OraccObject
 from ..model.ruling import Ruling
 from ..model.score import Score
+from ..model.span import Span
 from ..model.state import State
 from ..model.text import Text
 from ..model.translation import Translation
@@ -42,13 +43,65 @@ from ..model.translation import Translation
 class AtfParser(object):
     tokens = AtfLexer.tokens
 
-    def __init__(self, tabmodule='pyoracc.atf.parsetab'):
+    # The kinds of node which may be left out of the model by passing
+    # include to the constructor. Texts, objects and surfaces are always
+    # built. "lines" are transliteration lines; lines of translations are
+    # governed by "translations".
+    projections = frozenset(['lines', 'lemmas', 'translations', 'notes',
+                             'comments', 'links', 'states', 'rulings',
+                             'milestones'])
+
+    def __init__(self, tabmodule='pyoracc.atf.parsetab', handler=None,
+                 include=None, spans=False):
+        # With a handler (see atfevents.AtfHandler) constructs are reported
+        # to it as they are read and are not attached to their parents, so
+        # the parse does not build up a tree.
+        self.handler = handler
+        # With include, the grammar actions for any kind of node not listed
+        # return None instead of allocating it. The grammar is unchanged, so
+        # the same input is accepted or rejected either way.
+        if include is not None:
+            include = frozenset(include)
+            unknown = include - AtfParser.projections
+            if unknown:
+                raise ValueError("Unknown node kinds: {}".format(
+                                 ", ".join(sorted(unknown))))
+        self.include = include
+        # With spans, each node records where in the source it came from.
+        # The parser must then be run with tracking=True.
+        self.spans = spans
+        self.translating = False
         self.parser = yacc.yacc(module=self, tabmodule=tabmodule)
 
+    def excluded(self, kind):
+        return self.include is not None and kind not in self.include
+
+    def locate(self, p, n):
+        """
+        Record the source span of the node in p[n]. Spans run from the start
+        of the line the node's first token is on to the end of the line its
+        last token is on, excluding the newline.
+        """
+        if not self.spans or p[n] is None:
+            return
+        start, end = p.lexspan(n)
+        first, last = p.linespan(n)
+        data = p.lexer.lexdata
+        start = data.rfind('\n', 0, start) + 1
+        end = data.find('\n', end)
+        if end < 0:
+            end = len(data)
+        p[n].span = Span(start, end, first, last)
+
+    def keep(self, node):
+        """Should node be attached to its parent?"""
+        return node is not None and self.handler is None
+
     def p_document(self, p):
         """document : text
                     | object
                     | composite"""
+        self.locate(p, 1)
         p[0] = p[1]
 
     def p_codeline(self, p):
@@ -56,6 +109,9 @@ class AtfParser(object):
         p[0] = Text()
         p[0].code = p[2]
         p[0].description = p[4]
+        self.translating = False
+        if self.handler is not None:
+            self.handler.on_text(p[0])
 
     def p_project_statement(self, p):
         "project_statement : PROJECT ID newline"
@@ -106,20 +162,28 @@ class AtfParser(object):
 
     def p_link(self, p):
         "link : LINK DEF ID EQUALS ID EQUALS ID newline"
+        if self.excluded('links'):
+            return
         p[0] = Link(p[3], p[5], p[7])
 
     def p_link_source(self, p):
         "link : LINK SOURCE ID EQUALS ID newline"
         # Not documented but fairly common ca 600
         # texts in the full corpus
+        if self.excluded('links'):
+            return
         p[0] = Link(code=p[3], description=p[5])
 
     def p_link_parallel(self, p):
         "link : LINK PARALLEL ID EQUALS ID newline"
+        if self.excluded('links'):
+            return
         p[0] = Link(None, p[3], p[5])
 
     def p_include(self, p):
         "link : INCLUDE ID EQUALS ID newline"
+        if self.excluded('links'):
+            return
         p[0] = Link("Include", p[2], p[4])
 
     def p_language_protoocol(self, p):
@@ -132,8 +196,10 @@ class AtfParser(object):
 
     def p_text_link(self, p):
         "text : text link"
+        self.locate(p, 2)
         p[0] = p[1]
-        p[0].links.append(p[2])
+        if p[2] is not None:
+            p[0].links.append(p[2])
 
     def p_text_language(self, p):
         "text : text language_protocol"
@@ -142,13 +208,18 @@ class AtfParser(object):
 
     def p_text_object(self, p):
         """text : text object %prec OBJECT"""
+        self.locate(p, 2)
         p[0] = p[1]
-        p[0].children.append(p[2])
+        if self.keep(p[2]):
+            p[0].children.append(p[2])
 
     def p_text_surface(self, p):
         """text : text surface %prec OBJECT
                 | text translation %prec TRANSLATIONEND"""
+        self.locate(p, 2)
         p[0] = p[1]
+        if self.handler is not None:
+            return
         # Find the last object in the text
         # If there is none, append a tablet and use that
         # Default to a tablet
@@ -156,16 +227,23 @@ class AtfParser(object):
         # Has a default already been added?
         if not p[0].objects():
             p[0].children.append(OraccObject("tablet"))
-        p[0].objects()[-1].children.append(p[2])
+        # The default is made even if p[2] is left out, so that the objects
+        # and surfaces are the same as in a full parse
+        if p[2] is not None:
+            p[0].objects()[-1].children.append(p[2])
 
     def p_text_surface_element(self, p):
         """text : text surface_element %prec OBJECT"""
+        self.locate(p, 2)
         p[0] = p[1]
+        if self.handler is not None:
+            return
         if not p[0].objects():
             p[0].children.append(OraccObject("tablet"))
         # Default to obverse of a tablet
         p[0].objects()[-1].children.append(OraccObject("obverse"))
-        p[0].objects()[-1].children[0].children.append(p[2])
+        if p[2] is not None:
+            p[0].objects()[-1].children[0].children.append(p[2])
 
     def p_text_composite(self, p):
         """text : text COMPOSITE newline"""
@@ -174,23 +252,31 @@ class AtfParser(object):
 
     def p_text_text(self, p):
         """composite : text text"""
+        self.locate(p, 1)
+        self.locate(p, 2)
         # Text must be a composite
         p[0] = Composite()
         if not p[1].composite:
             # An implicit composite
             pass
-        p[0].texts.append(p[1])
-        p[0].texts.append(p[2])
+        if self.handler is None:
+            p[0].texts.append(p[1])
+            p[0].texts.append(p[2])
 
     def p_composite_text(self, p):
         """composite : composite text"""
+        self.locate(p, 2)
         # Text must be a composite
         p[0] = p[1]
-        p[0].texts.append(p[2])
+        if self.handler is None:
+            p[0].texts.append(p[2])
 
     def p_object_statement(self, p):
         """object_statement : object_specifier newline"""
         p[0] = p[1]
+        self.translating = False
+        if self.handler is not None:
+            self.handler.on_object(p[0])
 
     def p_flag(self, p):
         """ flag : HASH
@@ -239,12 +325,17 @@ class AtfParser(object):
     def p_object_surface(self, p):
         """object : object surface %prec SURFACE
               | object translation %prec TRANSLATIONEND """
+        self.locate(p, 2)
         p[0] = p[1]
-        p[0].children.append(p[2])
+        if self.keep(p[2]):
+            p[0].children.append(p[2])
 
     def p_object_surface_element(self, p):
         """object : object surface_element %prec SURFACE"""
+        self.locate(p, 2)
         p[0] = p[1]
+        if not self.keep(p[2]):
+            return
         # Default surface is obverse
         p[0].children.append(OraccObject("obverse"))
         p[0].children[0].children.append(p[2])
@@ -252,11 +343,14 @@ class AtfParser(object):
     def p_surface_statement(self, p):
         "surface_statement : surface_specifier newline"
         p[0] = p[1]
+        if self.handler is not None and not self.translating:
+            self.handler.on_surface(p[0])
 
     def p_surface_flag(self, p):
         "surface_specifier : surface_specifier flag"
         p[0] = p[1]
-        AtfParser.flag(p[0], p[2])
+        if p[0] is not None:
+            AtfParser.flag(p[0], p[2])
 
     def p_surface_nolabel(self, p):
         '''surface_specifier  : OBVERSE
@@ -265,6 +359,9 @@ class AtfParser(object):
                               | RIGHT
                               | TOP
                               | BOTTOM'''
+        # Surfaces of a translation which is being left out
+        if self.translating and self.excluded('translations'):
+            return
         p[0] = OraccObject(p[1])
 
     def p_surface_label(self, p):
@@ -273,6 +370,8 @@ class AtfParser(object):
                              | COLUMN ID
                              | SEAL ID
                              | HEADING ID'''
+        if self.translating and self.excluded('translations'):
+            return
         p[0] = OraccNamedObject(p[1], p[2])
 
     def p_surface(self, p):
@@ -286,6 +385,11 @@ class AtfParser(object):
                            | link_reference_statement %prec LINE
                            | milestone"""
         p[0] = p[1]
+        if self.handler is not None and p[1] is not None:
+            if isinstance(p[1], Line):
+                self.line_event(p[1])
+            elif isinstance(p[1], Multilingual):
+                self.line_event(p[1].lines[None])
 
     def p_dollar(self, p):
         """dollar          : ruling_statement
@@ -293,32 +397,45 @@ class AtfParser(object):
                            | strict_dollar_statement
                            | simple_dollar_statement"""
         p[0] = p[1]
+        if self.handler is not None and p[1] is not None:
+            if isinstance(p[1], Ruling):
+                self.handler.on_ruling(p[1])
+            else:
+                self.handler.on_state(p[1])
 
     def p_surface_line(self, p):
         """surface : surface surface_element"""
+        self.locate(p, 2)
         p[0] = p[1]
-        p[0].children.append(p[2])
+        if p[0] is not None and self.keep(p[2]):
+            p[0].children.append(p[2])
         # WE DO NOT YET HANDLE @M=DIVSION lines.
 
     def p_linelabel(self, p):
         "line_sequence : LINELABEL ID"
+        if self.excluded('translations' if self.translating else 'lines'):
+            return
         p[0] = Line(p[1])
         p[0].words.append(p[2])
 
     def p_scorelabel(self, p):
         "line_sequence : SCORELABEL ID"
+        if self.excluded('translations' if self.translating else 'lines'):
+            return
         p[0] = Line(p[1])
         p[0].words.append(p[2])
 
     def p_line_id(self, p):
         "line_sequence : line_sequence ID"
         p[0] = p[1]
-        p[0].words.append(p[2])
+        if p[0] is not None:
+            p[0].words.append(p[2])
 
     def p_line_reference(self, p):
         "line_sequence : line_sequence reference"
         p[0] = p[1]
-        p[0].references.append(p[2])
+        if p[0] is not None:
+            p[0].references.append(p[2])
 
     def p_line_statement(self, p):
         "line_statement : line_sequence newline"
@@ -331,17 +448,21 @@ class AtfParser(object):
     def p_line_lemmas(self, p):
         "line : line lemma_statement  "
         p[0] = p[1]
-        p[0].lemmas = p[2]
+        if p[0] is not None and p[2] is not None:
+            p[0].lemmas = p[2]
 
     def p_line_note(self, p):
         "line : line note_statement"
+        self.locate(p, 2)
         p[0] = p[1]
-        p[0].notes.append(p[2])
+        if p[0] is not None and p[2] is not None:
+            p[0].notes.append(p[2])
 
     def p_line_interlinear_translation(self, p):
         "line : line interlinear"
         p[0] = p[1]
-        p[0].translation = p[2]
+        if p[0] is not None and not self.excluded('translations'):
+            p[0].translation = p[2]
 
     def p_interlinear(self, p):
         "interlinear : TR ID newline"
@@ -353,8 +474,10 @@ class AtfParser(object):
 
     def p_line_link(self, p):
         "line : line link_reference_statement"
+        self.locate(p, 2)
         p[0] = p[1]
-        p[0].links.append(p[2])
+        if p[0] is not None and p[2] is not None:
+            p[0].links.append(p[2])
 
     def p_line_equalbrace(self, p):
         "line : line equalbrace_statement"
@@ -372,6 +495,11 @@ class AtfParser(object):
 
     def p_line_multilingual(self, p):
         "line : line multilingual %prec MULTI"
+        self.locate(p, 1)
+        self.locate(p, 2)
+        if p[1] is None or p[2] is None:
+            p[0] = p[1]
+            return
         p[0] = Multilingual()
         p[0].lines[None] = p[1]
         p[0].lines[p[2].label] = p[2]
@@ -381,17 +509,21 @@ class AtfParser(object):
 
     def p_multilingual_sequence(self, p):
         "multilingual_sequence : MULTILINGUAL ID "
+        if self.excluded('lines'):
+            return
         p[0] = Line(p[2][1:])  # Slice off the percent
 
     def p_multilingual_id(self, p):
         "multilingual_sequence : multilingual_sequence ID"
         p[0] = p[1]
-        p[0].words.append(p[2])
+        if p[0] is not None:
+            p[0].words.append(p[2])
 
     def p_multilingual_reference(self, p):
         "multilingual_sequence : multilingual_sequence reference"
         p[0] = p[1]
-        p[0].references.append(p[2])
+        if p[0] is not None:
+            p[0].references.append(p[2])
 
     def p_multilingual_statement(self, p):
         "multilingual_statement : multilingual_sequence newline"
@@ -404,20 +536,27 @@ class AtfParser(object):
     def p_multilingual_lemmas(self, p):
         "multilingual : multilingual lemma_statement "
         p[0] = p[1]
-        p[0].lemmas = p[2]
+        if p[0] is not None and p[2] is not None:
+            p[0].lemmas = p[2]
 
     def p_multilingual_note(self, p):
         "multilingual : multilingual note_statement "
+        self.locate(p, 2)
         p[0] = p[1]
-        p[0].notes.append(p[2])
+        if p[0] is not None and p[2] is not None:
+            p[0].notes.append(p[2])
 
     def p_multilingual_link(self, p):
         "multilingual : multilingual link_reference_statement "
+        self.locate(p, 2)
         p[0] = p[1]
-        p[0].links.append(p[2])
+        if p[0] is not None and p[2] is not None:
+            p[0].links.append(p[2])
 
     def p_lemma_list(self, p):
         "lemma_list : LEM ID"
+        if self.excluded('lemmas'):
+            return
         p[0] = [p[2]]
 
     def p_milestone(self, p):
@@ -426,6 +565,8 @@ class AtfParser(object):
 
     def p_milestone_name(self, p):
         "milestone_name : M EQUALS ID"
+        if self.excluded('milestones'):
+            return
         p[0] = Milestone(p[3])
 
     def p_milestone_brief(self, p):
@@ -437,12 +578,15 @@ class AtfParser(object):
                           | SIGNATURE
                           | SUMMARY
                           | WITNESSES"""
+        if self.excluded('milestones'):
+            return
         p[0] = Milestone(p[1])
 
     def p_lemma_list_lemma(self, p):
         "lemma_list : lemma_list lemma"
         p[0] = p[1]
-        p[0].append(p[2])
+        if p[0] is not None:
+            p[0].append(p[2])
 
     def p_lemma(self, p):
         "lemma : SEMICOLON"
@@ -467,6 +611,8 @@ class AtfParser(object):
                   | DOLLAR DOUBLE LINE RULING
                   | DOLLAR TRIPLE LINE RULING"""
 
+        if self.excluded('rulings'):
+            return
         counts = {
             'single': 1,
             'double': 2,
@@ -476,12 +622,15 @@ class AtfParser(object):
 
     def p_uncounted_ruling(self, p):
         "ruling : DOLLAR RULING"
+        if self.excluded('rulings'):
+            return
         p[0] = Ruling(1)
 
     def p_flagged_ruling(self, p):
         "ruling : ruling flag"
         p[0] = p[1]
-        AtfParser.flag(p[0], p[2])
+        if p[0] is not None:
+            AtfParser.flag(p[0], p[2])
 
     def p_note(self, p):
         """note_statement : note_sequence newline"""
@@ -489,17 +638,21 @@ class AtfParser(object):
 
     def p_note_sequence(self, p):
         """note_sequence : NOTE """
+        if self.excluded('notes'):
+            return
         p[0] = Note()
 
     def p_note_sequence_content(self, p):
         """note_sequence : note_sequence ID"""
         p[0] = p[1]
-        p[0].content += p[2]
+        if p[0] is not None:
+            p[0].content += p[2]
 
     def p_note_sequence_link(self, p):
         """note_sequence : note_sequence reference"""
         p[0] = p[1]
-        p[0].references.append(p[2])
+        if p[0] is not None:
+            p[0].references.append(p[2])
 
     def p_reference(self, p):
         "reference : HAT ID HAT"
@@ -511,6 +664,8 @@ class AtfParser(object):
 
     def p_loose_dollar(self, p):
         "loose_dollar_statement : DOLLAR PARENTHETICALID newline"
+        if self.excluded('states'):
+            return
         p[0] = State(loose=p[2])
 
     def p_strict_dollar_statement(self, p):
@@ -526,6 +681,8 @@ class AtfParser(object):
     def p_simple_dollar(self, p):
         """simple_dollar_statement : DOLLAR ID newline
                                    | DOLLAR state newline"""
+        if self.excluded('states'):
+            return
         p[0] = State(p[2])
 
     def p_plural_state_description(self, p):
@@ -535,6 +692,8 @@ class AtfParser(object):
                                     | ID REFERENCE state"""
         # The singular case is an exception: "1 line broken" is semantically
         # the same as "2 lines broken"
+        if self.excluded('states'):
+            return
         p[0] = State(p[3], p[2], p[1])
 
     def p_plural_state_description_unquantified(self, p):
@@ -542,6 +701,8 @@ class AtfParser(object):
         """
         # This should probably not be allowed but is happening in the corpus
         # i.e. ""$ columns broken"
+        if self.excluded('states'):
+            return
         p[0] = State(p[2], p[1])
 
     def p_plural_state_description_unquantified_reverse(self, p):
@@ -549,21 +710,28 @@ class AtfParser(object):
         """
         # This should probably not be allowed but is happening in the corpus
         # i.e. ""$ blank lines"
+        if self.excluded('states'):
+            return
         p[0] = State(p[1], p[2])
 
     def p_plural_state_range_description(self, p):
         """plural_state_description : ID MINUS ID plural_scope state"""
+        if self.excluded('states'):
+            return
         p[0] = State(p[5], p[4], p[1] + "-" + p[3])
 
     def p_qualified_state_description(self, p):
         "plural_state_description : qualification plural_state_description"
         p[0] = p[2]
-        p[0].qualification = p[1]
+        if p[0] is not None:
+            p[0].qualification = p[1]
 
     def p_singular_state_desc(self, p):
         """singular_state_desc : singular_scope state
                                | REFERENCE state
                                | REFERENCE ID state"""
+        if self.excluded('states'):
+            return
         text = list(p)
         p[0] = State(text[-1], " ".join(text[1:-1]))
 
@@ -573,18 +741,23 @@ class AtfParser(object):
     # section $-lines
     def p_state_singular_desc(self, p):
         """singular_state_desc : state singular_scope"""
+        if self.excluded('states'):
+            return
         text = list(p)
         p[0] = State(state=text[1], scope=" ".join(text[2:]))
 
     def p_singular_state_desc_brief(self, p):
         """brief_state_desc : brief_quantifier state"""
+        if self.excluded('states'):
+            return
         text = list(p)
         p[0] = State(text[-1], None, text[1])
 
     def p_partial_state_description(self, p):
         """singular_state_desc : partial_quantifier singular_state_desc"""
         p[0] = p[2]
-        p[0].extent = p[1]
+        if p[0] is not None:
+            p[0].extent = p[1]
 
     def p_state(self, p):
         """state : BLANK
@@ -633,6 +806,9 @@ class AtfParser(object):
         """translation_statement : TRANSLATION PARALLEL ID PROJECT newline
                                  | TRANSLATION LABELED ID PROJECT newline
         """
+        self.translating = True
+        if self.excluded('translations'):
+            return
         p[0] = Translation()
 
     def p_translation(self, p):
@@ -646,18 +822,28 @@ class AtfParser(object):
 
     def p_translation_surface(self, p):
         "translation : translation surface %prec SURFACE"
+        self.locate(p, 2)
         p[0] = p[1]
-        p[0].children.append(p[2])
+        if p[0] is not None and self.keep(p[2]):
+            p[0].children.append(p[2])
 
     def p_translation_labeledline(self, p):
         "translation : translation translationlabeledline %prec LINE"
+        self.locate(p, 2)
         p[0] = p[1]
-        p[0].children.append(p[2])
+        if p[0] is None:
+            return
+        if self.handler is None:
+            p[0].children.append(p[2])
+        else:
+            self.handler.on_translation_line(p[2])
 
     def p_translation_dollar(self, p):
         "translation : translation dollar"
+        self.locate(p, 2)
         p[0] = p[1]
-        p[0].children.append(p[2])
+        if p[0] is not None and self.keep(p[2]):
+            p[0].children.append(p[2])
 
     def p_translationlabelledline(self, p):
         """translationlabeledline : translationlabel NEWLINE
@@ -665,11 +851,15 @@ class AtfParser(object):
                                   | translationlabel CLOSER
                                   | translationrangelabel CLOSER
         """
+        if p[1] is None:
+            return
         p[0] = Line(p[1])
 
     def p_translationlabel(self, p):
         """translationlabel : LABEL
                             | OPENR"""
+        if self.excluded('translations'):
+            return
         p[0] = LinkReference("||", None)
         if p[1][-1] == "+":
             p[0].plus = True
@@ -678,7 +868,8 @@ class AtfParser(object):
         """translationlabel : translationlabel ID
                             | translationlabel REFERENCE"""
         p[0] = p[1]
-        p[0].label.append(p[2])
+        if p[0] is not None:
+            p[0].label.append(p[2])
 
     def p_translationrangelabel(self, p):
         "translationrangelabel : translationlabel MINUS"
@@ -688,40 +879,49 @@ class AtfParser(object):
         """translationrangelabel : translationrangelabel ID
                                  | translationrangelabel REFERENCE"""
         p[0] = p[1]
-        p[0].rangelabel.append(p[2])
+        if p[0] is not None:
+            p[0].rangelabel.append(p[2])
 
     def p_translationlabeledline_reference(self, p):
         """translationlabeledline : translationlabeledline reference
                                   | translationlabeledline reference newline"""
         p[0] = p[1]
-        p[0].references.append(p[2])
+        if p[0] is not None:
+            p[0].references.append(p[2])
 
     def p_translationlabeledline_note(self, p):
         "translationlabeledline : translationlabeledline note_statement"
+        self.locate(p, 2)
         p[0] = p[1]
-        p[0].notes.append(p[2])
+        if p[0] is not None and p[2] is not None:
+            p[0].notes.append(p[2])
 
     def p_translationlabelledline_content(self, p):
         """translationlabeledline : translationlabeledline ID
                                   | translationlabeledline ID newline"""
         p[0] = p[1]
-        p[0].words.append(p[2])
+        if p[0] is not None:
+            p[0].words.append(p[2])
 
     def p_linkreference(self, p):
         "link_reference : link_operator ID"
+        if self.excluded('links'):
+            return
         p[0] = LinkReference(p[1], p[2])
 
     def p_linkreference_label(self, p):
         """link_reference : link_reference ID
                           | link_reference COMMA ID"""
         p[0] = p[1]
-        p[0].label.append(list(p)[-1])
+        if p[0] is not None:
+            p[0].label.append(list(p)[-1])
 
     def p_link_range_reference_label(self, p):
         """link_range_reference : link_range_reference ID
                                 | link_range_reference COMMA ID"""
         p[0] = p[1]
-        p[0].rangelabel.append(list(p)[-1])
+        if p[0] is not None:
+            p[0].rangelabel.append(list(p)[-1])
 
     def p_link_range_reference(self, p):
         """link_range_reference : link_reference MINUS"""
@@ -741,42 +941,62 @@ class AtfParser(object):
 
     def p_comment(self, p):
         "comment : COMMENT ID NEWLINE"
+        if self.excluded('comments'):
+            return
         p[0] = Comment(p[2])
+        if self.handler is not None:
+            self.handler.on_comment(p[0])
 
     def p_check(self, p):
         "comment : CHECK ID NEWLINE"
+        if self.excluded('comments'):
+            return
         p[0] = Comment(p[2])
         p[0].check = True
+        if self.handler is not None:
+            self.handler.on_comment(p[0])
 
     def p_surface_comment(self, p):
         "surface : surface comment %prec LINE"
+        self.locate(p, 2)
         p[0] = p[1]
-        p[0].children.append(p[2])
+        if p[0] is not None and self.keep(p[2]):
+            p[0].children.append(p[2])
 
     def p_translationline_comment(self, p):
         "translationlabeledline : translationlabeledline comment"
+        self.locate(p, 2)
         p[0] = p[1]
-        p[0].notes.append(p[2])
+        if p[0] is not None and p[2] is not None:
+            p[0].notes.append(p[2])
 
     def p_translation_comment(self, p):
         "translation : translation comment %prec LINE"
+        self.locate(p, 2)
         p[0] = p[1]
-        p[0].children.append(p[2])
+        if p[0] is not None and self.keep(p[2]):
+            p[0].children.append(p[2])
 
     def p_text_comment(self, p):
         "text : text comment %prec SURFACE"
+        self.locate(p, 2)
         p[0] = p[1]
-        p[0].children.append(p[2])
+        if self.keep(p[2]):
+            p[0].children.append(p[2])
 
     def p_line_comment(self, p):
         "line : line comment"
+        self.locate(p, 2)
         p[0] = p[1]
-        p[0].notes.append(p[2])
+        if p[0] is not None and p[2] is not None:
+            p[0].notes.append(p[2])
 
     def p_multilingual_comment(self, p):
         "multilingual : multilingual comment"
+        self.locate(p, 2)
         p[0] = p[1]
-        p[0].notes.append(p[2])
+        if p[0] is not None and p[2] is not None:
+            p[0].notes.append(p[2])
 
     def p_score(self, p):
         "score : SCORE ID ID NEWLINE"
@@ -788,6 +1008,7 @@ class AtfParser(object):
 
     def p_text_score(self, p):
         "text : text score"
+        self.locate(p, 2)
         p[0] = p[1]
         p[0].score = p[2]
 
@@ -824,6 +1045,12 @@ class AtfParser(object):
         # HIGH precedence
     )
 
+    def line_event(self, line):
+        if self.translating:
+            self.handler.on_translation_line(line)
+        else:
+            self.handler.on_line(line.label, line.words, line.lemmas)
+
     def p_error(self, p):
         formatstring = u"PyOracc could not parse token '{}'.".format(p)
         valuestring = p.value
@@ -0,0 +1,531 @@
+'''
+Copyright 2015, 2016 University College London.
+
+This file is part of PyORACC.
+
+PyORACC is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyORACC is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyORACC. If not, see <http://www.gnu.org/licenses/>.
+
+Benchmarks comparing alternative ways of doing the same job over a corpus.
+Run as
+
+    python -m pyoracc.benchmark <name> <corpus directory>
+'''
+
+
+from __future__ import print_function
+import codecs
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import time
+
+try:
+    import copyreg
+except ImportError:
+    # Python 2
+    import copy_reg as copyreg
+
+try:
+    import tracemalloc
+except ImportError:
+    # Not available on Python 2 or Jython: report times only
+    tracemalloc = None
+
+from .atf.atffile import AtfFile, iter_texts
+from .atf.atfevents import AtfHandler, parse_events
+from .export import binary, sqlite
+from .index.codes import CodeIndex
+from .index.signs import SignIndex, _line_signs, parse_query
+from .index.signs import matches as sign_matches
+from .index.words import WordIndex, _text_lines
+from .model.composite import Composite
+from .model.corpus import Corpus, RunStats, atf_paths, iter_corpus, schedule
+from .model.labels import keyed_lines
+from .model.line import Line
+from .model.link_reference import LinkReference
+from .model.text import Text
+from .model.visitor import Visitor, walk
+
+
+def _atf_contents(source):
+    """
+    Read every ATF file below source that parses, returning their contents.
+    """
+    contents = []
+    for dirpath, _, files in os.walk(source):
+        for file in sorted(files):
+            if file.endswith('.atf'):
+                path = os.path.join(dirpath, file)
+                content = codecs.open(path, encoding='utf-8-sig').read()
+                try:
+                    AtfFile(content)
+                except (SyntaxError, IndexError, AttributeError):
+                    continue
+                contents.append(content)
+    return contents
+
+
+def _measure(func, *args):
+    """
+    Run func twice, once for its wall clock time and once tracing memory,
+    returning the time in seconds and the peak allocation in bytes.
+    """
+    start = time.time()
+    func(*args)
+    elapsed = time.time() - start
+    peak = None
+    if tracemalloc is not None:
+        tracemalloc.start()
+        func(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return elapsed, peak
+
+
+def _report(name, elapsed, peak):
+    if peak is None:
+        print("{:<24} {:8.3f} s".format(name, elapsed))
+    else:
+        print("{:<24} {:8.3f} s {:10.1f} kB".format(name, elapsed,
+                                                    peak / 1024.0))
+
+
+class _CountingHandler(AtfHandler):
+    def __init__(self):
+        self.words = 0
+
+    def on_line(self, label, words, lemmas):
+        self.words += len(words)
+
+
+def _count_words_tree(node):
+    count = 0
+    children = getattr(node, 'texts', getattr(node, 'children', []))
+    for child in children:
+        count += len(getattr(child, 'words', []))
+        count += _count_words_tree(child)
+    return count
+
+
+def bench_events(source):
+    """
+    Count transliterated words with the event parser and by building the
+    whole tree.
+    """
+    contents = _atf_contents(source)
+
+    def tree():
+        for content in contents:
+            _count_words_tree(AtfFile(content).text)
+
+    def events():
+        for content in contents:
+            parse_events(content, _CountingHandler())
+
+    _report("tree", *_measure(tree))
+    _report("events", *_measure(events))
+
+
+def bench_projection(source):
+    """
+    Parse with the full model and with only lines and lemmas.
+    """
+    contents = _atf_contents(source)
+
+    def parse(include):
+        for content in contents:
+            AtfFile(content, include=include)
+
+    _report("full model", *_measure(parse, None))
+    _report("lines and lemmas", *_measure(parse, {'lines', 'lemmas'}))
+
+
+def bench_roundtrip(source):
+    """
+    Serialize parsed files with the templates and losslessly, after changing
+    the first word of every file.
+    """
+    contents = []
+    for content in _atf_contents(source):
+        try:
+            AtfFile(content).serialize()
+        except AttributeError:
+            # Not every node has a template yet
+            continue
+        contents.append(content)
+    template = [AtfFile(content) for content in contents]
+    lossless = [AtfFile(content, lossless=True) for content in contents]
+    for atf_file in template + lossless:
+        _change_first_word(atf_file.text)
+
+    def serialize(atf_files):
+        for atf_file in atf_files:
+            atf_file.serialize()
+
+    _report("template", *_measure(serialize, template))
+    _report("lossless", *_measure(serialize, lossless))
+
+
+def _change_first_word(node):
+    words = getattr(node, 'words', None)
+    if words:
+        words[0] = words[0].upper()
+        return True
+    children = getattr(node, 'texts', getattr(node, 'children', []))
+    return any(_change_first_word(child) for child in children)
+
+
+def bench_lookup(source):
+    """
+    Find the last text of the corpus by parsing files until its code turns
+    up, and with Corpus.get.
+    """
+    corpus = Corpus(source=source, lazy=True)
+    corpus.index = CodeIndex.build(source)
+    paths = sorted(corpus.index.paths)
+    code = corpus.index.paths[paths[-1]][-1]
+
+    def scan():
+        for path in paths:
+            try:
+                for text in iter_texts(os.path.join(source, path)):
+                    if text.code == code:
+                        return text
+            except (SyntaxError, IndexError, AttributeError):
+                continue
+
+    _report("scan", *_measure(scan))
+    _report("index", *_measure(corpus.get, code))
+
+
+def bench_words(source):
+    """
+    Answer word, AND, OR and phrase queries by scanning every line of the
+    parsed corpus and from a WordIndex.
+    """
+    texts = []
+    for content in _atf_contents(source):
+        text = AtfFile(content).text
+        texts.extend(text.texts if hasattr(text, 'texts') else [text])
+    index = WordIndex()
+    start = time.time()
+    for text in texts:
+        index.add(text)
+    print("Indexed in {:.3f} s".format(time.time() - start))
+    queries = [('find', u'ina'),
+               ('any_of', [u'ina', u'ana']),
+               ('all_of', [u'ina', u'\u0161a\u2082']),
+               ('phrase', [u'a-na', u'{d}UTU'])]
+
+    def matches(kind, argument, words):
+        if kind == 'find':
+            return argument in words
+        if kind == 'any_of':
+            return any(word in words for word in argument)
+        if kind == 'all_of':
+            return all(word in words for word in argument)
+        return any(words[position:position + len(argument)] == argument
+                   for position in range(len(words)))
+
+    def scan():
+        for kind, argument in queries:
+            [line for text in texts for _, _, line in _text_lines(text)
+             if matches(kind, argument, line.words)]
+
+    def lookup():
+        for kind, argument in queries:
+            getattr(index, kind)(argument)
+
+    _report("scan", *_measure(scan))
+    _report("index", *_measure(lookup))
+
+
+def bench_signs(source):
+    """
+    Search for sign sequences by checking every line of the parsed corpus,
+    with its signs split beforehand, and with a SignIndex.
+    """
+    index = SignIndex()
+    sequences = []
+    for content in _atf_contents(source):
+        text = AtfFile(content).text
+        index.add(text)
+        for text in (text.texts if hasattr(text, 'texts') else [text]):
+            sequences.extend(_line_signs(line)
+                             for _, _, line in _text_lines(text))
+    queries = [u'a-na', u'a-na {d}utu', u'ina {d}*', u'/\u0161u[\u2082]?/-nu']
+
+    def scan():
+        for query in queries:
+            pattern = parse_query(query)
+            [sequence for sequence in sequences
+             if sign_matches(pattern, sequence)]
+
+    def lookup():
+        for query in queries:
+            index.search(query)
+
+    _report("scan", *_measure(scan))
+    _report("index", *_measure(lookup))
+
+
+class _WordCounter(Visitor):
+    def __init__(self):
+        self.words = 0
+
+    def visit_line(self, line):
+        self.words += len(line.words)
+
+
+def bench_walk(source):
+    """
+    Count words in parsed texts by recursing over children, with walk() and
+    with a Visitor.
+    """
+    texts = [AtfFile(content).text for content in _atf_contents(source)]
+
+    def recursive():
+        return sum(_count_words_tree(text) for text in texts)
+
+    def walked():
+        return sum(len(node.words) for text in texts for node in walk(text)
+                   if isinstance(node, Line))
+
+    def visitor():
+        counter = _WordCounter()
+        for text in texts:
+            counter.visit(text)
+        return counter.words
+
+    _report("recursive", *_measure(recursive))
+    _report("walk", *_measure(walked))
+    _report("visitor", *_measure(visitor))
+
+
+def bench_labels(source):
+    """
+    Find the transliteration line each labelled translation line refers to,
+    by scanning the text's lines and with its label index.
+    """
+    corpus = Corpus(source=source, lazy=True)
+    references = []
+    for code in corpus.codes():
+        try:
+            text = corpus.get(code)
+        except (SyntaxError, IndexError, AttributeError):
+            continue
+        references.extend((text, tuple(node.label.label))
+                          for node in walk(text) if isinstance(node, Line) and
+                          isinstance(node.label, LinkReference))
+    print("{} references".format(len(references)))
+
+    def scan():
+        for text, label in references:
+            for keys, line in keyed_lines(text):
+                if label in keys:
+                    break
+
+    def index():
+        for text, label in references:
+            text._labels = None
+        for text, label in references:
+            text.line(label)
+
+    _report("scan", *_measure(scan))
+    _report("index", *_measure(index))
+
+
+def bench_binary(source):
+    """
+    Get the model of every file back by parsing it, by loading it from the
+    binary format and by unpickling it, and compare their sizes.
+    """
+    contents = _atf_contents(source)
+    texts = [AtfFile(content).text for content in contents]
+    saved = [binary.dumps(text) for text in texts]
+    pickled = [pickle.dumps(text, pickle.HIGHEST_PROTOCOL) for text in texts]
+    for name, data in (("ATF", [content.encode('utf-8')
+                                for content in contents]),
+                       ("binary", saved), ("pickle", pickled)):
+        print("{:<24} {:10.1f} kB".format(
+            name, sum(len(item) for item in data) / 1024.0))
+
+    def parse():
+        for content in contents:
+            AtfFile(content)
+
+    def load():
+        for data in saved:
+            binary.loads(data)
+
+    def unpickle():
+        for data in pickled:
+            pickle.loads(data)
+
+    _report("parse", *_measure(parse))
+    _report("binary", *_measure(load))
+    _report("pickle", *_measure(unpickle))
+
+
+def _node_by_node(node):
+    # How pickle saves an object by default: its class, then its __dict__
+    return copyreg.__newobj__, (type(node),), node.__dict__
+
+
+def bench_pickle(source):
+    """
+    Pickle and unpickle the parsed texts flattened, as they are, and node by
+    node, as by default, and compare the sizes.
+    """
+    texts = [AtfFile(content).text for content in _atf_contents(source)]
+
+    def roundtrip():
+        for text in texts:
+            pickle.loads(pickle.dumps(text, pickle.HIGHEST_PROTOCOL))
+
+    for name in ("flat", "node by node"):
+        if name == "node by node":
+            copyreg.dispatch_table[Text] = _node_by_node
+            copyreg.dispatch_table[Composite] = _node_by_node
+        try:
+            size = sum(len(pickle.dumps(text, pickle.HIGHEST_PROTOCOL))
+                       for text in texts)
+            print("{:<24} {:10.1f} kB".format(name, size / 1024.0))
+            _report(name, *_measure(roundtrip))
+        finally:
+            copyreg.dispatch_table.pop(Text, None)
+            copyreg.dispatch_table.pop(Composite, None)
+
+
+def _makespan(batches, times, workers):
+    # Each batch goes to whichever worker is free first
+    free = [0.0] * workers
+    for batch in batches:
+        free.sort()
+        free[0] += sum(times[path] for path in batch)
+    return max(free)
+
+
+def bench_schedule(source, workers=4):
+    """
+    Time parsing each file, then work out how long a run on workers
+    processes takes handing out files in file order and as schedule() does,
+    against the total work divided between the workers. No run can take
+    less than the largest file.
+    """
+    stats = RunStats()
+    for _ in iter_corpus(source, processes=1, stats=stats):
+        pass
+    paths = atf_paths(source)
+    ideal = sum(stats.times.values()) / workers
+    print("{:<24} {:8.3f} s".format("ideal", ideal))
+    print("{:<24} {:8.3f} s".format("largest file",
+                                    max(stats.times.values())))
+    for name, batches in (
+            ("file order", [[path] for path in paths]),
+            ("largest first", schedule(paths, workers))):
+        makespan = _makespan(batches, stats.times, workers)
+        print("{:<24} {:8.3f} s {:5.1f}% busy".format(
+            name, makespan, 100.0 * ideal / makespan))
+
+
+def bench_transport(source):
+    """
+    Parse the corpus in worker processes, handing the texts back through
+    pipes and in shared memory, and time receiving them and then using
+    every one.
+    """
+    for name, shared in (("pipe", False), ("shared memory", True)):
+        start = time.time()
+        files = [texts for _, texts, _ in iter_corpus(source, shared=shared)]
+        received = time.time() - start
+        for texts in files:
+            for text in texts:
+                pass
+        print("{:<24} {:8.3f} s received {:8.3f} s used".format(
+            name, received, time.time() - start))
+
+
+def bench_sqlite(source):
+    """
+    Load the rows of the parsed corpus into an SQLite database file with one
+    INSERT a row and a commit a text, and with the bulk loader. Both number
+    the rows as the loader does and build the indexes at the end, so only
+    the way rows are inserted differs.
+    """
+    rows = []
+    for content in _atf_contents(source):
+        rows.append(sqlite.text_rows(AtfFile(content).text))
+    count = sum(len(table) for text in rows for table in text.values())
+    directory = tempfile.mkdtemp()
+    runs = []
+
+    def filename():
+        runs.append(None)
+        return os.path.join(directory, '{}.db'.format(len(runs)))
+
+    def single():
+        loader = sqlite.SqliteLoader(filename(), batch_size=count + 1)
+        for text in rows:
+            loader.add_rows(text)
+            with loader.db:
+                for name, width, _ in sqlite.TABLES:
+                    for row in loader.pending[name]:
+                        loader.db.execute("INSERT INTO {} VALUES ({})".format(
+                            name, ", ".join(["?"] * width)), row)
+                    loader.pending[name] = []
+        loader.finish()
+        loader.close()
+
+    def bulk():
+        loader = sqlite.SqliteLoader(filename())
+        for text in rows:
+            loader.add_rows(text)
+        loader.finish()
+        loader.close()
+
+    try:
+        for name, func in (("single", single), ("bulk", bulk)):
+            elapsed, peak = _measure(func)
+            _report(name, elapsed, peak)
+            print("{:<24} {:8.0f} rows/s".format("", count / elapsed))
+    finally:
+        shutil.rmtree(directory)
+
+
+benchmarks = {
+    'binary': bench_binary,
+    'events': bench_events,
+    'labels': bench_labels,
+    'lookup': bench_lookup,
+    'pickle': bench_pickle,
+    'projection': bench_projection,
+    'signs': bench_signs,
+    'sqlite': bench_sqlite,
+    'transport': bench_transport,
+    'words': bench_words,
+    'roundtrip': bench_roundtrip,
+    'schedule': bench_schedule,
+    'walk': bench_walk,
+}
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3 or sys.argv[1] not in benchmarks:
+        print("Usage: python -m pyoracc.benchmark {} <corpus directory>"
+              .format("|".join(sorted(benchmarks))))
+        sys.exit(1)
+    benchmarks[sys.argv[1]](sys.argv[2])
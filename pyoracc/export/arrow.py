@@ -0,0 +1,220 @@
+'''
+Copyright 2015, 2016 University College London.
+
+This file is part of PyORACC.
+
+PyORACC is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyORACC is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyORACC. If not, see <http://www.gnu.org/licenses/>.
+
+Columnar export of texts, lines and tokens as Arrow record batches and
+Parquet files, which needs pyarrow. Export a corpus with
+
+    python -m pyoracc.export.arrow <corpus directory> <output directory>
+
+which writes texts.parquet, lines.parquet and tokens.parquet. Lines are
+numbered from 0 within their text; (code, line) joins the tables.
+'''
+
+
+from __future__ import print_function
+import os
+import sys
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    # Optional: the rows can still be built, but not written
+    pyarrow = None
+
+from ..index.words import _text_lines
+from ..model.composite import Composite
+from ..model.corpus import iter_corpus
+
+
+# The columns of each table, with their Arrow types
+TEXTS = [('code', 'string'), ('project', 'string'), ('language', 'string'),
+         ('description', 'string'), ('lines', 'int32'), ('words', 'int32')]
+LINES = [('code', 'string'), ('line', 'int32'), ('object', 'string'),
+         ('surface', 'string'), ('label', 'string'), ('words', 'int32'),
+         ('translation', 'string')]
+TOKENS = [('code', 'string'), ('line', 'int32'), ('position', 'int32'),
+          ('word', 'string'), ('lemma', 'string'), ('broken', 'bool'),
+          ('damaged', 'bool'), ('uncertain', 'bool'), ('corrected', 'bool'),
+          ('collated', 'bool')]
+
+TABLES = [('texts', TEXTS), ('lines', LINES), ('tokens', TOKENS)]
+
+# Rows in each record batch, and so in each Parquet row group
+BATCH_SIZE = 65536
+
+
+def word_flags(word):
+    """
+    Whether a transliterated word is broken, damaged, uncertain, corrected
+    or collated, as marked by [ ], # or half brackets, ?, ! and *.
+    """
+    return (u'[' in word or u']' in word,
+            u'#' in word or u'\u2e22' in word or u'\u2e23' in word,
+            u'?' in word, u'!' in word, u'*' in word)
+
+
+def text_rows(text):
+    """
+    The rows of text in each table, as lists of tuples in the order of
+    TABLES, for the texts of a Composite together.
+    """
+    texts, lines, tokens = [], [], []
+    for text in (text.texts if isinstance(text, Composite) else [text]):
+        words, start = 0, len(lines)
+        for number, (obj, surface, line) in enumerate(_text_lines(text)):
+            lemmas = line.lemmas
+            count = 0
+            for position, word in enumerate(line.words):
+                if not word:
+                    continue
+                lemma = lemmas[position] if position < len(lemmas) else None
+                tokens.append((text.code, number, position, word,
+                               lemma.strip() if lemma else None) +
+                              word_flags(word))
+                count += 1
+            lines.append((text.code, number, obj, surface, line.label, count,
+                          line.translation))
+            words += count
+        texts.append((text.code, text.project, text.language,
+                      text.description, len(lines) - start, words))
+    return texts, lines, tokens
+
+
+def schemas():
+    """The Arrow schema of each table, by name."""
+    return dict((name, pyarrow.schema([(column, pyarrow.type_for_alias(kind))
+                                       for column, kind in columns]))
+                for name, columns in TABLES)
+
+
+class BatchBuilder(object):
+    """
+    Collects rows column by column and turns them into Arrow record batches
+    of at most batch_size rows, so that a corpus of any size can be
+    converted in bounded memory.
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE):
+        if pyarrow is None:
+            raise ImportError("pyarrow is needed for Arrow and Parquet export")
+        self.batch_size = batch_size
+        self.schemas = schemas()
+        self.columns = dict((name, [[] for _ in columns])
+                            for name, columns in TABLES)
+
+    def add(self, rows):
+        """
+        Add the rows text_rows gives for a text, yielding the name and batch
+        of each table which has filled up.
+        """
+        for (name, _), table in zip(TABLES, rows):
+            columns = self.columns[name]
+            for row in table:
+                for column, value in zip(columns, row):
+                    column.append(value)
+                if len(columns[0]) >= self.batch_size:
+                    yield name, self._batch(name)
+                    columns = self.columns[name]
+
+    def flush(self):
+        """Yield the name and batch of each table with rows left."""
+        for name, _ in TABLES:
+            if self.columns[name][0]:
+                yield name, self._batch(name)
+
+    def _batch(self, name):
+        schema = self.schemas[name]
+        columns = self.columns[name]
+        self.columns[name] = [[] for _ in columns]
+        return pyarrow.RecordBatch.from_arrays(
+            [pyarrow.array(values, type=field.type)
+             for values, field in zip(columns, schema)], schema=schema)
+
+
+def record_batches(texts, batch_size=BATCH_SIZE):
+    """
+    Yield the table name and Arrow RecordBatch of each batch of the rows of
+    texts, an iterable of Text or Composite such as iter_texts gives.
+    """
+    builder = BatchBuilder(batch_size)
+    for text in texts:
+        for batch in builder.add(text_rows(text)):
+            yield batch
+    for batch in builder.flush():
+        yield batch
+
+
+def _write(batches, directory):
+    writers = {}
+    counts = dict((name, 0) for name, _ in TABLES)
+    try:
+        for name, batch in batches:
+            if name not in writers:
+                writers[name] = pyarrow.parquet.ParquetWriter(
+                    os.path.join(directory, name + '.parquet'), batch.schema)
+            writers[name].write_table(pyarrow.Table.from_batches([batch]))
+            counts[name] += batch.num_rows
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return counts
+
+
+def write_parquet(texts, directory, batch_size=BATCH_SIZE):
+    """
+    Write the texts, lines and tokens tables of texts to Parquet files in
+    directory, one row group for each batch of at most batch_size rows.
+    Returns the number of rows in each table.
+    """
+    return _write(record_batches(texts, batch_size), directory)
+
+
+def export(source, directory, processes=None, batch_size=BATCH_SIZE):
+    """
+    Write the .atf files below source to Parquet files in directory as
+    write_parquet does. The rows are built in parallel as by iter_corpus,
+    and written in file order. Returns the number of rows in each table,
+    and the paths of the files which failed to parse, each with its error.
+    """
+    failures = []
+
+    def batches(builder):
+        for path, results, error in iter_corpus(source, text_rows,
+                                                processes):
+            for rows in results:
+                for batch in builder.add(rows):
+                    yield batch
+            if error is not None:
+                failures.append((path, error))
+        for batch in builder.flush():
+            yield batch
+
+    counts = _write(batches(BatchBuilder(batch_size)), directory)
+    return counts, failures
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print("Usage: python -m pyoracc.export.arrow <source> <directory>")
+        sys.exit(1)
+    counts, failed = export(sys.argv[1], sys.argv[2])
+    for name, _ in TABLES:
+        print(name, counts[name])
+    for path, error in failed:
+        print("Failed to parse", path, ":", error)
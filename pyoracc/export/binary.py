@@ -0,0 +1,260 @@
+'''
+Copyright 2015, 2016 University College London.
+
+This file is part of PyORACC.
+
+PyORACC is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyORACC is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyORACC. If not, see <http://www.gnu.org/licenses/>.
+
+A compact binary format for parsed texts, to save and load the model
+without parsing the ATF again. A file is:
+
+    the magic bytes ORACCBIN and the format version
+    the number of distinct strings, then each as its UTF-8 length and bytes
+    the root value
+
+where each value is a tag byte followed by its contents; strings are
+written as their number in the string table, and nodes as the number of
+their class in layout.CLASSES followed by the values of their fields, as
+listed in layout.FIELDS, and their span. Integers are unsigned LEB128 varints.
+'''
+
+
+import struct
+
+from ..model.layout import CLASSES, LAYOUTS, NUMBERS
+from ..model.span import Span
+
+
+MAGIC = b'ORACCBIN'
+
+# Bump this whenever layout.VERSION or the encoding change
+VERSION = 1
+
+_NONE, _FALSE, _TRUE, _INT, _NEGATIVE, _STRING, _LIST, _DICT, _FLOAT, \
+    _SPAN, _TUPLE, _STRINGS = range(12)
+# Tags from here on are nodes, by class number
+_NODE = 16
+
+_float = struct.Struct('<d')
+
+try:
+    _text_type = unicode
+except NameError:
+    _text_type = str
+
+
+def _varint(value, out):
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+class _Writer(object):
+    def __init__(self):
+        self.out = bytearray()
+        self.strings = {}
+
+    def value(self, value):
+        out = self.out
+        kind = type(value)
+        if kind is _text_type or kind is str:
+            out.append(_STRING)
+            _varint(self.string(value), out)
+        elif value is None:
+            out.append(_NONE)
+        elif kind is bool:
+            out.append(_TRUE if value else _FALSE)
+        elif kind is list:
+            if all(type(item) is _text_type or type(item) is str
+                   for item in value):
+                # Lists of words and lemmas, the most common, are written
+                # without a tag for each
+                out.append(_STRINGS)
+                _varint(len(value), out)
+                for item in value:
+                    _varint(self.string(item), out)
+            else:
+                out.append(_LIST)
+                _varint(len(value), out)
+                for item in value:
+                    self.value(item)
+        elif kind is Span:
+            out.append(_SPAN)
+            for number in value:
+                _varint(number, out)
+        elif kind is tuple:
+            out.append(_TUPLE)
+            _varint(len(value), out)
+            for item in value:
+                self.value(item)
+        elif kind is dict:
+            out.append(_DICT)
+            _varint(len(value), out)
+            for key in value:
+                self.value(key)
+                self.value(value[key])
+        elif isinstance(value, (int, type(2 ** 64))):
+            if value >= 0:
+                out.append(_INT)
+                _varint(value, out)
+            else:
+                out.append(_NEGATIVE)
+                _varint(-value - 1, out)
+        elif kind is float:
+            out.append(_FLOAT)
+            out.extend(_float.pack(value))
+        else:
+            self.node(value)
+
+    def string(self, value):
+        number = self.strings.get(value)
+        if number is None:
+            number = self.strings[value] = len(self.strings)
+        return number
+
+    def node(self, node):
+        number = NUMBERS.get(type(node))
+        if number is None:
+            raise TypeError(u"Cannot save {} in the binary format"
+                            .format(type(node).__name__))
+        self.out.append(_NODE + number)
+        for name in LAYOUTS[number][1]:
+            self.value(getattr(node, name))
+        self.value(getattr(node, 'span', None))
+
+
+class _Reader(object):
+    def __init__(self, data, position, strings):
+        self.data = data
+        self.position = position
+        self.strings = strings
+
+    def varint(self):
+        data = self.data
+        position = self.position
+        byte = data[position]
+        position += 1
+        result = byte & 0x7f
+        shift = 7
+        while byte & 0x80:
+            byte = data[position]
+            position += 1
+            result |= (byte & 0x7f) << shift
+            shift += 7
+        self.position = position
+        return result
+
+    def value(self):
+        tag = self.data[self.position]
+        self.position += 1
+        if tag == _STRING:
+            return self.strings[self.varint()]
+        if tag >= _NODE:
+            cls, fields = LAYOUTS[tag - _NODE]
+            node = cls.__new__(cls)
+            values = node.__dict__
+            for name in fields:
+                values[name] = self.value()
+            span = self.value()
+            if span is not None:
+                values['span'] = span
+            return node
+        if tag == _STRINGS:
+            strings = self.strings
+            return [strings[self.varint()] for _ in range(self.varint())]
+        if tag == _LIST:
+            return [self.value() for _ in range(self.varint())]
+        if tag == _NONE:
+            return None
+        if tag == _FALSE:
+            return False
+        if tag == _TRUE:
+            return True
+        if tag == _INT:
+            return self.varint()
+        if tag == _NEGATIVE:
+            return -self.varint() - 1
+        if tag == _DICT:
+            result = {}
+            for _ in range(self.varint()):
+                key = self.value()
+                result[key] = self.value()
+            return result
+        if tag == _SPAN:
+            return Span(self.varint(), self.varint(), self.varint(),
+                        self.varint())
+        if tag == _TUPLE:
+            return tuple([self.value() for _ in range(self.varint())])
+        if tag == _FLOAT:
+            self.position += _float.size
+            return _float.unpack_from(
+                bytes(self.data[self.position - _float.size:self.position]))[0]
+        raise ValueError(u"Unknown tag {} at byte {}".format(
+            tag, self.position - 1))
+
+
+def dumps(node):
+    """node, a Text or Composite, as bytes in the binary format."""
+    writer = _Writer()
+    writer.node(node)
+    out = bytearray(MAGIC)
+    _varint(VERSION, out)
+    strings = sorted(writer.strings, key=writer.strings.get)
+    _varint(len(strings), out)
+    for string in strings:
+        encoded = string.encode('utf-8')
+        _varint(len(encoded), out)
+        out.extend(encoded)
+    out.extend(writer.out)
+    return bytes(out)
+
+
+def loads(data):
+    """
+    The Text or Composite in data, bytes in the binary format. Raises
+    ValueError if data is not in the format, or in another version of it.
+    """
+    data = bytearray(data)
+    if data[:len(MAGIC)] != bytearray(MAGIC):
+        raise ValueError(u"Not in the binary model format")
+    reader = _Reader(data, len(MAGIC), [])
+    try:
+        version = reader.varint()
+        if version != VERSION:
+            raise ValueError(u"Binary model format version {} is not "
+                             u"supported; this is version {}".format(
+                                 version, VERSION))
+        strings = reader.strings
+        for _ in range(reader.varint()):
+            length = reader.varint()
+            start = reader.position
+            if start + length > len(data):
+                raise IndexError()
+            strings.append(data[start:start + length].decode('utf-8'))
+            reader.position += length
+        return reader.value()
+    except (IndexError, UnicodeDecodeError, struct.error):
+        raise ValueError(u"Truncated or corrupt data at byte {}".format(
+            reader.position))
+
+
+def dump(node, stream):
+    """Write node, a Text or Composite, to a binary stream."""
+    stream.write(dumps(node))
+
+
+def load(stream):
+    """The Text or Composite read from a binary stream."""
+    return loads(stream.read())
@@ -0,0 +1,196 @@
+'''
+Copyright 2015, 2016 University College London.
+
+This file is part of PyORACC.
+
+PyORACC is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyORACC is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyORACC. If not, see <http://www.gnu.org/licenses/>.
+
+JSON and JSON Lines export of the model. Export a corpus, one text a line,
+with
+
+    python -m pyoracc.export.jsonl <corpus directory> <output file>
+'''
+
+
+from __future__ import print_function
+import codecs
+from json.encoder import encode_basestring
+import sys
+
+from ..model.composite import Composite
+from ..model.corpus import iter_corpus
+from ..model.layout import FIELDS
+
+
+# Each node is written as an object with its class name under "type", the
+# attributes listed in layout.FIELDS and, if it has one, its span as
+# [start, end, first line, last line].
+
+# The encoder of each class seen so far
+_encoders = {}
+
+
+def _compile(cls):
+    for base in cls.__mro__:
+        if base in FIELDS:
+            break
+    else:
+        raise TypeError(u"Cannot encode {} as JSON".format(cls.__name__))
+    head = u'{"type":' + encode_basestring(cls.__name__)
+    keys = [(name, u',' + encode_basestring(name) + u':')
+            for name in FIELDS[base]]
+
+    def encode(node, write):
+        write(head)
+        for name, key in keys:
+            write(key)
+            _value(getattr(node, name, None), write)
+        span = getattr(node, 'span', None)
+        if span is not None:
+            write(u',"span":[{},{},{},{}]'.format(*span))
+        write(u'}')
+    return encode
+
+
+def _string(value, write):
+    write(encode_basestring(value))
+
+
+def _constant(value, write):
+    write(u'null' if value is None else u'true' if value else u'false')
+
+
+def _integer(value, write):
+    # Not repr, which gives 10L for a long on Python 2
+    write(u'%d' % value)
+
+
+def _float(value, write):
+    write(repr(value))
+
+
+def _array(value, write):
+    write(u'[')
+    first = True
+    for item in value:
+        if not first:
+            write(u',')
+        first = False
+        _value(item, write)
+    write(u']')
+
+
+def _object(value, write):
+    # The main line of a Multilingual is under the language None; it is
+    # written under ""
+    write(u'{')
+    first = True
+    for key in sorted(value, key=lambda key: key or u''):
+        if not first:
+            write(u',')
+        first = False
+        write(encode_basestring(key or u''))
+        write(u':')
+        _value(value[key], write)
+    write(u'}')
+
+
+_writers = {
+    type(u''): _string,
+    str: _string,
+    bool: _constant,
+    type(None): _constant,
+    int: _integer,
+    float: _float,
+    list: _array,
+    tuple: _array,
+    dict: _object,
+}
+try:
+    _writers[long] = _integer
+except NameError:
+    pass
+
+
+def _value(value, write):
+    writer = _writers.get(type(value))
+    if writer is not None:
+        writer(value, write)
+        return
+    encoder = _encoders.get(type(value))
+    if encoder is None:
+        encoder = _encoders[type(value)] = _compile(type(value))
+    encoder(value, write)
+
+
+def dumps(node):
+    """node, or any value holding model nodes, as a JSON string."""
+    chunks = []
+    _value(node, chunks.append)
+    return u''.join(chunks)
+
+
+def dump(node, stream):
+    """
+    Write node as JSON to a text stream, as dumps() gives it, a piece at a
+    time rather than as one string.
+    """
+    _value(node, stream.write)
+
+
+def jsonl_lines(texts):
+    """
+    Yield each text of texts, an iterable of Text or Composite, as a line
+    of JSON Lines.
+    """
+    for text in texts:
+        for text in (text.texts if isinstance(text, Composite) else [text]):
+            yield dumps(text) + u'\n'
+
+
+def write_jsonl(texts, stream):
+    """Write texts to a text stream as JSON Lines, one text a line."""
+    for line in jsonl_lines(texts):
+        stream.write(line)
+
+
+def _encode_text(text):
+    return u''.join(jsonl_lines([text]))
+
+
+def export(source, stream, processes=None):
+    """
+    Write every text of the .atf files below source to a text stream as
+    JSON Lines. Files are parsed and encoded in parallel as by iter_corpus;
+    the lines are written in file order. Returns the paths of the files
+    which failed to parse, each with its error; the texts before the error
+    are still written.
+    """
+    failures = []
+    for path, lines, error in iter_corpus(source, _encode_text, processes):
+        for line in lines:
+            stream.write(line)
+        if error is not None:
+            failures.append((path, error))
+    return failures
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print("Usage: python -m pyoracc.export.jsonl <source> <output>")
+        sys.exit(1)
+    with codecs.open(sys.argv[2], 'w', encoding='utf-8') as output:
+        failed = export(sys.argv[1], output)
+    for path, error in failed:
+        print("Failed to parse", path, ":", error)
@@ -0,0 +1,297 @@
+'''
+Copyright 2015, 2016 University College London.
+
+This file is part of PyORACC.
+
+PyORACC is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyORACC is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyORACC. If not, see <http://www.gnu.org/licenses/>.
+
+Bulk loading of parsed texts into a normalized SQLite database. Load a
+corpus with
+
+    python -m pyoracc.export.sqlite <corpus directory> <database file>
+'''
+
+
+from __future__ import print_function
+import sqlite3
+import sys
+
+from ..index.alignment import Alignment
+from ..index.links import _links
+from ..index.words import _leaf
+from ..model.composite import Composite
+from ..model.corpus import iter_corpus
+from ..model.line import Line
+from ..model.multilingual import Multilingual
+from ..model.oraccobject import OraccObject
+from ..model.visitor import walk
+
+
+# Objects are the top level objects of a text, such as tablets; surfaces are
+# the objects on them, such as obverse or column. Lines are numbered from 0
+# within their text. A translation row is a translation segment and the
+# first and last transliteration lines it translates.
+_schema = """
+CREATE TABLE IF NOT EXISTS texts (
+    id INTEGER PRIMARY KEY,
+    code TEXT NOT NULL,
+    project TEXT,
+    language TEXT,
+    description TEXT);
+CREATE TABLE IF NOT EXISTS objects (
+    id INTEGER PRIMARY KEY,
+    text INTEGER NOT NULL REFERENCES texts (id),
+    type TEXT NOT NULL,
+    name TEXT);
+CREATE TABLE IF NOT EXISTS surfaces (
+    id INTEGER PRIMARY KEY,
+    object INTEGER NOT NULL REFERENCES objects (id),
+    text INTEGER NOT NULL REFERENCES texts (id),
+    type TEXT NOT NULL,
+    name TEXT);
+CREATE TABLE IF NOT EXISTS lines (
+    id INTEGER PRIMARY KEY,
+    text INTEGER NOT NULL REFERENCES texts (id),
+    object INTEGER REFERENCES objects (id),
+    surface INTEGER REFERENCES surfaces (id),
+    position INTEGER NOT NULL,
+    label TEXT);
+CREATE TABLE IF NOT EXISTS words (
+    line INTEGER NOT NULL REFERENCES lines (id),
+    position INTEGER NOT NULL,
+    word TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS lemmas (
+    line INTEGER NOT NULL REFERENCES lines (id),
+    position INTEGER NOT NULL,
+    lemma TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS translations (
+    id INTEGER PRIMARY KEY,
+    text INTEGER NOT NULL REFERENCES texts (id),
+    first_line INTEGER REFERENCES lines (id),
+    last_line INTEGER REFERENCES lines (id),
+    labels TEXT,
+    content TEXT);
+CREATE TABLE IF NOT EXISTS links (
+    id INTEGER PRIMARY KEY,
+    text INTEGER NOT NULL REFERENCES texts (id),
+    source_label TEXT,
+    operator TEXT NOT NULL,
+    target TEXT,
+    target_label TEXT);
+"""
+
+# Created once loading is done, which is much faster than keeping them up
+# to date row by row
+_indexes = [
+    ("texts_code", "texts (code)"),
+    ("objects_text", "objects (text)"),
+    ("surfaces_object", "surfaces (object)"),
+    ("lines_text", "lines (text, position)"),
+    ("lines_surface", "lines (surface)"),
+    ("words_line", "words (line, position)"),
+    ("words_word", "words (word)"),
+    ("lemmas_line", "lemmas (line, position)"),
+    ("lemmas_lemma", "lemmas (lemma)"),
+    ("translations_text", "translations (text)"),
+    ("links_text", "links (text)"),
+    ("links_target", "links (target)"),
+]
+
+# Each table, with the positions of the columns which hold IDs and the
+# table they are IDs of, in the order the tables are filled
+TABLES = [
+    ('texts', 5, [(0, 'texts')]),
+    ('objects', 4, [(0, 'objects'), (1, 'texts')]),
+    ('surfaces', 5, [(0, 'surfaces'), (1, 'objects'), (2, 'texts')]),
+    ('lines', 6, [(0, 'lines'), (1, 'texts'), (2, 'objects'),
+                  (3, 'surfaces')]),
+    ('words', 3, [(0, 'lines')]),
+    ('lemmas', 3, [(0, 'lines')]),
+    ('translations', 6, [(0, 'translations'), (1, 'texts'), (2, 'lines'),
+                         (3, 'lines')]),
+    ('links', 6, [(0, 'links'), (1, 'texts')]),
+]
+
+# The tables with an id column of their own
+_numbered = [name for name, _, keys in TABLES if keys[0] == (0, name)]
+
+# Rows inserted in each transaction
+BATCH_SIZE = 50000
+
+
+def text_rows(text):
+    """
+    The rows of text, or of each text of a Composite, in each table, by
+    table name. IDs are numbered from 0 within these rows; a loader
+    renumbers them, so rows can be made in parallel.
+    """
+    rows = dict((name, []) for name, _, _ in TABLES)
+    for text in (text.texts if isinstance(text, Composite) else [text]):
+        _add_rows(text, rows)
+    return rows
+
+
+def _add_rows(text, rows):
+    text_id = len(rows['texts'])
+    rows['texts'].append((text_id, text.code, text.project, text.language,
+                          text.description))
+    ids = {}
+    start = len(rows['lines'])
+    ancestors = []
+    for node in walk(text, _leaf, ancestors):
+        objects = [ids[id(ancestor)] for ancestor in ancestors
+                   if isinstance(ancestor, OraccObject)]
+        if isinstance(node, OraccObject):
+            name = getattr(node, 'name', None)
+            if not objects:
+                ids[id(node)] = len(rows['objects'])
+                rows['objects'].append((ids[id(node)], text_id,
+                                        node.objecttype, name))
+            else:
+                ids[id(node)] = len(rows['surfaces'])
+                rows['surfaces'].append((ids[id(node)], objects[0], text_id,
+                                         node.objecttype, name))
+        elif isinstance(node, (Line, Multilingual)):
+            ids[id(node)] = line_id = len(rows['lines'])
+            if isinstance(node, Multilingual):
+                node = node.lines.get(None)
+            rows['lines'].append((
+                line_id, text_id, objects[0] if objects else None,
+                objects[-1] if len(objects) > 1 else None,
+                line_id - start, node.label))
+            for field, terms in (('words', node.words),
+                                 ('lemmas', node.lemmas)):
+                rows[field].extend((line_id, position, term.strip())
+                                   for position, term in enumerate(terms)
+                                   if term and term.strip())
+    for segment in Alignment(text).segments:
+        rows['translations'].append((
+            len(rows['translations']), text_id, ids.get(id(segment.lines[0])),
+            ids.get(id(segment.lines[-1])), u' | '.join(segment.labels),
+            segment.translation))
+    first = len(rows['links'])
+    rows['links'].extend((first + number, text_id) + edge[1:]
+                         for number, edge in enumerate(_links(text)))
+
+
+class SqliteLoader(object):
+    """
+    Loads texts into an SQLite database in bulk. Rows are buffered and
+    inserted batch_size at a time with executemany, each batch in a single
+    transaction; the database is in WAL mode and its indexes are only made
+    when finish() is called, so call it when done. Texts already in the
+    database are kept, so a database can be loaded in several runs.
+    """
+
+    def __init__(self, filename=':memory:', batch_size=BATCH_SIZE):
+        self.db = sqlite3.connect(filename)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(_schema)
+        for name, _ in _indexes:
+            self.db.execute("DROP INDEX IF EXISTS {}".format(name))
+        self.batch_size = batch_size
+        self.next_ids = dict(
+            (name, self.db.execute("SELECT IFNULL(MAX(id) + 1, 1) FROM {}"
+                                   .format(name)).fetchone()[0])
+            for name in _numbered)
+        self.pending = dict((name, []) for name, _, _ in TABLES)
+        self.size = 0
+        # The number of rows inserted into each table
+        self.counts = dict((name, 0) for name, _, _ in TABLES)
+
+    def close(self):
+        self.db.close()
+
+    def add(self, text):
+        """Load a Text, or each text of a Composite."""
+        self.add_rows(text_rows(text))
+
+    def add_rows(self, rows):
+        """Load rows as text_rows gives them."""
+        for name, _, keys in TABLES:
+            pending = self.pending[name]
+            for row in rows[name]:
+                row = list(row)
+                for position, table in keys:
+                    if row[position] is not None:
+                        row[position] += self.next_ids[table]
+                pending.append(row)
+            self.size += len(rows[name])
+        for name in _numbered:
+            self.next_ids[name] += len(rows[name])
+        if self.size >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Insert the buffered rows."""
+        with self.db:
+            for name, width, _ in TABLES:
+                pending = self.pending[name]
+                if pending:
+                    self.db.executemany(
+                        "INSERT INTO {} VALUES ({})".format(
+                            name, ", ".join(["?"] * width)), pending)
+                    self.counts[name] += len(pending)
+                    self.pending[name] = []
+        self.size = 0
+
+    def finish(self):
+        """Insert the buffered rows, then make the indexes."""
+        self.flush()
+        with self.db:
+            for name, columns in _indexes:
+                self.db.execute("CREATE INDEX IF NOT EXISTS {} ON {}"
+                                .format(name, columns))
+        self.db.execute("ANALYZE")
+
+    def load(self, texts):
+        """Load texts, e.g. as iter_texts gives them, and finish."""
+        for text in texts:
+            self.add(text)
+        self.finish()
+        return self.counts
+
+
+def load_corpus(source, filename, processes=None, batch_size=BATCH_SIZE):
+    """
+    Load the .atf files below source into the database filename. Rows are
+    made in parallel as by iter_corpus, and loaded in file order. Returns
+    the number of rows inserted into each table, and the paths of the files
+    which failed to parse, each with its error.
+    """
+    loader = SqliteLoader(filename, batch_size)
+    failures = []
+    try:
+        for path, results, error in iter_corpus(source, text_rows,
+                                                processes):
+            for rows in results:
+                loader.add_rows(rows)
+            if error is not None:
+                failures.append((path, error))
+        loader.finish()
+    finally:
+        loader.close()
+    return loader.counts, failures
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print("Usage: python -m pyoracc.export.sqlite <source> <database>")
+        sys.exit(1)
+    counts, failed = load_corpus(sys.argv[1], sys.argv[2])
+    for name, _, _ in TABLES:
+        print(name, counts[name])
+    for path, error in failed:
+        print("Failed to parse", path, ":", error)
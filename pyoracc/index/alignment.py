@@ -0,0 +1,155 @@
+'''
+Copyright 2015, 2016 University College London.
+
+This file is part of PyORACC.
+
+PyORACC is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyORACC is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyORACC. If not, see <http://www.gnu.org/licenses/>.
+'''
+
+
+from collections import namedtuple
+import json
+import re
+
+from ..model.composite import Composite
+from ..model.labels import keyed_lines
+from ..model.line import Line
+from ..model.link_reference import LinkReference
+from ..model.multilingual import Multilingual
+from ..model.translation import Translation
+from ..model.visitor import walk
+
+
+# A stretch of translation and the transliteration lines it translates: the
+# code of the text, the labels of the lines (e.g. "r 3"), the Line or
+# Multilingual nodes themselves and the translation
+Segment = namedtuple('Segment', ['code', 'labels', 'lines', 'translation'])
+
+# One row of a parallel corpus
+ParallelRow = namedtuple('ParallelRow', ['code', 'labels', 'transliteration',
+                                         'translation'])
+
+_space = re.compile(u'\\s+', re.U)
+
+
+class _Section(object):
+    """Stands for a translation, so its lines are keyed like the text's."""
+
+    def __init__(self, children):
+        self.children = children
+
+
+def _outside(node):
+    return isinstance(node, (Line, Multilingual, Translation))
+
+
+def _words(line):
+    if isinstance(line, Multilingual):
+        line = line.lines[None]
+    return _space.sub(u' ', u' '.join(word for word in line.words
+                                      if word)).strip()
+
+
+class Alignment(object):
+    """
+    The translation segments of a text, each with the transliteration lines
+    it translates, worked out in one pass over the translations with the
+    text's label index.
+
+    Labelled translations (@label o 3, @(r 1 - r 4)) refer to lines by
+    label and may cover ranges; a @label+ segment continues the one before
+    it, and is merged into it. Parallel translations repeat the labels of
+    the lines they translate, surface by surface.
+    """
+
+    def __init__(self, text):
+        self.code = text.code
+        self.segments = []
+        # Translation lines whose label matches no transliteration line
+        self.unaligned = []
+        self.positions = {}
+        self.index = text.labels()
+        translations = [node for node in walk(text, _outside)
+                        if type(node) is Translation]
+        for translation in translations:
+            for keys, line in keyed_lines(_Section(translation.children)):
+                if isinstance(line, Line) and \
+                        isinstance(line.label, LinkReference):
+                    self._add(self.index.reference(line.label), line,
+                              line.label.plus)
+                else:
+                    found = self.index.get(keys[0])
+                    self._add([found] if found is not None else [], line,
+                              False)
+
+    def _add(self, lines, line, plus):
+        if not lines:
+            self.unaligned.append(line)
+            return
+        translation = _words(line)
+        if plus and self.segments:
+            previous = self.segments.pop()
+            seen = set(id(node) for node in previous.lines)
+            lines = previous.lines + [node for node in lines
+                                      if id(node) not in seen]
+            translation = previous.translation + u' ' + translation
+        number = len(self.segments)
+        self.segments.append(Segment(
+            self.code, [self.index.label(node) for node in lines], lines,
+            translation))
+        for node in lines:
+            numbers = self.positions.setdefault(id(node), [])
+            if number not in numbers:
+                numbers.append(number)
+
+    def segments_for(self, line):
+        """The segments translating a transliteration Line or Multilingual."""
+        return [self.segments[number]
+                for number in self.positions.get(id(line), [])]
+
+
+def parallel_corpus(texts):
+    """
+    Yield a ParallelRow for each translation segment of texts, an iterable of
+    Text or Composite such as iter_texts gives. Only one text is aligned at
+    a time, so this streams.
+    """
+    for text in texts:
+        for text in (text.texts if isinstance(text, Composite) else [text]):
+            for segment in Alignment(text).segments:
+                yield ParallelRow(segment.code, u' | '.join(segment.labels),
+                                  u' | '.join(_words(line)
+                                              for line in segment.lines),
+                                  segment.translation)
+
+
+def _field(value):
+    return _space.sub(u' ', value or u'')
+
+
+def write_tsv(rows, stream):
+    """
+    Write rows, as parallel_corpus gives them, to a text stream as tab
+    separated values with a header line.
+    """
+    stream.write(u'\t'.join(ParallelRow._fields) + u'\n')
+    for row in rows:
+        stream.write(u'\t'.join(_field(value) for value in row) + u'\n')
+
+
+def write_jsonl(rows, stream):
+    """Write rows to a text stream as one JSON object a line."""
+    for row in rows:
+        stream.write(json.dumps(dict(zip(ParallelRow._fields, row)),
+                                ensure_ascii=False, sort_keys=True) + u'\n')
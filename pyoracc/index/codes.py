@@ -0,0 +1,146 @@
+'''
+Copyright 2015, 2016 University College London.
+
+This file is part of PyORACC.
+
+PyORACC is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyORACC is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyORACC. If not, see <http://www.gnu.org/licenses/>.
+'''
+
+
+from collections import namedtuple
+import codecs
+import hashlib
+import os
+import re
+
+
+# Where a text's block is in the corpus: the file relative to the corpus
+# root, the byte offset and length of the block, the line it starts on and
+# the SHA-1 of its bytes.
+CodeEntry = namedtuple('CodeEntry',
+                       ['path', 'offset', 'length', 'lineno', 'digest'])
+
+_codeline = re.compile(br'^(?:\xef\xbb\xbf)?&[ \t]*([^\s=]+)', re.M)
+
+
+class CodeIndex(object):
+    """
+    Maps the code on each &-line of a corpus (e.g. P229574) to where its text
+    block is, so one text can be read without parsing the files before it.
+
+    The first block of a file includes anything before its &-line. If a code
+    occurs more than once the first in file order wins.
+    """
+
+    header = u"# pyoracc code index 1"
+
+    def __init__(self, root):
+        self.root = root
+        self.entries = {}
+        # The codes indexed from each file
+        self.paths = {}
+
+    @classmethod
+    def build(cls, root):
+        """Index every .atf file below root."""
+        index = cls(root)
+        for dirpath, dirnames, files in os.walk(root):
+            dirnames.sort()
+            for file in sorted(files):
+                if file.endswith('.atf'):
+                    index.scan(os.path.relpath(os.path.join(dirpath, file),
+                                               root))
+        return index
+
+    def scan(self, path):
+        """
+        (Re)index the file at path, relative to the root. This only looks for
+        &-lines, it does not parse.
+        """
+        for code in self.paths.pop(path, []):
+            del self.entries[code]
+        codes = self.paths[path] = []
+        with open(os.path.join(self.root, path), 'rb') as stream:
+            data = stream.read()
+        matches = list(_codeline.finditer(data))
+        lineno, previous = 1, 0
+        for number, match in enumerate(matches):
+            start = match.start() if number else 0
+            if number + 1 < len(matches):
+                end = matches[number + 1].start()
+            else:
+                end = len(data)
+            lineno += data.count(b'\n', previous, start)
+            previous = start
+            code = match.group(1).decode('utf-8')
+            if code not in self.entries:
+                self.entries[code] = CodeEntry(
+                    path, start, end - start, lineno,
+                    hashlib.sha1(data[start:end]).hexdigest())
+                codes.append(code)
+
+    def __contains__(self, code):
+        return code in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getitem__(self, code):
+        return self.entries[code]
+
+    def read(self, code):
+        """
+        Read the block of the text with the given code, returning its content
+        and the line it starts on. If the file has changed since it was
+        indexed it is indexed again first. Raises KeyError for unknown codes.
+        """
+        entry = self.entries[code]
+        block = self._read_block(entry)
+        if hashlib.sha1(block).hexdigest() != entry.digest:
+            self.scan(entry.path)
+            entry = self.entries[code]
+            block = self._read_block(entry)
+        return block.decode('utf-8-sig'), entry.lineno
+
+    def _read_block(self, entry):
+        with open(os.path.join(self.root, entry.path), 'rb') as stream:
+            stream.seek(entry.offset)
+            return stream.read(entry.length)
+
+    def save(self, filename):
+        with codecs.open(filename, 'w', encoding='utf-8') as stream:
+            stream.write(self.header + u"\n")
+            for code in sorted(self.entries):
+                entry = self.entries[code]
+                path = entry.path.replace(os.sep, '/')
+                stream.write(u"\t".join([code, path, str(entry.offset),
+                                         str(entry.length), str(entry.lineno),
+                                         entry.digest]))
+                stream.write(u"\n")
+
+    @classmethod
+    def load(cls, filename, root):
+        index = cls(root)
+        with codecs.open(filename, encoding='utf-8') as stream:
+            if stream.readline().rstrip(u"\n") != cls.header:
+                raise ValueError(u"{} is not a code index".format(filename))
+            for row in stream:
+                code, path, offset, length, lineno, digest = \
+                    row.rstrip(u"\n").split(u"\t")
+                path = path.replace('/', os.sep)
+                index.entries[code] = CodeEntry(path, int(offset),
+                                                int(length), int(lineno),
+                                                digest)
+                index.paths.setdefault(path, []).append(code)
+        return index
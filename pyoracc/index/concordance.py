@@ -0,0 +1,140 @@
+'''
+Copyright 2015, 2016 University College London.
+
+This file is part of PyORACC.
+
+PyORACC is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyORACC is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyORACC. If not, see <http://www.gnu.org/licenses/>.
+'''
+
+
+from collections import namedtuple
+import heapq
+import pickle
+import tempfile
+
+from ..model.composite import Composite
+from .signs import signs
+from .words import LEMMA, WORD, _text_lines
+
+SIGN = 'sign'
+
+# One row of a concordance. Rows sort by keyword, then by the context to its
+# right and then its left, as is usual for KWIC tables.
+KwicLine = namedtuple('KwicLine', ['keyword', 'right', 'left', 'code',
+                                   'label', 'position'])
+
+
+def model_lines(texts):
+    """
+    The code, label, words and lemmas of each transliteration line of texts,
+    an iterable of Text or Composite, such as iter_texts gives.
+    """
+    for text in texts:
+        for text in (text.texts if isinstance(text, Composite) else [text]):
+            for _, _, line in _text_lines(text):
+                yield text.code, line.label, line.words, line.lemmas
+
+
+def kwic_lines(lines, keywords=None, field=WORD, context=5):
+    """
+    Yield an unsorted KwicLine for each occurrence of a keyword in lines, as
+    given by model_lines or WordIndex.lines.
+
+    field is WORD, LEMMA or SIGN. Lemmas are shown in the context of the
+    words they belong to; signs in the context of their neighbouring signs.
+    keywords restricts the rows to those terms; by default every term has
+    rows.
+    """
+    for code, label, words, lemmas in lines:
+        words = [word.strip() if word else u'' for word in words]
+        if field == SIGN:
+            words = [sign for word in words for sign in signs(word)]
+            terms = words
+        elif field == LEMMA:
+            terms = [lemma.strip() if lemma else u'' for lemma in lemmas]
+        else:
+            terms = words
+        for position, term in enumerate(terms):
+            if not term or (keywords is not None and term not in keywords):
+                continue
+            yield KwicLine(term,
+                           tuple(words[position + 1:position + 1 + context]),
+                           tuple(words[max(position - context, 0):position]),
+                           code or u'', label or u'', position)
+
+
+def _write_run(rows):
+    run = tempfile.TemporaryFile()
+    pickler = pickle.Pickler(run, 2)
+    for row in rows:
+        pickler.dump(tuple(row))
+    run.seek(0)
+    return run
+
+
+def _read_run(run):
+    unpickler = pickle.Unpickler(run)
+    while True:
+        try:
+            yield unpickler.load()
+        except EOFError:
+            return
+
+
+def concordance(lines, keywords=None, field=WORD, context=5,
+                run_size=100000, fan_in=64):
+    """
+    Yield the KwicLines of lines (see kwic_lines) in sorted order.
+
+    At most run_size rows are held in memory: larger concordances are sorted
+    in runs written to temporary files, which are then merged, fan_in at a
+    time, so the size of the corpus is limited only by disk space.
+    """
+    runs = []
+    rows = []
+    try:
+        for row in kwic_lines(lines, keywords, field, context):
+            rows.append(row)
+            if len(rows) >= run_size:
+                rows.sort()
+                runs.append(_write_run(rows))
+                rows = []
+        rows.sort()
+        if not runs:
+            for row in rows:
+                yield row
+            return
+        if rows:
+            runs.append(_write_run(rows))
+            rows = []
+        while len(runs) > fan_in:
+            merged = _write_run(heapq.merge(*[_read_run(run)
+                                              for run in runs[:fan_in]]))
+            for run in runs[:fan_in]:
+                run.close()
+            runs = runs[fan_in:] + [merged]
+        for row in heapq.merge(*[_read_run(run) for run in runs]):
+            yield KwicLine(*row)
+    finally:
+        for run in runs:
+            run.close()
+
+
+def format_kwic(row, width=40):
+    """A row as a line of text, with the keywords of rows aligned."""
+    left = u' '.join(row.left)[-width:]
+    right = u' '.join(row.right)[:width]
+    return u'{}  {}  {}  {}  {}'.format(left.rjust(width), row.keyword,
+                                        right.ljust(width), row.code,
+                                        row.label)
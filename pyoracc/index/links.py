@@ -0,0 +1,221 @@
+'''
+Copyright 2015, 2016 University College London.
+
+This file is part of PyORACC.
+
+PyORACC is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyORACC is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyORACC. If not, see <http://www.gnu.org/licenses/>.
+'''
+
+
+from collections import namedtuple
+import sqlite3
+
+from ..model.composite import Composite
+from ..model.labels import keyed_lines
+from ..model.link_reference import LinkReference
+from ..model.visitor import walk
+
+
+# A link from a text, or a line of it, to another text or a line of that.
+# Labels are as in @label lines, e.g. "o ii 9"; they are None for links
+# between whole texts, such as #link: def lines. operator is the ATF
+# operator of a line link (||, << or >>) or the kind of a text link.
+Edge = namedtuple('Edge', ['source', 'source_label', 'operator', 'target',
+                           'target_label'])
+
+# Why a link cannot be followed
+UNDEFINED = 'undefined'    # its target is not defined by a #link: def line
+MISSING_TEXT = 'text'      # its target text is not in the graph
+MISSING_LINE = 'line'      # its target text has no line with that label
+
+_schema = """
+CREATE TABLE IF NOT EXISTS texts (
+    code TEXT PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS labels (
+    code TEXT NOT NULL,
+    label TEXT NOT NULL,
+    PRIMARY KEY (code, label)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS links (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    source_label TEXT,
+    operator TEXT NOT NULL,
+    target TEXT,
+    target_label TEXT);
+CREATE INDEX IF NOT EXISTS links_source ON links (source);
+CREATE INDEX IF NOT EXISTS links_target ON links (target);
+"""
+
+_edge_columns = ("links.source, links.source_label, links.operator, "
+                 "links.target, links.target_label")
+
+# Whether the target of a link is present; NULL if it is dangling
+_resolution = """
+LEFT JOIN texts ON texts.code = links.target
+LEFT JOIN labels ON labels.code = links.target AND
+    labels.label = links.target_label
+"""
+
+
+def _code(reference):
+    """The text code of a #link target such as dcclt/obale:Q000050."""
+    return reference.rsplit(u':', 1)[-1] if reference else None
+
+
+def _links(text):
+    """The Edges of text, with undefined line link targets None."""
+    aliases = {}
+    for link in text.links:
+        if link.label:
+            aliases[link.label] = _code(link.code)
+        yield Edge(text.code, None, u'def' if link.label else u'link',
+                   _code(link.code), None)
+    labelled = {}
+    for keys, line in keyed_lines(text):
+        for reference in getattr(line, 'links', []):
+            labelled[id(reference)] = u' '.join(keys[0])
+    for node in walk(text):
+        if isinstance(node, LinkReference):
+            # A link on a line of its own, not attached to a line
+            references = [node]
+        else:
+            references = getattr(node, 'links', None) or ()
+        for reference in references:
+            if not isinstance(reference, LinkReference):
+                continue
+            yield Edge(text.code, labelled.get(id(reference)),
+                       reference.operator, aliases.get(reference.target),
+                       u' '.join(reference.label) or None)
+
+
+class LinkGraph(object):
+    """
+    The links between the texts of a corpus, from #link lines and the ||,
+    << and >> references of lines, stored in an SQLite database.
+
+    Texts are added in one pass over the corpus, in any order; links are
+    resolved when queried, by looking up the code and line labels of their
+    targets, so a link to a text added later is resolved once it is. Adding
+    a text again replaces its links, so a persistent graph can be kept up
+    to date as files change.
+    """
+
+    def __init__(self, filename=':memory:'):
+        self.db = sqlite3.connect(filename)
+        self.db.executescript(_schema)
+
+    def close(self):
+        self.db.close()
+
+    def add(self, text):
+        """Add a Text, or each text of a Composite."""
+        texts = text.texts if isinstance(text, Composite) else [text]
+        with self.db:
+            for text in texts:
+                self._remove(text.code)
+                self._add(text)
+
+    def update(self, texts):
+        """Add each of texts, e.g. as iter_texts gives them."""
+        with self.db:
+            for text in texts:
+                for text in (text.texts if isinstance(text, Composite)
+                             else [text]):
+                    self._remove(text.code)
+                    self._add(text)
+
+    def remove(self, code):
+        with self.db:
+            self._remove(code)
+
+    def _remove(self, code):
+        self.db.execute("DELETE FROM texts WHERE code = ?", (code,))
+        self.db.execute("DELETE FROM labels WHERE code = ?", (code,))
+        self.db.execute("DELETE FROM links WHERE source = ?", (code,))
+
+    def _add(self, text):
+        self.db.execute("INSERT INTO texts VALUES (?)", (text.code,))
+        self.db.executemany(
+            "INSERT OR IGNORE INTO labels VALUES (?, ?)",
+            ((text.code, u' '.join(key))
+             for keys, _ in keyed_lines(text) for key in keys))
+        self.db.executemany(
+            "INSERT INTO links (source, source_label, operator, target, "
+            "target_label) VALUES (?, ?, ?, ?, ?)", _links(text))
+
+    def __contains__(self, code):
+        return self.db.execute("SELECT 1 FROM texts WHERE code = ?",
+                               (code,)).fetchone() is not None
+
+    def edges(self, code=None):
+        """
+        The links which resolve to a text and line in the graph, from code
+        or from every text.
+        """
+        where = "WHERE texts.code IS NOT NULL AND (links.target_label IS " \
+            "NULL OR labels.label IS NOT NULL)"
+        arguments = ()
+        if code is not None:
+            where += " AND links.source = ?"
+            arguments = (code,)
+        return [Edge(*row) for row in self.db.execute(
+            "SELECT {} FROM links {} {} ORDER BY links.id".format(
+                _edge_columns, _resolution, where), arguments)]
+
+    def incoming(self, code):
+        """The resolved links to code."""
+        return [Edge(*row) for row in self.db.execute(
+            "SELECT {} FROM links {} WHERE links.target = ? AND "
+            "(links.target_label IS NULL OR labels.label IS NOT NULL) "
+            "ORDER BY links.id".format(_edge_columns, _resolution), (code,))]
+
+    def dangling(self):
+        """
+        The links which cannot be followed, each with the reason: UNDEFINED,
+        MISSING_TEXT or MISSING_LINE.
+        """
+        result = []
+        for row in self.db.execute(
+                "SELECT {}, texts.code, labels.label FROM links {} "
+                "WHERE links.target IS NULL OR texts.code IS NULL OR "
+                "(links.target_label IS NOT NULL AND labels.label IS NULL) "
+                "ORDER BY links.id".format(_edge_columns, _resolution)):
+            edge = Edge(*row[:5])
+            if edge.target is None:
+                reason = UNDEFINED
+            elif row[5] is None:
+                reason = MISSING_TEXT
+            else:
+                reason = MISSING_LINE
+            result.append((edge, reason))
+        return result
+
+    def neighbours(self, code, depth=1):
+        """
+        The codes of the texts within depth resolved links of code, in
+        either direction, not including code itself.
+        """
+        seen = set([code])
+        frontier = [code]
+        for _ in range(depth):
+            found = set()
+            for current in frontier:
+                found.update(edge.target for edge in self.edges(current))
+                found.update(edge.source for edge in self.incoming(current))
+            frontier = found - seen
+            seen |= frontier
+            if not frontier:
+                break
+        seen.discard(code)
+        return seen
@@ -0,0 +1,440 @@
+# -*- coding: utf-8 -*-
+'''
+Copyright 2015, 2016 University College London.
+
+This file is part of PyORACC.
+
+PyORACC is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyORACC is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyORACC. If not, see <http://www.gnu.org/licenses/>.
+'''
+
+
+import re
+
+from ..atf.atffile import AtfFile
+from ..model.comment import Comment
+from ..model.composite import Composite
+from ..model.line import Line
+from ..model.milestone import Milestone
+from ..model.multilingual import Multilingual
+from ..model.note import Note
+from ..model.oraccobject import OraccObject
+from ..model.ruling import Ruling
+from ..model.state import State
+from ..model.text import Text
+from ..model.translation import Translation
+from ..model.visitor import children
+from .words import LEMMA, WORD
+
+
+CHILD = '/'
+DESCENDANT = '//'
+
+# Step names which select nodes by their class
+_classes = {
+    'text': Text,
+    'translation': Translation,
+    'line': Line,
+    'note': Note,
+    'state': State,
+    'ruling': Ruling,
+    'comment': Comment,
+    'milestone': Milestone,
+}
+
+# The objecttype of OraccObjects, as the parser gives it, which the generic
+# steps "object" and "surface" select
+OBJECTS = frozenset(['tablet', 'envelope', 'prism', 'bulla', 'sealings',
+                     'fragment', 'object'])
+SURFACES = frozenset(['obverse', 'reverse', 'left', 'right', 'top',
+                      'bottom', 'face', 'surface', 'column', 'seal',
+                      'heading'])
+
+# Attribute names which are more natural in the singular
+_aliases = {
+    'word': 'words',
+    'lemma': 'lemmas',
+    'witness': 'witnesses',
+    'reference': 'references',
+    'link': 'links',
+}
+
+_token = re.compile(u'\\s*(?:(//|/|\\[|\\]|!=|=|~|\\(|\\))|'
+                    u"'([^']*)'|\"([^\"]*)\"|([^\\s/\\[\\]()=!~'\"]+))",
+                    re.U)
+
+
+class _Root(object):
+    """Stands above the texts a query is run on."""
+
+    def __init__(self, texts):
+        self.children = texts
+
+
+def _children(node):
+    for child in children(node):
+        if type(child) is Multilingual:
+            # Multilingual lines are seen as their main line
+            child = child.lines.get(None)
+            if child is None:
+                continue
+        yield child
+
+
+def _descendants(node):
+    """The nodes below node in document order, without recursion."""
+    stack = [_children(node)]
+    while stack:
+        for child in stack[-1]:
+            yield child
+            stack.append(_children(child))
+            break
+        else:
+            stack.pop()
+
+
+def _values(node, attribute):
+    value = getattr(node, attribute, None)
+    for value in (value if isinstance(value, list) else [value]):
+        if value is None:
+            continue
+        if not isinstance(value, type(u'')):
+            value = u'{}'.format(value)
+        yield value.strip()
+
+
+def _always(node):
+    return True
+
+
+def _never(node):
+    return False
+
+
+class _Parser(object):
+    """
+    Recursive descent over the tokens of a query:
+
+        path      := ['/' | '//'] step (('/' | '//') step)*
+        step      := name ('[' condition ']')*
+        condition := conjunct ('or' conjunct)*
+        conjunct  := factor ('and' factor)*
+        factor    := '(' condition ')' | name [('=' | '!=' | '~') value]
+
+    Conditions are parsed into tuples: ('or', [...]), ('and', [...]) and
+    (op, attribute, value), where op is None for a bare attribute.
+    """
+
+    def __init__(self, query):
+        self.query = query
+        self.tokens = []
+        position = 0
+        query = query.rstrip()
+        while position < len(query):
+            match = _token.match(query, position)
+            if match is None:
+                self.error(u"unexpected {!r}".format(query[position:]))
+            symbol, single, double, name = match.groups()
+            if symbol is not None:
+                self.tokens.append(('symbol', symbol))
+            elif name is not None:
+                self.tokens.append(('name', name))
+            else:
+                self.tokens.append(('string',
+                                    single if single is not None else double))
+            position = match.end()
+        self.position = 0
+
+    def error(self, message):
+        raise ValueError(u"Bad query {!r}: {}".format(self.query, message))
+
+    def peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return (None, None)
+
+    def take(self, kind=None, value=None):
+        token = self.peek()
+        if (kind is not None and token[0] != kind) or \
+                (value is not None and token[1] != value):
+            self.error(u"expected {} at {!r}".format(
+                value or kind, token[1] if token[1] is not None else u'end'))
+        self.position += 1
+        return token[1]
+
+    def accept(self, kind, value):
+        if self.peek() == (kind, value):
+            self.position += 1
+            return True
+        return False
+
+    def path(self):
+        steps = []
+        axis = CHILD
+        if self.peek() in (('symbol', CHILD), ('symbol', DESCENDANT)):
+            axis = self.take()
+        while True:
+            name = self.take('name')
+            conditions = []
+            while self.accept('symbol', '['):
+                conditions.append(self.condition())
+                self.take('symbol', ']')
+            steps.append((axis, name, conditions))
+            if self.peek() not in (('symbol', CHILD), ('symbol', DESCENDANT)):
+                break
+            axis = self.take()
+        if self.peek()[0] is not None:
+            self.error(u"unexpected {!r}".format(self.peek()[1]))
+        return steps
+
+    def condition(self):
+        terms = [self.conjunct()]
+        while self.accept('name', 'or'):
+            terms.append(self.conjunct())
+        return terms[0] if len(terms) == 1 else ('or', terms)
+
+    def conjunct(self):
+        factors = [self.factor()]
+        while self.accept('name', 'and'):
+            factors.append(self.factor())
+        return factors[0] if len(factors) == 1 else ('and', factors)
+
+    def factor(self):
+        if self.accept('symbol', '('):
+            condition = self.condition()
+            self.take('symbol', ')')
+            return condition
+        attribute = self.take('name')
+        for op in ('=', '!=', '~'):
+            if self.accept('symbol', op):
+                kind, value = self.peek()
+                if kind not in ('name', 'string'):
+                    self.error(u"expected a value after {}".format(op))
+                self.position += 1
+                return (op, attribute, value)
+        return (None, attribute, None)
+
+
+def _predicate(condition):
+    """Compile a parsed condition into a function of a node."""
+    op = condition[0]
+    if op in ('and', 'or'):
+        parts = [_predicate(part) for part in condition[1]]
+        combine = all if op == 'and' else any
+        return lambda node: combine(part(node) for part in parts)
+    attribute = _aliases.get(condition[1], condition[1])
+    value = condition[2]
+    if op is None:
+        return lambda node: any(_values(node, attribute))
+    if op == '=':
+        return lambda node: value in _values(node, attribute)
+    if op == '!=':
+        return lambda node: value not in _values(node, attribute)
+    search = re.compile(value, re.U).search
+    return lambda node: any(search(actual)
+                            for actual in _values(node, attribute))
+
+
+class Step(object):
+    """
+    One step of a compiled query. Whether a node has the right type is
+    decided once per class and kept in a dispatch table, so most nodes are
+    rejected by a dictionary lookup.
+    """
+
+    def __init__(self, axis, name, conditions):
+        if name != '*' and name not in _classes and name not in OBJECTS \
+                and name not in SURFACES and name not in ('object',
+                                                          'surface'):
+            raise ValueError(u"Unknown step {!r}".format(name))
+        self.axis = axis
+        self.name = name
+        self.conditions = conditions
+        predicates = [_predicate(condition) for condition in conditions]
+        if not predicates:
+            self.predicate = _always
+        elif len(predicates) == 1:
+            self.predicate = predicates[0]
+        else:
+            self.predicate = lambda node: all(predicate(node)
+                                              for predicate in predicates)
+        self.dispatch = {}
+
+    def _compile(self, cls):
+        predicate = self.predicate
+        if self.name == '*':
+            return predicate
+        if self.name in _classes:
+            if issubclass(cls, _classes[self.name]):
+                return predicate
+            return _never
+        if not issubclass(cls, OraccObject):
+            return _never
+        if self.name == 'object':
+            types = OBJECTS
+        elif self.name == 'surface':
+            types = SURFACES
+        else:
+            types = frozenset([self.name])
+        return lambda node: node.objecttype in types and predicate(node)
+
+    def __call__(self, node):
+        try:
+            test = self.dispatch[type(node)]
+        except KeyError:
+            test = self.dispatch[type(node)] = self._compile(type(node))
+        return test(node)
+
+
+def _index_codes(condition, index, words=True):
+    """
+    The codes of the texts which can satisfy condition according to index,
+    or None if the index cannot tell. Conditions on words are left to the
+    text unless words is true.
+    """
+    op = condition[0]
+    if op in ('and', 'or'):
+        parts = [_index_codes(part, index, words) for part in condition[1]]
+        if op == 'or':
+            if None in parts:
+                return None
+            return set().union(*parts)
+        parts = [part for part in parts if part is not None]
+        if not parts:
+            return None
+        return set.intersection(*parts)
+    field = {'word': WORD, 'words': WORD,
+             'lemma': LEMMA, 'lemmas': LEMMA}.get(condition[1])
+    if op != '=' or field is None or (field == WORD and not words):
+        return None
+    return set(hit.code for hit in index.find((field, condition[2])))
+
+
+class Query(object):
+    """
+    A path query over the ATF model, such as
+
+        text[project='saao/saa10']/tablet/reverse/line[lemma~'šarru']
+
+    Each step names the kind of node to select below the nodes selected by
+    the step before it: "/" looks at children and "//" at all descendants.
+    Steps are text, translation, line, note, state, ruling, comment,
+    milestone, an object or surface type (tablet, reverse, column, ...),
+    object or surface for any of those, or * for any node. Conditions in
+    brackets test attributes of the node: attr='value' for equality, !=
+    for inequality, ~ to search with a regular expression and a bare
+    attribute for any value; they combine with and, or and parentheses. For
+    list attributes such as lemma and word a condition holds if it does for
+    any element.
+
+    A query is compiled once and can then be run on any number of texts.
+    """
+
+    def __init__(self, query):
+        self.query = query
+        self.steps = [Step(*step) for step in _Parser(query).path()]
+
+    def __repr__(self):
+        return 'Query({!r})'.format(self.query)
+
+    def select(self, root):
+        """
+        The nodes matching the query in root, an AtfFile, Text or Composite,
+        in document order.
+        """
+        if isinstance(root, AtfFile):
+            root = root.text
+        nodes = [_Root(root.texts if isinstance(root, Composite) else [root])]
+        for step in self.steps:
+            found = []
+            seen = set()
+            for node in nodes:
+                if step.axis == CHILD:
+                    candidates = _children(node)
+                else:
+                    candidates = _descendants(node)
+                for candidate in candidates:
+                    if step(candidate) and id(candidate) not in seen:
+                        seen.add(id(candidate))
+                        found.append(candidate)
+            nodes = found
+        return nodes
+
+    def stream(self, texts):
+        """
+        Run the query on each of texts, an iterable of Text or Composite such
+        as iter_texts gives, yielding each text paired with a node found in
+        it. Only the text being searched needs to be in memory.
+        """
+        for text in texts:
+            for text in (text.texts if isinstance(text, Composite)
+                         else [text]):
+                for node in self.select(text):
+                    yield text, node
+
+    def codes(self, index):
+        """
+        The codes of the texts the query can match according to index, a
+        WordIndex, or None if its conditions say nothing about words and
+        lemmas. Only equality conditions on word and lemma are used.
+
+        The index only has transliteration lines, so conditions on words
+        are not used for steps which may select nodes in a translation: any
+        after a // step, a translation step or a * step. Lines of
+        translations have no lemmas, so conditions on lemmas always are.
+        """
+        codes = None
+        translated = False
+        for step in self.steps:
+            translated = translated or step.axis != CHILD or \
+                step.name in ('translation', '*')
+            for condition in step.conditions:
+                found = _index_codes(condition, index, not translated)
+                if found is not None:
+                    codes = found if codes is None else codes & found
+        return codes
+
+    def search(self, corpus, index=None):
+        """
+        Run the query on a Corpus, reading each text with Corpus.get. With
+        an index, a WordIndex of the corpus, only the texts it says can
+        match are parsed. Yields pairs of text and node as stream does;
+        texts which fail to parse are skipped.
+        """
+        codes = corpus.codes()
+        if index is not None:
+            candidates = self.codes(index)
+            if candidates is not None:
+                codes = [code for code in codes if code in candidates]
+        for code in codes:
+            try:
+                text = corpus.get(code)
+            except (SyntaxError, IndexError, AttributeError):
+                continue
+            for pair in self.stream([text]):
+                yield pair
+
+
+_compiled = {}
+
+
+def select(query, root):
+    """
+    The nodes of root matching query; see Query. Compiled queries are
+    cached.
+    """
+    if query not in _compiled:
+        if len(_compiled) >= 100:
+            _compiled.clear()
+        _compiled[query] = Query(query)
+    return _compiled[query].select(root)
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+'''
+Copyright 2015, 2016 University College London.
+
+This file is part of PyORACC.
+
+PyORACC is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyORACC is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyORACC. If not, see <http://www.gnu.org/licenses/>.
+'''
+
+
+import fnmatch
+import re
+import sqlite3
+
+from ..model.composite import Composite
+from .words import Hit, _text_lines
+
+
+_schema = """
+CREATE TABLE IF NOT EXISTS grams (
+    id INTEGER PRIMARY KEY,
+    gram TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS lines (
+    id INTEGER PRIMARY KEY,
+    code TEXT NOT NULL,
+    object TEXT,
+    surface TEXT,
+    label TEXT,
+    signs TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS lines_code ON lines (code);
+CREATE TABLE IF NOT EXISTS postings (
+    gram INTEGER NOT NULL,
+    line INTEGER NOT NULL,
+    PRIMARY KEY (gram, line)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_line ON postings (line);
+"""
+
+# A sign reading qualified by its sign name, e.g. ina(DIŠ): keep the reading
+_qualifier = re.compile(u'(?<=[^\\W_])([#?!*]*)\\([^()]*\\)', re.U)
+# Flags, brackets and the marks of compound signs
+_decoration = re.compile(u'[\\[\\]()#?!*$|\u2e22\u2e23]', re.U)
+# Omitted or excised signs in <> and <<>> are signs of their own
+_separator = re.compile(u'[-.:+{}<>\\s]+', re.U)
+# In queries, /.../ is a regular expression for one sign
+_query_token = re.compile(u'/([^/]*)/|([^-.:+{}\\s/]+)', re.U)
+
+LONGEST = 3
+
+
+def signs(word):
+    """
+    Split a transliterated word into its signs, lower case and without
+    flags or brackets, e.g. [{m}]{d}60--EN-šu₂-nu gives m, d, 60, en, šu₂
+    and nu.
+    """
+    word = _qualifier.sub(u'\\1', word)
+    word = _decoration.sub(u'', word)
+    return [sign.lower() for sign in _separator.split(word) if sign]
+
+
+def _line_signs(line):
+    result = []
+    for word in line.words:
+        if word:
+            result.extend(signs(word))
+    return result
+
+
+def _grams(sequence):
+    for size in range(1, LONGEST + 1):
+        for start in range(len(sequence) - size + 1):
+            yield u' '.join(sequence[start:start + size])
+
+
+def _full_match(pattern):
+    return re.compile(u'(?:{})\\Z'.format(pattern), re.U)
+
+
+def parse_query(query):
+    """
+    Turn a query into a list of signs to match in order. Each is a string
+    to match exactly or a compiled expression for one sign. Signs are
+    separated as in transliteration; * and ? in a sign are wildcards, and
+    /.../ is a regular expression, e.g. "a-na {d}utu", "a-* {d}utu" or
+    "/šu[₂₃]?/-nu".
+    """
+    pattern = []
+    for match in _query_token.finditer(query):
+        expression, literal = match.groups()
+        if expression is not None:
+            pattern.append(_full_match(expression))
+        elif u'*' in literal or u'?' in literal:
+            pattern.append(_full_match(fnmatch.translate(literal.lower())))
+        else:
+            pattern.extend(signs(literal))
+    return pattern
+
+
+def _literal_runs(pattern):
+    run = []
+    for element in pattern:
+        if isinstance(element, type(u'')):
+            run.append(element)
+        else:
+            if run:
+                yield run
+            run = []
+    if run:
+        yield run
+
+
+def matches(pattern, sequence):
+    """Whether the signs of pattern occur consecutively in sequence."""
+    size = len(pattern)
+    for start in range(len(sequence) - size + 1):
+        for element, sign in zip(pattern, sequence[start:start + size]):
+            if isinstance(element, type(u'')):
+                if element != sign:
+                    break
+            elif not element.match(sign):
+                break
+        else:
+            return True
+    return False
+
+
+class SignIndex(object):
+    """
+    An index of the sign sequences of transliteration lines, stored in an
+    SQLite database. Every run of one to three signs in a line is recorded,
+    so the lines which might match a query are those having all the runs of
+    its exact signs; those candidates are then checked against the whole
+    query. Queries made only of wildcards check every line.
+
+    Adding a text again replaces what was indexed for it.
+    """
+
+    def __init__(self, filename=':memory:'):
+        self.db = sqlite3.connect(filename)
+        self.db.executescript(_schema)
+        self.gram_ids = {}
+
+    def close(self):
+        self.db.close()
+
+    def add(self, text):
+        """Index a Text, or each text of a Composite."""
+        texts = text.texts if isinstance(text, Composite) else [text]
+        try:
+            with self.db:
+                for text in texts:
+                    self._remove(text.code)
+                    self._add(text)
+        except Exception:
+            # Grams added in the transaction are gone
+            self.gram_ids = {}
+            raise
+
+    def remove(self, code):
+        with self.db:
+            self._remove(code)
+
+    def _remove(self, code):
+        self.db.execute("DELETE FROM postings WHERE line IN "
+                        "(SELECT id FROM lines WHERE code = ?)", (code,))
+        self.db.execute("DELETE FROM lines WHERE code = ?", (code,))
+
+    def _add(self, text):
+        postings = []
+        cursor = self.db.cursor()
+        for obj, surface, line in _text_lines(text):
+            sequence = _line_signs(line)
+            cursor.execute("INSERT INTO lines (code, object, surface, label, "
+                           "signs) VALUES (?, ?, ?, ?, ?)",
+                           (text.code, obj, surface, line.label,
+                            u' '.join(sequence)))
+            line_id = cursor.lastrowid
+            for gram in set(_grams(sequence)):
+                postings.append((self._gram_id(gram), line_id))
+        self.db.executemany("INSERT INTO postings VALUES (?, ?)", postings)
+
+    def _gram_id(self, gram, create=True):
+        if gram not in self.gram_ids:
+            row = self.db.execute("SELECT id FROM grams WHERE gram = ?",
+                                  (gram,)).fetchone()
+            if row is None:
+                if not create:
+                    return None
+                row = (self.db.execute("INSERT INTO grams (gram) VALUES (?)",
+                                       (gram,)).lastrowid,)
+            self.gram_ids[gram] = row[0]
+        return self.gram_ids[gram]
+
+    def candidates(self, pattern):
+        """
+        The lines which have every run of up to three exact signs in pattern,
+        as rows of id, code, object, surface, label and signs.
+        """
+        grams = set()
+        for run in _literal_runs(pattern):
+            size = min(len(run), LONGEST)
+            for start in range(len(run) - size + 1):
+                grams.add(u' '.join(run[start:start + size]))
+        columns = "SELECT id, code, object, surface, label, signs FROM lines"
+        if not grams:
+            return self.db.execute(columns + " ORDER BY id")
+        ids = [self._gram_id(gram, create=False) for gram in grams]
+        if None in ids:
+            return []
+        return self.db.execute(
+            columns + " WHERE id IN (SELECT line FROM postings WHERE gram IN "
+            "({}) GROUP BY line HAVING COUNT(*) = ?) ORDER BY id".format(
+                ", ".join("?" * len(ids))), ids + [len(ids)])
+
+    def search(self, query):
+        """The lines whose signs match query; see parse_query."""
+        pattern = parse_query(query)
+        if not pattern:
+            return []
+        return [Hit(*row[1:5]) for row in self.candidates(pattern)
+                if matches(pattern, row[5].split(u' '))]
@@ -0,0 +1,236 @@
+'''
+Copyright 2015, 2016 University College London.
+
+This file is part of PyORACC.
+
+PyORACC is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyORACC is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyORACC. If not, see <http://www.gnu.org/licenses/>.
+'''
+
+
+from collections import namedtuple
+import sqlite3
+
+from ..model.composite import Composite
+from ..model.line import Line
+from ..model.multilingual import Multilingual
+from ..model.oraccobject import OraccObject
+from ..model.translation import Translation
+from ..model.visitor import walk
+
+
+# A transliteration line found by a query: the code of its text, the object
+# and surface it is on (e.g. "tablet", "obverse") and its label
+Hit = namedtuple('Hit', ['code', 'object', 'surface', 'label'])
+
+WORD = 'word'
+LEMMA = 'lemma'
+
+_schema = """
+CREATE TABLE IF NOT EXISTS terms (
+    id INTEGER PRIMARY KEY,
+    field TEXT NOT NULL,
+    term TEXT NOT NULL,
+    UNIQUE (field, term));
+CREATE TABLE IF NOT EXISTS lines (
+    id INTEGER PRIMARY KEY,
+    code TEXT NOT NULL,
+    object TEXT,
+    surface TEXT,
+    label TEXT);
+CREATE INDEX IF NOT EXISTS lines_code ON lines (code);
+CREATE TABLE IF NOT EXISTS postings (
+    term INTEGER NOT NULL,
+    line INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (term, line, position)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_line ON postings (line);
+"""
+
+
+def _object_name(node):
+    name = node.objecttype
+    if getattr(node, 'name', None):
+        name += u' ' + node.name
+    return name
+
+
+def _text_lines(node):
+    """
+    Yield the object, surface and Line of each transliteration line below
+    node, in document order. Translations are left out; for a multilingual
+    line only the main line is given.
+    """
+    ancestors = []
+    for child in walk(node, _leaf, ancestors):
+        if type(child) is Multilingual:
+            child = child.lines.get(None)
+        if isinstance(child, Line):
+            names = [_object_name(ancestor) for ancestor in ancestors
+                     if isinstance(ancestor, OraccObject)]
+            obj, surface = (names + [None, None])[:2]
+            yield obj, surface, child
+
+
+def _leaf(node):
+    # Nothing below these holds transliteration lines
+    return isinstance(node, (Line, Multilingual, Translation))
+
+
+class WordIndex(object):
+    """
+    An inverted index of the words and lemmas of transliteration lines,
+    stored in an SQLite database. Postings record the position of each word
+    in its line, so phrases can be matched.
+
+    Texts are added one at a time, so the index can be kept up to date as
+    files are parsed; adding a text again replaces what was indexed for it.
+    Query terms are plain strings, which match words, or (field, term)
+    pairs where field is WORD or LEMMA.
+    """
+
+    def __init__(self, filename=':memory:'):
+        self.db = sqlite3.connect(filename)
+        self.db.executescript(_schema)
+        self.term_ids = {}
+
+    def close(self):
+        self.db.close()
+
+    def add(self, text):
+        """Index a Text, or each text of a Composite."""
+        texts = text.texts if isinstance(text, Composite) else [text]
+        try:
+            with self.db:
+                for text in texts:
+                    self._remove(text.code)
+                    self._add(text)
+        except Exception:
+            # Terms added in the transaction are gone
+            self.term_ids = {}
+            raise
+
+    def remove(self, code):
+        with self.db:
+            self._remove(code)
+
+    def _remove(self, code):
+        self.db.execute("DELETE FROM postings WHERE line IN "
+                        "(SELECT id FROM lines WHERE code = ?)", (code,))
+        self.db.execute("DELETE FROM lines WHERE code = ?", (code,))
+
+    def _add(self, text):
+        postings = []
+        cursor = self.db.cursor()
+        for obj, surface, line in _text_lines(text):
+            cursor.execute("INSERT INTO lines (code, object, surface, label) "
+                           "VALUES (?, ?, ?, ?)",
+                           (text.code, obj, surface, line.label))
+            line_id = cursor.lastrowid
+            for field, terms in ((WORD, line.words), (LEMMA, line.lemmas)):
+                for position, term in enumerate(terms):
+                    term = term and term.strip()
+                    if term:
+                        postings.append((self._term_id(field, term),
+                                         line_id, position))
+        self.db.executemany("INSERT OR IGNORE INTO postings VALUES (?, ?, ?)",
+                            postings)
+
+    def _term_id(self, field, term, create=True):
+        key = (field, term)
+        if key not in self.term_ids:
+            row = self.db.execute("SELECT id FROM terms WHERE field = ? AND "
+                                  "term = ?", key).fetchone()
+            if row is None:
+                if not create:
+                    return None
+                row = (self.db.execute("INSERT INTO terms (field, term) "
+                                       "VALUES (?, ?)", key).lastrowid,)
+            self.term_ids[key] = row[0]
+        return self.term_ids[key]
+
+    def _term_ids(self, terms):
+        ids = []
+        for term in terms:
+            if isinstance(term, tuple):
+                ids.append(self._term_id(term[0], term[1], create=False))
+            else:
+                ids.append(self._term_id(WORD, term, create=False))
+        return ids
+
+    def lines(self):
+        """
+        Yield the code, label, words and lemmas of each indexed line, read
+        back from the postings, in the order the lines were added.
+        """
+        rows = self.db.execute(
+            "SELECT lines.id, code, label, field, terms.term, position "
+            "FROM lines JOIN postings ON postings.line = lines.id "
+            "JOIN terms ON terms.id = postings.term "
+            "ORDER BY lines.id, position")
+        current = None
+        for line_id, code, label, field, term, position in rows:
+            if line_id != current:
+                if current is not None:
+                    yield line
+                current = line_id
+                line = (code, label, [], [])
+            terms = line[2] if field == WORD else line[3]
+            terms.extend([u''] * (position - len(terms)))
+            terms.append(term)
+        if current is not None:
+            yield line
+
+    def _hits(self, query, arguments):
+        return [Hit(*row) for row in self.db.execute(
+            "SELECT code, object, surface, label FROM lines WHERE id IN "
+            "({}) ORDER BY id".format(query), arguments)]
+
+    def find(self, term):
+        """The lines containing term."""
+        return self.any_of([term])
+
+    def any_of(self, terms):
+        """The lines containing at least one of terms."""
+        ids = [term for term in self._term_ids(terms) if term is not None]
+        if not ids:
+            return []
+        return self._hits("SELECT line FROM postings WHERE term IN ({})"
+                          .format(", ".join("?" * len(ids))), ids)
+
+    def all_of(self, terms):
+        """The lines containing every one of terms."""
+        ids = set(self._term_ids(terms))
+        if not ids or None in ids:
+            return []
+        return self._hits("SELECT line FROM postings WHERE term IN ({}) "
+                          "GROUP BY line HAVING COUNT(DISTINCT term) = ?"
+                          .format(", ".join("?" * len(ids))),
+                          list(ids) + [len(ids)])
+
+    def phrase(self, terms):
+        """
+        The lines containing terms at consecutive positions. Words and lemmas
+        share positions, so a phrase can mix the two.
+        """
+        ids = self._term_ids(terms)
+        if not ids or None in ids:
+            return []
+        joins = []
+        for number in range(1, len(ids)):
+            joins.append("JOIN postings AS p{0} ON p{0}.line = p0.line AND "
+                         "p{0}.position = p0.position + {0} AND "
+                         "p{0}.term = ?".format(number))
+        return self._hits("SELECT p0.line FROM postings AS p0 {} "
+                          "WHERE p0.term = ?".format(" ".join(joins)),
+                          ids[1:] + ids[:1])
@@ -24,6 +24,8 @@ from mako.template import Template
 class Comment(object):
     template = Template("""# ${content}""")
 
+    span = None
+
     def __init__(self, content):
         self.content = content
         self.check = False
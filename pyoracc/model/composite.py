@@ -19,5 +19,18 @@ along with PyORACC. If not, see <http://www.gnu.org/licenses/>.
 
 
 class Composite(object):
+    span = None
+
     def __init__(self):
         self.texts = []
+
+    def __reduce__(self):
+        # Pickled as one flat structure rather than node by node
+        from .flat import reduce_tree
+        return reduce_tree(self)
+
+    def __copy__(self):
+        # A shallow copy, which copy would otherwise make with __reduce__
+        copied = Composite.__new__(type(self))
+        copied.__dict__.update(self.__dict__)
+        return copied
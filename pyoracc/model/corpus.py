@@ -22,15 +22,59 @@ from __future__ import print_function
 import sys
 import os
 import codecs
-from ..atf.atffile import AtfFile
+from collections import deque
+import itertools
+import pickle
+import signal
+import time
+import uuid
+import weakref
+from ..atf.atffile import AtfFile, _reset_lexer, iter_texts
+from ..atf.atflex import AtfLexer
+from ..atf.atfyacc import AtfParser
+from ..index.codes import CodeIndex
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+try:
+    import multiprocessing
+except ImportError:
+    # Not available on Jython: parse in this process
+    multiprocessing = None
+
+try:
+    from multiprocessing import resource_tracker, shared_memory
+except ImportError:
+    # Python 3.8 and later only: results go through the pool's pipes
+    shared_memory = None
+
+try:
+    import resource
+except ImportError:
+    # Not on Windows: worker memory is not limited
+    resource = None
 
 
 class Corpus(object):
     def __init__(self, pattern="*.atf", **kwargs):
+        """
+        Parse every .atf file below source. With lazy, nothing is parsed up
+        front and texts are read one at a time with get(). index names a file
+        to keep the code index used by get() in between runs; it is built the
+        first time it is needed.
+        """
         self.texts = []
         self.failures = 0
         self.successes = 0
-        if 'source' in kwargs:
+        self.source = kwargs.get('source')
+        self.index_file = kwargs.get('index')
+        self.index = None
+        self.lexer = None
+        self.parser = None
+        if 'source' in kwargs and not kwargs.get('lazy'):
             for dirpath, _, files in os.walk(kwargs['source']):
                 for file in files:
                     if file.endswith('.atf'):
@@ -49,6 +93,468 @@ class Corpus(object):
                             self.failures += 1
                             print("Failed with message: '{}'".format(e))
 
+    def _code_index(self):
+        if self.index is None:
+            if self.index_file and os.path.exists(self.index_file):
+                self.index = CodeIndex.load(self.index_file, self.source)
+            else:
+                self.index = CodeIndex.build(self.source)
+                if self.index_file:
+                    self.index.save(self.index_file)
+        return self.index
+
+    def codes(self):
+        """The codes of the texts in the corpus, in file order."""
+        index = self._code_index()
+        return sorted(index.entries, key=lambda code: (index[code].path,
+                                                       index[code].offset))
+
+    def get(self, code):
+        """
+        Parse just the text with the given code (e.g. P229574), using an
+        index of where each text is in the corpus. Raises KeyError if there
+        is no such text.
+        """
+        content, lineno = self._code_index().read(code)
+        if content[-1] != '\n':
+            content += "\n"
+        if self.parser is None:
+            self.lexer = AtfLexer().lexer
+            self.parser = AtfParser().parser
+        return self.parser.parse(content,
+                                 lexer=_reset_lexer(self.lexer, lineno))
+
+
+def atf_paths(source):
+    """The .atf files below source, in a stable order."""
+    paths = []
+    for dirpath, dirnames, files in os.walk(source):
+        dirnames.sort()
+        paths.extend(os.path.join(dirpath, file) for file in sorted(files)
+                     if file.endswith('.atf'))
+    return paths
+
+
+def parse_file(task):
+    """
+    Parse the ATF file at path one text at a time, returning path, the
+    results of func for each text, or the texts themselves if func is None,
+    and the message of the error which stopped the parse, if any.
+
+    task is the pair (path, func), so that this can be mapped over a pool.
+    """
+    path, func = task
+    results = []
+    try:
+        for text in iter_texts(path):
+            results.append(text if func is None else func(text))
+    except (SyntaxError, IndexError, AttributeError,
+            UnicodeDecodeError) as error:
+        return path, results, u"{}".format(error)
+    return path, results, None
+
+
+def _to_shared(result, name):
+    """
+    Leave the texts of a result of parse_file in a new shared memory
+    segment called name, in the binary format, and give the result with the
+    name and where each text starts and ends in it in their place. If this
+    fails, the segment is freed.
+    """
+    from ..export.binary import dumps
+    path, texts, error = result
+    if not texts:
+        return path, None, error
+    encoded = [dumps(text) for text in texts]
+    offsets = [0]
+    for data in encoded:
+        offsets.append(offsets[-1] + len(data))
+    segment = shared_memory.SharedMemory(name, create=True, size=offsets[-1])
+    try:
+        for data, start in zip(encoded, offsets):
+            segment.buf[start:start + len(data)] = data
+    except BaseException:
+        segment.unlink()
+        raise
+    finally:
+        segment.close()
+    if os.name == 'posix':
+        # The segment outlives this worker: the parent frees it
+        resource_tracker.unregister(segment._name, 'shared_memory')
+    return path, (name, offsets), error
+
+
+def _release(segment):
+    segment.close()
+    segment.unlink()
+
+
+def _free(name):
+    """Free the shared memory segment called name, if there is one."""
+    try:
+        segment = shared_memory.SharedMemory(name)
+    except (OSError, ValueError):
+        return
+    _release(segment)
+
+
+class SharedTexts(object):
+    """
+    The texts of a file which a worker left in shared memory. Each is only
+    decoded when first used. The segment is freed by close(), or once this
+    is garbage.
+    """
+
+    def __init__(self, handle):
+        name, self.offsets = handle
+        self.segment = shared_memory.SharedMemory(name)
+        self.texts = [None] * (len(self.offsets) - 1)
+        self._finalizer = weakref.finalize(self, _release, self.segment)
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.texts)
+        text = self.texts[index]
+        if text is None:
+            from ..export.binary import loads
+            start, end = self.offsets[index], self.offsets[index + 1]
+            text = self.texts[index] = loads(
+                bytes(self.segment.buf[start:end]))
+        return text
+
+    def __iter__(self):
+        for index in range(len(self.texts)):
+            yield self[index]
+
+    def close(self):
+        """Free the segment; texts not decoded yet are lost."""
+        self._finalizer()
+
+
+def schedule(paths, workers, most=None, largest=True):
+    """
+    Split paths into batches for a pool of workers to take one at a time,
+    largest files first, or in the order given if largest is false. Each
+    batch is about a 2 * workers-th part of the bytes left, so large files go
+    alone and small ones are grouped, in batches which get smaller towards
+    the end of the run so that the workers finish at about the same time.
+    No batch has more than most files.
+    """
+    sizes = dict((path, os.path.getsize(path)) for path in paths)
+    if largest:
+        paths = sorted(paths, key=lambda path: (-sizes[path], path))
+    remaining = sum(sizes.values())
+    batches = []
+    position = 0
+    while position < len(paths):
+        target = remaining / (2.0 * workers)
+        batch, size = [], 0
+        while position < len(paths) and len(batch) != most and \
+                (not batch or size + sizes[paths[position]] <= target):
+            batch.append(paths[position])
+            size += sizes[paths[position]]
+            position += 1
+        batches.append(batch)
+        remaining -= size
+    return batches
+
+
+# How long past twice its timeout to wait for a file before giving its
+# worker up for lost
+GRACE = 10.0
+
+
+class _Timeout(Exception):
+    pass
+
+
+def _on_alarm(signum, frame):
+    raise _Timeout()
+
+
+def _start_worker(timeout, memory):
+    """Set up the limits on each file in a new worker process."""
+    if timeout and hasattr(signal, 'setitimer'):
+        signal.signal(signal.SIGALRM, _on_alarm)
+    if memory and resource is not None:
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        resource.setrlimit(resource.RLIMIT_AS, (memory, hard))
+
+
+def _parse_batch(task):
+    """
+    Parse a batch of files as parse_file does, returning the ID of this
+    process, for each file what parse_file gives and the time taken, and the
+    files left unparsed. With names, the name of a shared memory segment
+    for each file, the texts are left in those as by _to_shared. With
+    pickled, what is given for each file is pickled here, so that a result
+    too large to send fails on its own.
+
+    With a timeout, a file which takes longer than that many seconds is
+    given up on. That, or running out of memory, is reported as the file's
+    error and ends the batch, so that the worker is not used for more files.
+    """
+    paths, func, names, timeout, pickled = task
+    timer = timeout and hasattr(signal, 'setitimer')
+    done = []
+    for position, path in enumerate(paths):
+        start = time.time()
+        try:
+            if timer:
+                signal.setitimer(signal.ITIMER_REAL, timeout)
+            try:
+                result = parse_file((path, func))
+            finally:
+                if timer:
+                    signal.setitimer(signal.ITIMER_REAL, 0)
+            # Not timed, so as not to be stopped with a segment half made
+            if names is not None:
+                result = _to_shared(result, names[position])
+            result += (time.time() - start,)
+            if pickled:
+                result = pickle.dumps(result, pickle.HIGHEST_PROTOCOL)
+        except _Timeout:
+            error = u"Timed out after {:.1f}s".format(time.time() - start)
+        except MemoryError:
+            result = None
+            if names is not None:
+                _free(names[position])
+            error = u"Ran out of memory after {:.1f}s".format(
+                time.time() - start)
+        else:
+            done.append(result)
+            continue
+        result = (path, [], error, time.time() - start)
+        done.append(pickle.dumps(result, pickle.HIGHEST_PROTOCOL)
+                    if pickled else result)
+        return os.getpid(), done, paths[position + 1:]
+    return os.getpid(), done, []
+
+
+class RunStats(object):
+    """
+    How a run of iter_corpus went: how long it took, how long each worker
+    process was busy parsing and how long each file took.
+    """
+
+    def __init__(self):
+        self.elapsed = 0.0
+        self.busy = {}
+        self.times = {}
+
+    def add(self, worker, path, seconds):
+        self.busy[worker] = self.busy.get(worker, 0.0) + seconds
+        self.times[path] = seconds
+
+    def utilisation(self):
+        """The part of the run each worker was busy, by process ID."""
+        return dict((worker, busy / self.elapsed if self.elapsed else 0.0)
+                    for worker, busy in self.busy.items())
+
+
+def iter_corpus(source, func=None, processes=None, shared=False,
+                stats=None, timeout=None, memory=None, recycle=None,
+                ordered=True):
+    """
+    Yield what parse_file gives for each .atf file below source.
+
+    The files are parsed by a pool of processes worker processes, by
+    default one for each CPU, or in this process if processes is 1. func is
+    applied to each text in the worker, so that only its results, rather
+    than the whole model, are sent back; it must be a module level function
+    so that it can be pickled. Files are handed to workers in batches made
+    by schedule(), one batch to each worker as it becomes free.
+
+    The results are given in file order, the batches going out in that
+    order, smaller than otherwise, and no more than 2 * processes of them
+    ahead of the first file not given yet, so that results start coming
+    soon and few are held back. With ordered false, the largest files go
+    first, so that one does not hold up the end of the run, and each result
+    is given as soon as it comes back.
+
+    With shared, and no func, workers hand the texts back in shared memory
+    rather than through a pipe, and each file's texts are a SharedTexts;
+    where shared memory is not available this is ignored. Pass a RunStats
+    as stats to have it filled in as the run goes.
+
+    timeout, in seconds, and memory, in bytes of address space, limit each
+    worker process as it parses a file; a file which goes over is a failure
+    and its worker is replaced. With recycle, each worker is replaced after
+    at most that many files. Any of these means the files are parsed in
+    worker processes, even if processes is 1. The limits are only enforced
+    where the platform has setitimer and setrlimit.
+
+    A batch which fails in its worker, as when its results are too large
+    to send back, is tried again one file at a time, and a file which fails
+    on its own is a failure. With a timeout, so is a file whose worker has
+    not answered after twice its timeout and GRACE seconds more, as when
+    the worker was killed outright; without one, such a worker stops the
+    run.
+    """
+    if shared and func is not None:
+        raise ValueError("Only texts can be handed back in shared memory")
+    if stats is None:
+        stats = RunStats()
+    start = time.time()
+    paths = atf_paths(source)
+    limited = timeout or memory or recycle
+    if multiprocessing is None or (processes == 1 and not limited):
+        for path in paths:
+            worker, done, _ = _parse_batch(([path], func, None, None,
+                                            False))
+            stats.add(worker, path, done[0][3])
+            stats.elapsed = time.time() - start
+            yield done[0][:3]
+        return
+    workers = processes or multiprocessing.cpu_count()
+    names = None
+    if shared and shared_memory is not None:
+        # Segments are named here, so that those of results which are
+        # never handed on can be found and freed. A file tried again gets a
+        # new name, in case its first worker still makes a segment
+        prefix = 'oracc{}'.format(uuid.uuid4().hex[:12])
+        names = {}
+    serials = itertools.count()
+    stale = []
+    # Batches to hand out, each with whether it is files tried again. In
+    # file order they are made smaller, so that results come back soon
+    pending = deque((batch, False) for batch in
+                    schedule(paths, workers * 4 if ordered else workers,
+                             recycle, not ordered))
+    # The batches handed out and not back yet, by number, each with its
+    # files and when it was handed out
+    running = {}
+    # The number of files of each batch handed out which are not given yet
+    held = {}
+    owners = {}
+    # Results which came back before those of the files before them
+    waiting = {}
+    given = set()
+    position = 0
+    # Told the number of each batch which comes back, or fails
+    finished = queue.Queue()
+    # With limits, each batch gets a new worker, so that one which went
+    # over a limit parses nothing more
+    pool = multiprocessing.Pool(processes, _start_worker, (timeout, memory),
+                                1 if limited else None)
+
+    def submit(batch):
+        number = next(serials)
+        held[number] = len(batch)
+        for path in batch:
+            owners[path] = number
+        if names is not None:
+            for index, path in enumerate(batch):
+                if path in names:
+                    stale.append(names[path])
+                names[path] = '{}_{}_{}'.format(prefix, number, index)
+        task = (batch, func,
+                [names[path] for path in batch] if names else None, timeout,
+                True)
+
+        def done(_):
+            finished.put(number)
+        callbacks = {'callback': done}
+        if sys.version_info[0] > 2:
+            callbacks['error_callback'] = done
+        running[number] = (
+            pool.apply_async(_parse_batch, (task,), **callbacks), batch,
+            time.time())
+
+    def fail(batch, error, seconds):
+        if len(batch) > 1:
+            owner = owners[batch[0]]
+            held[owner] -= len(batch)
+            if not held[owner]:
+                del held[owner]
+            pending.extendleft(([path], True) for path in reversed(batch))
+            return []
+        stats.times[batch[0]] = seconds
+        waiting[batch[0]] = (batch[0], [], error)
+        return batch
+
+    try:
+        while True:
+            # Files tried again are not held back, as those after them are
+            # waiting for them
+            while pending and len(running) < workers and \
+                    (not ordered or len(held) < 2 * workers or
+                     pending[0][1]):
+                submit(pending.popleft()[0])
+            if not running:
+                break
+            try:
+                # Errors are only told on Python 3: look now and then
+                finished.get(timeout=1.0)
+            except queue.Empty:
+                pass
+            now = time.time()
+            stats.elapsed = now - start
+            arrived = []
+            for number in sorted(running):
+                result, batch, started = running[number]
+                if not result.ready():
+                    if timeout and \
+                            now > started + 2 * timeout * len(batch) + GRACE:
+                        del running[number]
+                        arrived.extend(fail(
+                            batch, u"Worker lost after {:.1f}s".format(
+                                now - started), now - started))
+                    continue
+                del running[number]
+                try:
+                    worker, done, rest = result.get()
+                except Exception as error:
+                    arrived.extend(fail(batch, u"Failed in a worker: {!r}"
+                                        .format(error), 0.0))
+                    continue
+                for data in done:
+                    path, texts, error, seconds = pickle.loads(data)
+                    stats.add(worker, path, seconds)
+                    if names:
+                        texts = SharedTexts(texts) if texts else []
+                    waiting[path] = (path, texts, error)
+                    arrived.append(path)
+                if rest:
+                    # The files after one which went over a limit
+                    held[owners[rest[0]]] -= len(rest)
+                    pending.appendleft((rest, True))
+            if ordered:
+                ready = []
+                while position < len(paths) and paths[position] in waiting:
+                    ready.append(paths[position])
+                    position += 1
+            else:
+                ready = arrived
+            for path in ready:
+                owner = owners[path]
+                held[owner] -= 1
+                if not held[owner]:
+                    del held[owner]
+                result = waiting.pop(path)
+                # Counted first: once yielded, the result is not ours
+                given.add(path)
+                yield result
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+        if names:
+            # Free the texts of the files not handed on, whether they came
+            # back, were never collected or were left by a stopped worker
+            for path in paths:
+                if path in given:
+                    continue
+                if path in waiting and waiting[path][1]:
+                    waiting[path][1].close()
+                if path in names:
+                    _free(names[path])
+            for name in stale:
+                _free(name)
+
 
 if __name__ == '__main__':
     corpus = Corpus(source=sys.argv[1])
@@ -0,0 +1,150 @@
+'''
+Copyright 2015, 2016 University College London.
+
+This file is part of PyORACC.
+
+PyORACC is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyORACC is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyORACC. If not, see <http://www.gnu.org/licenses/>.
+
+The compact form Text and Composite are pickled in. Pickling a tree node
+by node writes the class and the __dict__ of every node; instead the tree
+is flattened into plain tuples, which pickle writes with little overhead,
+and rebuilt when unpickled. The pickles are about a third smaller, but
+flattening in Python takes more time than the C pickler saves, so a round
+trip is slower than node by node.
+'''
+
+
+from .layout import LAYOUTS, NUMBERS, VERSION
+from .span import Span
+
+# Containers holding nodes are written as tuples starting with one of these;
+# lists and dicts of plain values are left as they are, so they need no
+# rebuilding. Nodes are tuples starting with their number in CLASSES,
+# followed by their fields, their span and, if they have attributes beyond
+# those, a dict of them.
+_TUPLE, _LIST, _DICT = -1, -2, -3
+
+_strings = frozenset([type(u''), str])
+_containers = frozenset([list, dict, tuple])
+
+
+def _flatten(value, share):
+    # share is the setdefault of a dict of the strings seen so far
+    kind = type(value)
+    if kind is list:
+        items = []
+        nodes = False
+        for item in value:
+            if type(item) in _strings:
+                item = share(item, item)
+            else:
+                item = _flatten(item, share)
+                nodes = nodes or type(item) is tuple
+            items.append(item)
+        return (_LIST,) + tuple(items) if nodes else items
+    if kind is dict:
+        items = [(_flatten(key, share), _flatten(item, share))
+                 for key, item in value.items()]
+        if any(type(key) is tuple or type(item) is tuple
+               for key, item in items):
+            return (_DICT,) + tuple(part for pair in items for part in pair)
+        return dict(items)
+    if kind is tuple:
+        return (_TUPLE,) + tuple(_flatten(item, share) for item in value)
+    number = NUMBERS.get(kind)
+    if number is not None:
+        fields = LAYOUTS[number][1]
+        record = [number]
+        for name in fields:
+            item = getattr(value, name)
+            kind = type(item)
+            if kind in _strings:
+                item = share(item, item)
+            elif kind in _containers or kind in NUMBERS:
+                # Most lists are empty: skip the call for those
+                item = _flatten(item, share) if item else kind()
+            record.append(item)
+        values = value.__dict__
+        span = values.get('span')
+        record.append(tuple(span) if span is not None else None)
+        if len(values) > len(fields) + (span is not None):
+            extra = _extra(values, fields)
+            if extra:
+                record.append(_flatten(extra, share))
+        return tuple(record)
+    if kind in _strings:
+        # Equal strings become one object, so pickle writes each once and
+        # refers back to it after
+        return share(value, value)
+    return value
+
+
+def _extra(values, fields):
+    """
+    The attributes in values other than fields and the span, leaving out
+    those starting with an underscore, which are caches such as the label
+    index of a Text.
+    """
+    known = set(fields)
+    known.add('span')
+    return dict((name, item) for name, item in values.items()
+                if name not in known and not name.startswith('_'))
+
+
+def flatten(node):
+    """
+    A model tree as nested tuples: each node is its number in CLASSES
+    followed by its field values, then its span and any other attributes.
+    """
+    return (VERSION, _flatten(node, {}.setdefault))
+
+
+def _restore(value):
+    """Rebuild a tuple made by _flatten."""
+    number = value[0]
+    if number >= 0:
+        cls, fields = LAYOUTS[number]
+        node = cls.__new__(cls)
+        end = len(fields) + 1
+        node.__dict__ = values = dict(zip(fields, [
+            _restore(item) if type(item) is tuple else item
+            for item in value[1:end]]))
+        if value[end] is not None:
+            values['span'] = Span(*value[end])
+        if len(value) > end + 1:
+            extra = value[-1]
+            values.update(_restore(extra) if type(extra) is tuple else extra)
+        return node
+    items = [_restore(item) if type(item) is tuple else item
+             for item in value[1:]]
+    if number == _LIST:
+        return items
+    if number == _DICT:
+        return dict(zip(items[::2], items[1::2]))
+    return tuple(items)
+
+
+def unflatten(flat):
+    """The tree flatten() made flat."""
+    version, value = flat
+    if version != VERSION:
+        raise ValueError(u"Cannot unpickle a model pickled with format "
+                         u"version {}; this is version {}".format(
+                             version, VERSION))
+    return _restore(value) if type(value) is tuple else value
+
+
+def reduce_tree(node):
+    """What __reduce__ gives for the root of a model tree."""
+    return unflatten, (flatten(node),)
@@ -0,0 +1,162 @@
+'''
+Copyright 2015, 2016 University College London.
+
+This file is part of PyORACC.
+
+PyORACC is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyORACC is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyORACC. If not, see <http://www.gnu.org/licenses/>.
+'''
+
+
+import re
+import weakref
+
+from .composite import Composite
+from .line import Line
+from .link_reference import LinkReference
+from .multilingual import Multilingual
+from .oraccobject import OraccObject
+from .text import Text
+from .visitor import children, walk
+
+
+# The parent of each linked node, by weak reference. These are kept outside
+# the nodes so that linked trees can still be pickled, and do not change
+# what a node serializes to.
+_parents = weakref.WeakKeyDictionary()
+
+_unsafe = re.compile(u'[.\\s]+', re.U)
+
+
+def link_parents(root):
+    """
+    Record the parent of every node below root, so that parent() and
+    node_id() work for them. IDs computed before are forgotten, so call this
+    again after changing the tree. Returns root.
+    """
+    ancestors = []
+    for node in walk(root, ancestors=ancestors):
+        if ancestors:
+            _parents[node] = weakref.ref(ancestors[-1])
+        node.__dict__.pop('_node_id', None)
+    return root
+
+
+def parent(node):
+    """The node above node, or None if there is none or it is not linked."""
+    reference = _parents.get(node)
+    return reference() if reference is not None else None
+
+
+def ancestors(node):
+    """The nodes above node, outermost first."""
+    result = []
+    node = parent(node)
+    while node is not None:
+        result.append(node)
+        node = parent(node)
+    result.reverse()
+    return result
+
+
+def context(node):
+    """
+    The text, object and surface node is on, each None if it has none, e.g.
+    for a line found by a query or an index.
+    """
+    text, obj, surface = None, None, None
+    for ancestor in ancestors(node):
+        if isinstance(ancestor, Text):
+            text = ancestor
+        elif isinstance(ancestor, OraccObject):
+            if obj is None:
+                obj = ancestor
+            elif surface is None:
+                surface = ancestor
+    return text, obj, surface
+
+
+def _label(label):
+    if isinstance(label, LinkReference):
+        label = u'_'.join(label.label)
+    return label
+
+
+def _segment(node, counts):
+    """The part of node's ID which tells it from its siblings."""
+    if isinstance(node, Text):
+        segment = node.code
+    elif isinstance(node, OraccObject):
+        segment = node.objecttype
+        if getattr(node, 'name', None):
+            segment += u'-' + node.name
+    elif isinstance(node, Line):
+        segment = _label(node.label)
+    elif isinstance(node, Multilingual):
+        main = node.lines.get(None)
+        segment = _label(main.label) if main is not None else None
+    else:
+        segment = None
+    if not segment:
+        # Nodes without a name of their own count among their kind
+        kind = type(node).__name__.lower()
+        counts[kind] = counts.get(kind, 0) + 1
+        segment = u'{}{}'.format(kind, counts[kind])
+    return _unsafe.sub(u'_', u'{}'.format(segment))
+
+
+def _name_children(node, prefix):
+    if isinstance(node, Multilingual):
+        named = [(line, language or u'main')
+                 for language, line in node.lines.items()]
+    else:
+        counts = {}
+        named = [(child, _segment(child, counts))
+                 for child in children(node)]
+    used = set()
+    for child, segment in named:
+        if segment in used:
+            # Repeated labels are told apart by their order
+            number = 2
+            while u'{}~{}'.format(segment, number) in used:
+                number += 1
+            segment = u'{}~{}'.format(segment, number)
+        used.add(segment)
+        child._node_id = prefix + u'.' + segment if prefix else segment
+
+
+def node_id(node):
+    """
+    A hierarchical ID for node, such as P229574.tablet.obverse.3 for a line
+    or P229574.tablet.obverse.state1 for a node without a label of its own.
+    IDs are computed for all the children of a node at once and cached on
+    them, so this takes constant time on average; they stay the same while
+    the text does, so they can be used to join analyses stored separately.
+    The tree must have been linked with link_parents.
+    """
+    if '_node_id' not in node.__dict__:
+        above = parent(node)
+        if above is None or isinstance(above, Composite):
+            node._node_id = _segment(node, {})
+        else:
+            _name_children(above, node_id(above))
+            if '_node_id' not in node.__dict__:
+                raise ValueError(u"The node is no longer a child of its "
+                                 u"parent; link the tree again")
+    return node._node_id
+
+
+def id_map(root):
+    """A dictionary of the nodes of a linked tree by their IDs."""
+    return dict((node_id(node), node) for node in walk(root)
+                if not isinstance(node, Composite))
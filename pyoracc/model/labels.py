@@ -0,0 +1,236 @@
+'''
+Copyright 2015, 2016 University College London.
+
+This file is part of PyORACC.
+
+PyORACC is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyORACC is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyORACC. If not, see <http://www.gnu.org/licenses/>.
+'''
+
+
+import itertools
+import re
+
+from .line import Line
+from .link_reference import LinkReference
+from .multilingual import Multilingual
+from .oraccobject import OraccObject
+from .translation import Translation
+from .visitor import walk
+
+
+# How labels refer to each surface, as in @label r 3 or @(b.e. 2). Lines on
+# the obverse may also be referred to without the o.
+_surfaces = {
+    'obverse': [(u'o',), ()],
+    'reverse': [(u'r',)],
+    'bottom': [(u'b.e.',), (u'e.',)],
+    'edge': [(u'e.',)],
+    'left': [(u'l.e.',)],
+    'right': [(u'r.e.',)],
+    'top': [(u't.e.',)],
+}
+
+_numbered = re.compile(u'(\\d+)(.*)$', re.U)
+
+_numerals = [(1000, u'm'), (900, u'cm'), (500, u'd'), (400, u'cd'),
+             (100, u'c'), (90, u'xc'), (50, u'l'), (40, u'xl'), (10, u'x'),
+             (9, u'ix'), (5, u'v'), (4, u'iv'), (1, u'i')]
+
+
+def _roman(name):
+    """Column 2' is referred to as ii'."""
+    match = _numbered.match(name)
+    if match is None:
+        return name
+    number, numeral = int(match.group(1)), u''
+    for value, letters in _numerals:
+        while number >= value:
+            numeral += letters
+            number -= value
+    return numeral + match.group(2)
+
+
+def _prefixes(node):
+    """The ways labels can refer to an object or surface."""
+    kind = node.objecttype
+    name = getattr(node, 'name', None)
+    if kind in _surfaces:
+        return _surfaces[kind]
+    if kind == 'column':
+        return [(_roman(name),)]
+    if kind == 'seal':
+        return [(u'seal', name)]
+    if name:
+        return [(name,), ()]
+    return [()]
+
+
+def _main_label(node):
+    if isinstance(node, Multilingual):
+        node = node.lines.get(None)
+    return node.label if node is not None else None
+
+
+def _outside(node):
+    return isinstance(node, (Line, Multilingual, Translation))
+
+
+def keyed_lines(text):
+    """
+    Yield each transliteration Line or Multilingual of text with the labels
+    which refer to it, as tuples such as (u'r', u'3'), in document order.
+    """
+    ancestors = []
+    # @column follows the surface it is on, rather than being inside it
+    surface = None
+    for node in walk(text, _outside, ancestors):
+        if isinstance(node, OraccObject) and node.objecttype != 'column':
+            surface = node if node.objecttype in _surfaces else None
+        if not isinstance(node, (Line, Multilingual)):
+            continue
+        label = _main_label(node)
+        if not label:
+            continue
+        objects = [ancestor for ancestor in ancestors
+                   if isinstance(ancestor, OraccObject)]
+        prefixes = []
+        for obj in objects:
+            if obj.objecttype == 'column' and \
+                    not any(other.objecttype in _surfaces
+                            for other in objects):
+                prefixes.append(_prefixes(surface) if surface is not None
+                                else _surfaces['obverse'])
+            prefixes.append(_prefixes(obj))
+        keys = [sum(parts, ()) + (label,)
+                for parts in itertools.product(*prefixes)]
+        yield keys, node
+
+
+def _parts(label):
+    if isinstance(label, LinkReference):
+        label = label.label
+    if isinstance(label, type(u'')) or isinstance(label, str):
+        label = label.split()
+    return tuple(label)
+
+
+class LabelIndex(object):
+    """
+    The transliteration lines of a text by the labels that translations and
+    links use for them, e.g. r 3, o ii 4 or seal 1 2. Use Text.labels to get
+    one which is kept up to date.
+    """
+
+    def __init__(self, text):
+        self.lines = []
+        self.names = []
+        self.positions = {}
+        self.ids = {}
+        self.valid = True
+        # The lists the lines were found in, and their lengths, to tell when
+        # the text has changed
+        self.containers = []
+        # Where each node below text is: the list it is in, its place in it
+        # and its parent
+        places = {}
+        for node in walk(text, _outside):
+            items = getattr(node, 'children', None)
+            if isinstance(items, list):
+                self.containers.append((items, len(items)))
+                for index, item in enumerate(items):
+                    places[id(item)] = (items, index, node)
+        # For each line, the places of it and the nodes above it, to tell
+        # when one has been replaced
+        self.slots = []
+        # The label each line had
+        self.found = []
+        for keys, line in keyed_lines(text):
+            for key in keys:
+                self.positions.setdefault(key, len(self.lines))
+            self.ids[id(line)] = len(self.lines)
+            self.lines.append(line)
+            self.names.append(u' '.join(keys[0]))
+            self.found.append(keys[0][-1])
+            slots = []
+            node = line
+            while id(node) in places:
+                items, index, parent = places[id(node)]
+                slots.append((items, index, node))
+                node = parent
+            self.slots.append(slots)
+
+    def fresh(self):
+        """Whether no lines have been added, moved or removed since."""
+        return self.valid and all(len(items) == length
+                                  for items, length in self.containers)
+
+    def verify(self):
+        """
+        Whether every line still has the label and the place it had. If not,
+        the index is no longer valid.
+        """
+        self.valid = self.fresh() and all(
+            _main_label(line) == label and
+            all(items[index] is node for items, index, node in slots)
+            for line, label, slots in zip(self.lines, self.found,
+                                          self.slots))
+        return self.valid
+
+    def position(self, label):
+        """The position of the line labelled label in document order."""
+        key = _parts(label)
+        position = self.positions.get(key)
+        if position is None:
+            return None
+        if _main_label(self.lines[position]) != key[-1] or \
+                any(items[index] is not node
+                    for items, index, node in self.slots[position]):
+            # The line has been relabelled, or it or a node above it has
+            # been replaced
+            self.valid = False
+            return None
+        return position
+
+    def label(self, line):
+        """The full label of a line in the index, e.g. "o ii 3"."""
+        return self.names[self.ids[id(line)]]
+
+    def get(self, label):
+        """
+        The line labelled label, a string such as "r 3", a sequence of its
+        parts or a LinkReference, or None.
+        """
+        position = self.position(label)
+        return self.lines[position] if position is not None else None
+
+    def range(self, first, last):
+        """
+        The lines from first to last, inclusive. last may leave out the parts
+        it shares with first, as in @(r 3 - 5).
+        """
+        first, last = _parts(first), _parts(last)
+        start = self.position(first)
+        end = self.position(last)
+        if end is None and 0 < len(last) < len(first):
+            end = self.position(first[:len(first) - len(last)] + last)
+        if start is None or end is None or end < start:
+            return []
+        return self.lines[start:end + 1]
+
+    def reference(self, reference):
+        """The lines a LinkReference, possibly to a range, refers to."""
+        if reference.rangelabel:
+            return self.range(reference.label, reference.rangelabel)
+        line = self.get(reference.label)
+        return [line] if line is not None else []
@@ -0,0 +1,74 @@
+'''
+Copyright 2015, 2016 University College London.
+
+This file is part of PyORACC.
+
+PyORACC is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyORACC is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyORACC. If not, see <http://www.gnu.org/licenses/>.
+
+How the nodes of the model are laid out when saved or pickled: the
+attributes of each class, in order, and the number of each class.
+'''
+
+
+from .comment import Comment
+from .composite import Composite
+from .line import Line
+from .link import Link
+from .link_reference import LinkReference
+from .milestone import Milestone
+from .multilingual import Multilingual
+from .note import Note
+from .oraccnamedobject import OraccNamedObject
+from .oraccobject import OraccObject
+from .ruling import Ruling
+from .score import Score
+from .state import State
+from .text import Text
+from .translation import Translation
+
+
+# The attributes saved for each class, in order
+FIELDS = {
+    Composite: ['texts'],
+    Text: ['code', 'description', 'project', 'language', 'composite',
+           'links', 'score', 'children'],
+    OraccObject: ['objecttype', 'query', 'broken', 'remarkable', 'collated',
+                  'children'],
+    OraccNamedObject: ['objecttype', 'name', 'query', 'broken', 'remarkable',
+                       'collated', 'children'],
+    Line: ['label', 'words', 'lemmas', 'witnesses', 'translation', 'notes',
+           'references', 'links'],
+    Multilingual: ['lines'],
+    Translation: ['children'],
+    State: ['state', 'scope', 'extent', 'qualification', 'loose'],
+    Ruling: ['count', 'type', 'query', 'broken', 'remarkable', 'collated'],
+    Note: ['content', 'references'],
+    Comment: ['content', 'check'],
+    Link: ['label', 'code', 'description'],
+    LinkReference: ['operator', 'target', 'label', 'rangelabel', 'plus'],
+    Score: ['ttype', 'mode', 'word'],
+    Milestone: ['content'],
+}
+
+# The classes of the nodes, by their number. Only add to the end.
+CLASSES = [Composite, Text, OraccObject, OraccNamedObject, Line,
+           Multilingual, Translation, State, Ruling, Note, Comment, Link,
+           LinkReference, Score, Milestone]
+
+# Bump this whenever CLASSES or the fields of a class change
+VERSION = 1
+
+# Each class with its fields, by number, and the number of each class
+LAYOUTS = [(cls, FIELDS[cls]) for cls in CLASSES]
+NUMBERS = dict((cls, number) for number, cls in enumerate(CLASSES))
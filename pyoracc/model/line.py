@@ -19,10 +19,11 @@ along with PyORACC. If not, see <http://www.gnu.org/licenses/>.
 
 
 from mako.template import Template
+from .link_reference import LinkReference
 
 
 class Line(object):
-    template = Template("""\n${label}.\t\\
+    template = Template("""\n${head}\\
 ${' '.join(words)}\\
 % if references:
 % for reference in references:
@@ -47,6 +48,8 @@ ${link};
 % endif
 """, output_encoding='utf-8')
 
+    span = None
+
     def __init__(self, label):
         self.label = label
         self.words = []
@@ -58,7 +61,15 @@ ${link};
         self.links = []
 
     def __str__(self):
-        return self.template.render_unicode(**vars(self))
+        return self.serialize()
 
     def serialize(self):
-        return self.template.render_unicode(**vars(self))
+        return self.template.render_unicode(head=self._head(), **vars(self))
+
+    def _head(self):
+        # A labelled translation line starts "@(label) " rather than "1.\t"
+        if isinstance(self.label, LinkReference):
+            if self.label.plus:
+                return self.label.serialize() + u'\n'
+            return self.label.serialize() + u' '
+        return u'{}.\t'.format(self.label)
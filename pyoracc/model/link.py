@@ -19,6 +19,8 @@ along with PyORACC. If not, see <http://www.gnu.org/licenses/>.
 
 
 class Link(object):
+    span = None
+
     def __init__(self, label=None, code=None, description=None):
         self.label = label
         self.code = code
@@ -19,9 +19,25 @@ along with PyORACC. If not, see <http://www.gnu.org/licenses/>.
 
 
 class LinkReference(object):
+    span = None
+
     def __init__(self, operator, target):
         self.label = []
         self.rangelabel = []
         self.plus = False
         self.operator = operator
         self.target = target
+
+    def __str__(self):
+        return self.serialize()
+
+    def serialize(self):
+        label = u' '.join(self.label)
+        if self.rangelabel:
+            label += u' - ' + u' '.join(self.rangelabel)
+        if self.target is not None:
+            return u' '.join([self.operator, self.target, label])
+        # A translation line's label
+        if self.plus:
+            return u'@label+ ' + label
+        return u'@(' + label + u')'
@@ -19,5 +19,7 @@ along with PyORACC. If not, see <http://www.gnu.org/licenses/>.
 
 
 class Milestone(object):
+    span = None
+
     def __init__(self, content=""):
         self.content = content
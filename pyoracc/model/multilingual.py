@@ -19,5 +19,7 @@ along with PyORACC. If not, see <http://www.gnu.org/licenses/>.
 
 
 class Multilingual(object):
+    span = None
+
     def __init__(self):
         self.lines = {}
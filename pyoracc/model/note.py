@@ -31,6 +31,8 @@ class Note(object):
 #note: ${content}
 % endif""")
 
+    span = None
+
     def __init__(self, content=""):
         self.content = content
         self.references = []
@@ -28,6 +28,8 @@ class OraccObject(object):
 ${child.serialize()}
 % endfor""", output_encoding='utf-8')
 
+    span = None
+
     def __init__(self, objecttype):
         self.objecttype = objecttype
         self.children = []
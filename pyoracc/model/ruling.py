@@ -24,6 +24,8 @@ from mako.template import Template
 class Ruling(object):
     template = Template("""\n$ ${type} ruling""")
 
+    span = None
+
     def __init__(self, count):
         self.count = count
         self.type = self.getRulingType()
@@ -22,6 +22,8 @@ from mako.template import Template
 
 
 class Score(object):
+    span = None
+
     def __init__(self, ttype, mode, word=False):
         self.ttype = ttype
         self.mode = mode
@@ -39,6 +39,8 @@ ${loose}\\
 % endif
 """)
 
+    span = None
+
     def __init__(self, state=None, scope=None, extent=None,
                  qualification=None, loose=None):
         self.state = state
@@ -30,6 +30,9 @@ class Text(object):
 ${child.serialize()}
 % endfor""")
 
+    span = None
+    _labels = None
+
     def __init__(self):
         self.children = []
         self.composite = False
@@ -46,5 +49,37 @@ ${child.serialize()}
     def serialize(self):
         return Text.template.render_unicode(**vars(self))
 
+    def __reduce__(self):
+        # Pickled as one flat structure rather than node by node
+        from .flat import reduce_tree
+        return reduce_tree(self)
+
+    def __copy__(self):
+        # A shallow copy, which copy would otherwise make with __reduce__
+        copied = Text.__new__(type(self))
+        copied.__dict__.update(self.__dict__)
+        return copied
+
     def objects(self):
         return [x for x in self.children if isinstance(x, OraccObject)]
+
+    def labels(self):
+        """
+        A LabelIndex of the transliteration lines, built when first needed
+        and again once lines have been added or removed.
+        """
+        from .labels import LabelIndex
+        if self._labels is None or not self._labels.fresh():
+            self._labels = LabelIndex(self)
+        return self._labels
+
+    def line(self, label):
+        """
+        The Line or Multilingual a label such as "r 3" refers to, or None.
+        """
+        line = self.labels().get(label)
+        # A line may have been relabelled, or replaced by one with another
+        # label, which only a look at every line shows
+        if line is None and not self._labels.verify():
+            line = self.labels().get(label)
+        return line
@@ -31,6 +31,8 @@ class Translation(object):
 ${child.serialize()}
 % endfor""")
 
+    span = None
+
     def __init__(self):
         self.children = []
 
@@ -0,0 +1,207 @@
+'''
+Copyright 2015, 2016 University College London.
+
+This file is part of PyORACC.
+
+PyORACC is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyORACC is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyORACC. If not, see <http://www.gnu.org/licenses/>.
+'''
+
+
+from operator import attrgetter
+
+from .comment import Comment
+from .composite import Composite
+from .line import Line
+from .link import Link
+from .link_reference import LinkReference
+from .milestone import Milestone
+from .multilingual import Multilingual
+from .note import Note
+from .oraccobject import OraccObject
+from .ruling import Ruling
+from .score import Score
+from .state import State
+from .text import Text
+from .translation import Translation
+
+
+# Returned by a visit method to leave out the nodes below the one visited
+SKIP = object()
+
+
+def _languages(node):
+    # The main line first, then the others by language
+    lines = [node.lines[language] for language in
+             sorted(language for language in node.lines if language)]
+    if node.lines.get(None) is not None:
+        lines.insert(0, node.lines[None])
+    return lines
+
+
+def _other(node):
+    return getattr(node, 'children', None) or ()
+
+
+# How to find the nodes below an instance of each class and its subclasses,
+# or None for classes with nothing below them. The accessors are attrgetters
+# where they can be, so that finding the children calls no Python code.
+_accessors = [
+    (Composite, attrgetter('texts')),
+    (Text, attrgetter('children')),
+    (OraccObject, attrgetter('children')),
+    (Translation, attrgetter('children')),
+    (Multilingual, _languages),
+    (Line, attrgetter('notes')),
+    (State, None),
+    (Ruling, None),
+    (Note, None),
+    (Comment, None),
+    (Link, None),
+    (LinkReference, None),
+    (Score, None),
+    (Milestone, None),
+]
+
+# The accessor of each class seen so far
+_dispatch = {}
+
+# Not yet in _dispatch
+_unknown = object()
+
+
+def _accessor(cls):
+    for base, accessor in _accessors:
+        if issubclass(cls, base):
+            _dispatch[cls] = accessor
+            return accessor
+    _dispatch[cls] = _other
+    return _other
+
+
+def children(node):
+    """
+    The nodes below node: the texts of a Composite, the children of a Text,
+    OraccObject or Translation, the lines of a Multilingual and the notes of
+    a Line.
+    """
+    cls = type(node)
+    accessor = _dispatch.get(cls, _unknown)
+    if accessor is _unknown:
+        accessor = _accessor(cls)
+    if accessor is None:
+        return ()
+    return accessor(node)
+
+
+def walk(node, prune=None, ancestors=None):
+    """
+    Yield node and every node below it, in document order. This does not
+    recurse, so trees of any depth can be walked.
+
+    The nodes below those for which prune returns true are left out. If
+    ancestors is a list, it is kept holding the nodes above the node last
+    yielded, outermost first.
+    """
+    if ancestors is None:
+        ancestors = []
+    else:
+        del ancestors[:]
+    dispatch = _dispatch
+    unknown = _unknown
+    stack = [iter((node,))]
+    while stack:
+        for child in stack[-1]:
+            yield child
+            if prune is not None and prune(child):
+                continue
+            accessor = dispatch.get(type(child), unknown)
+            if accessor is unknown:
+                accessor = _accessor(type(child))
+            if accessor is None:
+                continue
+            below = accessor(child)
+            if below:
+                ancestors.append(child)
+                stack.append(iter(below))
+                break
+        else:
+            stack.pop()
+            if ancestors:
+                ancestors.pop()
+
+
+# The visit method of each visitor class for each node class
+_methods = {}
+
+
+class Visitor(object):
+    """
+    Visits each node of a model tree in document order. Subclasses define
+    methods named visit_ and the lower case name of a class, e.g. visit_line
+    or visit_oraccobject; nodes of a class without a method of its own go
+    to the method of its nearest base class, or to generic_visit. The
+    method is looked up once for each class.
+
+    A method returning SKIP leaves out the nodes below the one it visited.
+    While visiting, ancestors holds the nodes above the current one.
+    """
+
+    def visit(self, node):
+        # The loop of walk, with the visit in place of prune: calling the
+        # methods from here rather than from a prune function consuming
+        # walk saves a call and a generator step per node
+        methods = _methods.setdefault(type(self), {})
+        dispatch = _dispatch
+        unknown = _unknown
+        self.ancestors = ancestors = []
+        stack = [iter((node,))]
+        while stack:
+            for child in stack[-1]:
+                cls = type(child)
+                method = methods.get(cls, unknown)
+                if method is unknown:
+                    method = methods[cls] = self._method(cls)
+                # None stands for the default generic_visit, which does
+                # nothing
+                if method is not None and method(self, child) is SKIP:
+                    continue
+                accessor = dispatch.get(cls, unknown)
+                if accessor is unknown:
+                    accessor = _accessor(cls)
+                if accessor is None:
+                    continue
+                below = accessor(child)
+                if below:
+                    ancestors.append(child)
+                    stack.append(iter(below))
+                    break
+            else:
+                stack.pop()
+                if ancestors:
+                    ancestors.pop()
+
+    def generic_visit(self, node):
+        pass
+
+    def _method(self, cls):
+        for base in cls.__mro__:
+            method = getattr(type(self), 'visit_' + base.__name__.lower(),
+                             None)
+            if method is not None:
+                return method
+        method = type(self).generic_visit
+        if getattr(method, '__func__', method) is \
+                Visitor.__dict__['generic_visit']:
+            return None
+        return method
@@ -0,0 +1,77 @@
+'''
+Copyright 2015, 2016 University College London.
+
+This file is part of PyORACC.
+
+PyORACC is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyORACC is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyORACC. If not, see <http://www.gnu.org/licenses/>.
+'''
+
+
+import io
+
+from ...atf.atfevents import AtfHandler, parse_events
+from ..fixtures import anzu, belsunu
+
+
+class RecordingHandler(AtfHandler):
+    def __init__(self):
+        self.events = []
+
+    def on_text(self, text):
+        self.events.append(('text', text.code))
+
+    def on_object(self, obj):
+        self.events.append(('object', obj.objecttype))
+
+    def on_surface(self, surface):
+        self.events.append(('surface', surface.objecttype))
+
+    def on_line(self, label, words, lemmas):
+        self.events.append(('line', label, len(words), len(lemmas)))
+
+    def on_translation_line(self, line):
+        self.events.append(('translation', line.label))
+
+    def on_state(self, state):
+        self.events.append(('state', state.state))
+
+    def on_ruling(self, ruling):
+        self.events.append(('ruling', ruling.type))
+
+    def on_comment(self, comment):
+        self.events.append(('comment', comment.content))
+
+
+def test_belsunu_events():
+    handler = RecordingHandler()
+    parse_events(belsunu(), handler)
+    events = handler.events
+    assert events[:4] == [('text', 'X001001'), ('object', 'tablet'),
+                          ('surface', 'obverse'), ('line', '1', 6, 6)]
+    assert ('ruling', 'single') in events
+    assert ('state', 'blank') in events
+    assert ('comment', "I've added various things for test purposes") \
+        in events
+    assert len([e for e in events if e[0] == 'line']) == 9
+    # Lines and surfaces of the translation are not reported as
+    # transliteration
+    assert events[-9:] == [('state', 'blank')] + \
+        [('translation', str(label)) for label in range(1, 9)]
+
+
+def test_stream_events():
+    handler = RecordingHandler()
+    parse_events(io.StringIO(anzu()), handler)
+    texts = [e[1] for e in handler.events if e[0] == 'text']
+    assert texts == ['X002001', 'Q002770', 'Q002771']
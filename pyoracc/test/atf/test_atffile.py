@@ -18,8 +18,12 @@ along with PyORACC. If not, see <http://www.gnu.org/licenses/>.
 '''
 
 
-from ...atf.atffile import AtfFile
-from ..fixtures import anzu, belsunu, sample_file
+import io
+
+import pytest
+
+from ...atf.atffile import AtfFile, iter_texts
+from ..fixtures import anzu, belsunu, sample_file, sample_file_path
 
 
 def test_create():
@@ -42,6 +46,122 @@ def test_composite():
     assert afile.text.texts[1].code == "Q002770"
     assert afile.text.texts[1].description == "SB Anzu 2"
 
+
+def test_iter_texts():
+    """
+    Stream the texts of anzu.atf one at a time and check they match the
+    texts of the composite built by AtfFile
+    """
+    texts = list(iter_texts(sample_file_path("anzu")))
+    composite = AtfFile(anzu()).text
+    assert [text.code for text in texts] == \
+        [text.code for text in composite.texts]
+    assert texts[1].description == "SB Anzu 2"
+    assert texts[1].serialize() == composite.texts[1].serialize()
+
+
+def test_iter_texts_stream():
+    """
+    iter_texts accepts an open stream and yields lazily
+    """
+    stream = io.StringIO(belsunu())
+    texts = iter_texts(stream)
+    assert next(texts).code == "X001001"
+    assert list(texts) == []
+
+
+def test_spans():
+    """
+    Parse belsunu.atf recording source spans and check nodes slice back to
+    their source lines
+    """
+    afile = AtfFile(belsunu(), spans=True)
+    content = afile.content
+    text = afile.text
+    assert text.span.start == 0
+    assert text.span.first_line == 1
+    tablet = text.children[0]
+    assert content[tablet.span.start:].startswith("@tablet\n@obverse")
+    line = tablet.children[0].children[0]
+    assert content[line.span.start:line.span.end] == \
+        content.splitlines()[8] + "\n" + content.splitlines()[9]
+    assert (line.span.first_line, line.span.last_line) == (9, 10)
+    ruling = tablet.children[0].children[2]
+    assert content[ruling.span.start:ruling.span.end] == "$ single ruling"
+    assert AtfFile(belsunu()).text.span is None
+
+
+def summarise(node):
+    """
+    Flatten a model into a list of its nodes' types, spans and other
+    attributes, for comparing two parses
+    """
+    if isinstance(node, list):
+        return [summarise(item) for item in node]
+    if isinstance(node, dict):
+        return sorted((repr(key), summarise(value))
+                      for key, value in node.items())
+    if not hasattr(node, '__dict__'):
+        return node
+    return [type(node).__name__, node.span,
+            summarise(dict((key, value) for key, value in vars(node).items()
+                           if key != 'span'))]
+
+
+def check_edit(afile, offset, deleted, inserted):
+    expected = afile.content[:offset] + inserted + \
+        afile.content[offset + deleted:]
+    afile.edit(offset, deleted, inserted)
+    assert afile.content == expected
+    assert summarise(afile.text) == \
+        summarise(AtfFile(expected, spans=True).text)
+
+
+def test_edit():
+    """
+    Edits to a composite reparse only the texts they touch, giving the same
+    model as parsing the edited file from scratch
+    """
+    afile = AtfFile(anzu(), spans=True)
+    texts = list(afile.text.texts)
+    second = afile.content.index("&Q002770")
+    third = afile.content.index("&Q002771")
+    # Within the second text
+    word = afile.content.index("\n1.", second) + 4
+    check_edit(afile, word, 0, u"x")
+    assert afile.text.texts[0] is texts[0]
+    assert afile.text.texts[1] is not texts[1]
+    assert afile.text.texts[2] is texts[2]
+    # Add a line and a text
+    check_edit(afile, third, 0, u"2.\tx\n")
+    check_edit(afile, third, 0, u"&X000001 = new\n@tablet\n")
+    assert len(afile.text.texts) == 4
+    # Delete across texts
+    third = afile.content.index("&Q002771")
+    check_edit(afile, second, third - second, u"")
+    codes = [text.code for text in afile.text.texts]
+    assert codes == ["X002001", "Q002771"]
+    # Down to a single text
+    check_edit(afile, 0, afile.content.index("&Q002771"), u"")
+    assert afile.text.code == "Q002771"
+
+
+def test_edit_error():
+    """
+    An edit which does not parse leaves the file unchanged
+    """
+    afile = AtfFile(anzu(), spans=True)
+    content = afile.content
+    text = afile.text
+    before = summarise(text)
+    offset = content.index("&Q002770")
+    with pytest.raises(SyntaxError):
+        afile.edit(offset, 0, u"@tablet\n@@@\n")
+    assert afile.content == content
+    assert afile.text is text
+    assert summarise(afile.text) == before
+
+
 # Pairs of filenames and CDLI IDs chosen form composite files
 composites = [
     ['SAA19_13', 'P393708'],
@@ -87,7 +207,8 @@ texts = [
     ]
 
 
-def consider_composite(name, code):
+@pytest.mark.parametrize('name, code', composites)
+def test_composites(name, code):
     """
     Parses ATF and checks CDLI ID coincides
     """
@@ -95,28 +216,11 @@ def consider_composite(name, code):
     assert afile.text.texts[0].code == code
 
 
-def consider_file(name, code, description):
+@pytest.mark.parametrize('name, code, description', texts)
+def test_texts(name, code, description):
     """
     Parses ATF and checks CDLI ID and text description coincide
     """
     afile = AtfFile(sample_file(name))
     assert afile.text.code == code
     assert afile.text.description == description
-
-
-def test_texts():
-    """"
-    Go through list of selected filenames and check parser deals non-composite
-    files.
-    """
-    for text in texts:
-        yield consider_file, text[0], text[1], text[2]
-
-
-def test_composites():
-    """
-    Go through list of selected composites and check parser deals with
-    composite files correctly
-    """
-    for composite in composites:
-        yield consider_composite, composite[0], composite[1]
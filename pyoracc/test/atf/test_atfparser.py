@@ -44,10 +44,10 @@ class TestParser(TestCase):
     def setUp(self):
         self.lexer = AtfLexer().lexer
 
-    def try_parse(self, content):
+    def try_parse(self, content, include=None):
         if content[-1] != '\n':
             content += "\n"
-        self.parser = AtfParser().parser
+        self.parser = AtfParser(include=include).parser
         return self.parser.parse(content, lexer=self.lexer)
 
     def test_code(self):
@@ -1082,3 +1082,56 @@ class TestParser(TestCase):
         assert text.links[0].label == "Include"
         assert text.links[0].code == "dcclt:P229061"
         assert text.links[0].description == "MSL 07, 197 V02, 210 V11"
+
+    def test_projection_lines_lemmas(self):
+        text = self.try_parse(
+            "&X001001 = My Text\n" +
+            "#link: def A = P363716 = TCL 06, 47\n" +
+            "@tablet\n" +
+            "@obverse\n" +
+            "1. a-na\n" +
+            "#lem: ana[to]PRP\n" +
+            "#note: A note\n" +
+            "$ single ruling\n" +
+            "# A comment\n" +
+            "2. {d}utu\n" +
+            "$ rest broken\n" +
+            "@translation parallel en project\n" +
+            "@obverse\n" +
+            "1. To\n",
+            include={'lines', 'lemmas'}
+        )
+        assert text.links == []
+        obverse = text.children[0].children[0]
+        assert len(text.children[0].children) == 1
+        assert [line.label for line in obverse.children] == ["1", "2"]
+        assert obverse.children[0].words == ["a-na"]
+        assert obverse.children[0].lemmas == [" ana[to]PRP"]
+        assert obverse.children[0].notes == []
+
+    def test_projection_implicit(self):
+        # Lines, states and comments with no @tablet or @obverse still get
+        # the tablet and surfaces a full parse gives them
+        content = ("&X001001 = JCS 48, 089\n"
+                   "#project: cams/gkab\n"
+                   "#atf: lang akk-x-stdbab\n"
+                   "1. a-na\n"
+                   "$ rest broken\n"
+                   "# A comment\n")
+
+        def objects(node):
+            return [(child.objecttype, objects(child))
+                    for child in node.children
+                    if isinstance(child, OraccObject)]
+        full = self.try_parse(content)
+        assert objects(full) == [('tablet', [('obverse', []),
+                                             ('obverse', [])])]
+        for include in [{'lines'}, {'states'}, {'comments'}, set()]:
+            text = self.try_parse(content, include=include)
+            assert objects(text) == objects(full)
+        obverse = text.children[0].children[0]
+        assert obverse.children == []
+
+    def test_projection_unknown(self):
+        with self.assertRaises(ValueError):
+            AtfParser(include={'lines', 'pictures'})
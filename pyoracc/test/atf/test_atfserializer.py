@@ -24,7 +24,7 @@ from unittest import TestCase, skip
 import pytest
 
 from pyoracc.atf.atffile import AtfFile
-from pyoracc.test.fixtures import belsunu, output_filepath
+from pyoracc.test.fixtures import belsunu, output_filepath, sample_file
 
 from ...atf.atflex import AtfLexer
 from ...atf.atfyacc import AtfParser
@@ -130,6 +130,55 @@ class TestSerializer(TestCase):
                 u'm\u016b\u0161a[at night]AV', u'\u016bm[day]N', u'n']
         assert ulemmas == gold
 
+    @staticmethod
+    def test_lossless_unchanged():
+        """
+        With lossless, an unedited file serializes to exactly its input.
+        """
+        content = belsunu()
+        assert AtfFile(content, lossless=True).serialize() == content
+
+    @staticmethod
+    def test_lossless_changed_line():
+        """
+        A changed line is rendered by its template, the rest is copied.
+        """
+        content = belsunu()
+        atf_file = AtfFile(content, lossless=True)
+        uline = atf_file.text.children[0].children[0].children[0]
+        uline.words[0] = u'MU'
+        gold = content.replace(u'[MU] 1.03-KAM', u'MU 1.03-KAM')
+        assert atf_file.serialize() == gold
+
+    @staticmethod
+    def test_lossless_changed_translation():
+        """
+        A change in a translation, which the parser attaches to the last
+        object rather than the text, is spliced in at its own source.
+        """
+        content = belsunu()
+        atf_file = AtfFile(content, lossless=True)
+        translation = atf_file.text.children[0].children[-1]
+        uline = translation.children[0].children[-1]
+        uline.words = [u'Mars was in the Lion.']
+        gold = content.replace(u'Mars was in the Crab.',
+                               u'Mars was in the Lion.')
+        assert atf_file.serialize() == gold
+
+    @staticmethod
+    def test_lossless_changed_labelled_translation():
+        """
+        A changed translation line with an @(label) keeps its label.
+        """
+        content = sample_file('SAA17_02')
+        atf_file = AtfFile(content, lossless=True)
+        translation = atf_file.text.texts[-1].children[-1].children[-1]
+        uline = translation.children[-2]
+        uline.words = [u'[...] the queen [...]']
+        gold = content.replace(u'@(7) [...] the king [...]',
+                               u'@(7) [...] the queen [...]')
+        assert atf_file.serialize() == gold
+
 
 # TODO: Build list of atf files for testing and make a test to go through the
 # list of test and try serializing each of them.
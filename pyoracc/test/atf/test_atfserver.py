@@ -0,0 +1,179 @@
+'''
+Copyright 2015, 2016 University College London.
+
+This file is part of PyORACC.
+
+PyORACC is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyORACC is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyORACC. If not, see <http://www.gnu.org/licenses/>.
+'''
+
+
+import io
+import json
+
+from ...atf import atffile
+from ...atf.atfserver import AtfServer
+from ..fixtures import anzu, belsunu
+
+
+def frame(message):
+    body = json.dumps(message).encode('utf-8')
+    return "Content-Length: {}\r\n\r\n".format(len(body)).encode('ascii') + \
+        body
+
+
+def run(*messages):
+    """
+    Serve messages, returning the exit code and the messages sent back
+    """
+    requests = [{'jsonrpc': '2.0', 'id': 0, 'method': 'initialize',
+                 'params': {}}]
+    requests.extend(messages)
+    requests.append({'jsonrpc': '2.0', 'id': 1, 'method': 'shutdown'})
+    requests.append({'jsonrpc': '2.0', 'method': 'exit'})
+    instream = io.BytesIO(b''.join(frame(message) for message in requests))
+    outstream = io.BytesIO()
+    code = AtfServer(instream, outstream).serve()
+    outstream.seek(0)
+    replies = []
+    reader = AtfServer(outstream, None)
+    while True:
+        message = reader.read()
+        if message is None:
+            return code, replies
+        replies.append(message)
+
+
+def open_document(uri, text):
+    return {'jsonrpc': '2.0', 'method': 'textDocument/didOpen',
+            'params': {'textDocument': {'uri': uri, 'languageId': 'atf',
+                                        'version': 1, 'text': text}}}
+
+
+def request(id, method, uri, **params):
+    params['textDocument'] = {'uri': uri}
+    return {'jsonrpc': '2.0', 'id': id, 'method': method, 'params': params}
+
+
+def test_lifecycle():
+    code, replies = run({'jsonrpc': '2.0', 'id': 2, 'method': 'unknown'})
+    assert code == 0
+    assert replies[0]['result']['capabilities']['definitionProvider']
+    assert replies[1]['error']['code'] == -32601
+    assert replies[2] == {'jsonrpc': '2.0', 'id': 1, 'result': None}
+
+
+def test_bad_notification():
+    code, replies = run(
+        {'jsonrpc': '2.0', 'method': 'textDocument/didClose',
+         'params': {'textDocument': {'uri': 'file:///unknown.atf'}}},
+        {'jsonrpc': '2.0', 'method': 'textDocument/didChange',
+         'params': {'textDocument': {'uri': 'file:///unknown.atf'},
+                    'contentChanges': [{'text': u''}]}})
+    # The change to a document never opened is logged, and the server
+    # still answers shutdown
+    assert code == 0
+    assert replies[1]['method'] == 'window/logMessage'
+    assert replies[1]['params']['type'] == 1
+    assert 'didChange' in replies[1]['params']['message']
+    assert replies[2]['id'] == 1
+
+
+def test_symbols():
+    code, replies = run(open_document('file:///anzu.atf', anzu()),
+                        request(2, 'textDocument/documentSymbol',
+                                'file:///anzu.atf'))
+    assert replies[1]['params']['diagnostics'] == []
+    symbols = replies[2]['result']
+    assert [symbol['name'] for symbol in symbols] == \
+        ['X002001', 'Q002770', 'Q002771']
+    assert symbols[1]['detail'] == 'SB Anzu 2'
+    assert symbols[0]['range']['start'] == {'line': 0, 'character': 0}
+
+
+def test_diagnostics():
+    """
+    An incremental edit which breaks the file is reported at its line, and
+    cleared when undone
+    """
+    uri = 'file:///anzu.atf'
+    line = anzu().splitlines().index(u'&Q002770 = SB Anzu 2') + 1
+    position = {'line': line, 'character': 0}
+    change = {'jsonrpc': '2.0', 'method': 'textDocument/didChange',
+              'params': {'textDocument': {'uri': uri, 'version': 2},
+                         'contentChanges': [{'range': {'start': position,
+                                                       'end': position},
+                                             'text': u'@@@\n'}]}}
+    undo = {'jsonrpc': '2.0', 'method': 'textDocument/didChange',
+            'params': {'textDocument': {'uri': uri, 'version': 3},
+                       'contentChanges': [{'range': {
+                           'start': position,
+                           'end': {'line': line + 1, 'character': 0}},
+                           'text': u''}]}}
+    code, replies = run(open_document(uri, anzu()), change, undo)
+    diagnostics = replies[2]['params']['diagnostics']
+    assert len(diagnostics) == 1
+    assert diagnostics[0]['range']['start']['line'] == line
+    assert replies[3]['params']['diagnostics'] == []
+
+
+def test_one_parser(monkeypatch):
+    """
+    Opening, editing, breaking, fully syncing and recovering a document all
+    use the parser the server built when it started
+    """
+    def build(*args, **kwargs):
+        raise AssertionError("Built a lexer or parser")
+    uri = 'file:///anzu.atf'
+    line = anzu().splitlines().index(u'&Q002770 = SB Anzu 2') + 1
+    position = {'line': line, 'character': 0}
+    change = {'jsonrpc': '2.0', 'method': 'textDocument/didChange',
+              'params': {'textDocument': {'uri': uri, 'version': 2},
+                         'contentChanges': [{'range': {'start': position,
+                                                       'end': position},
+                                             'text': u'@@@\n'}]}}
+    sync = {'jsonrpc': '2.0', 'method': 'textDocument/didChange',
+            'params': {'textDocument': {'uri': uri, 'version': 3},
+                       'contentChanges': [{'text': anzu()}]}}
+    instream = io.BytesIO(b''.join(frame(message) for message in
+                                   [open_document(uri, anzu()), change,
+                                    sync, change]))
+    outstream = io.BytesIO()
+    server = AtfServer(instream, outstream)
+    monkeypatch.setattr(atffile, 'AtfLexer', build)
+    monkeypatch.setattr(atffile, 'AtfParser', build)
+    server.serve()
+    outstream.seek(0)
+    reader = AtfServer(outstream, None)
+    replies = [reader.read() for _ in range(4)]
+    assert [reply['method'] for reply in replies] == \
+        ['textDocument/publishDiagnostics'] * 4
+    assert [len(reply['params']['diagnostics']) for reply in replies] == \
+        [0, 1, 0, 1]
+
+
+def test_definition():
+    """
+    Go to definition from a translation line finds its transliteration line
+    """
+    uri = 'file:///belsunu.atf'
+    lines = belsunu().splitlines()
+    translation = lines.index(u'8.\tMars was in the Crab.')
+    code, replies = run(open_document(uri, belsunu()),
+                        request(2, 'textDocument/definition', uri,
+                                position={'line': translation,
+                                          'character': 3}))
+    locations = replies[2]['result']
+    assert len(locations) == 1
+    start = locations[0]['range']['start']['line']
+    assert lines[start].startswith(u'8.\t[AN] ina ALLA')
@@ -0,0 +1,85 @@
+'''
+Copyright 2015, 2016 University College London.
+
+This file is part of PyORACC.
+
+PyORACC is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyORACC is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyORACC. If not, see <http://www.gnu.org/licenses/>.
+'''
+
+
+import pytest
+
+from ...atf.atffile import AtfFile
+from ...export.arrow import (LINES, TEXTS, TOKENS, export, record_batches,
+                             text_rows, word_flags, write_parquet)
+from ..fixtures import anzu, belsunu, tiny_corpus
+
+
+def test_word_flags():
+    assert word_flags(u'a-lid') == (False, False, False, False, False)
+    assert word_flags(u'[{m}]{d}60') == (True, False, False, False, False)
+    assert word_flags(u'GAL#-MESZ?') == (False, True, True, False, False)
+    assert word_flags(u'KI!*') == (False, False, False, True, True)
+
+
+def test_text_rows():
+    texts, lines, tokens = text_rows(AtfFile(belsunu()).text)
+    assert [len(row) for row in (texts[0], lines[0], tokens[0])] == \
+        [len(TEXTS), len(LINES), len(TOKENS)]
+    assert texts[0][:3] == (u'X001001', u'cams/gkab', u'akk-x-stdbab')
+    assert texts[0][4:] == (len(lines), len(tokens))
+    assert lines[0][:5] == (u'X001001', 0, u'tablet', u'obverse', u'1')
+    assert tokens[1][:5] == (u'X001001', 0, 1, u'1.03-KAM', u'n')
+    assert sum(line[5] for line in lines) == len(tokens)
+
+
+def test_composite_rows():
+    composite = AtfFile(anzu()).text
+    texts, lines, tokens = text_rows(composite)
+    assert [row[0] for row in texts] == [text.code
+                                         for text in composite.texts]
+    assert sum(row[4] for row in texts) == len(lines)
+
+
+def test_record_batches():
+    pytest.importorskip('pyarrow')
+    text = AtfFile(belsunu()).text
+    batches = list(record_batches([text, text], batch_size=50))
+    _, lines, tokens = text_rows(text)
+    rows = {}
+    for name, batch in batches:
+        assert batch.num_rows <= 50
+        rows[name] = rows.get(name, 0) + batch.num_rows
+    assert rows == {'texts': 2, 'lines': 2 * len(lines),
+                    'tokens': 2 * len(tokens)}
+
+
+def test_parquet(tmpdir):
+    parquet = pytest.importorskip('pyarrow.parquet')
+    text = AtfFile(belsunu()).text
+    counts = write_parquet([text], str(tmpdir), batch_size=100)
+    tokens = parquet.read_table(str(tmpdir.join('tokens.parquet')))
+    assert tokens.num_rows == counts['tokens']
+    assert tokens.column_names == [name for name, _ in TOKENS]
+    assert parquet.ParquetFile(str(tmpdir.join('tokens.parquet'))) \
+        .num_row_groups == (counts['tokens'] + 99) // 100
+
+
+def test_export(tmpdir):
+    parquet = pytest.importorskip('pyarrow.parquet')
+    counts, failures = export(tiny_corpus(), str(tmpdir), processes=2)
+    assert [path.endswith('bad.atf') for path, _ in failures] == [True]
+    texts = parquet.read_table(str(tmpdir.join('texts.parquet')))
+    assert texts.column('code').to_pylist() == [u'X001001']
+    assert counts['texts'] == 1
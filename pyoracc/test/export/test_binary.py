@@ -0,0 +1,95 @@
+'''
+Copyright 2015, 2016 University College London.
+
+This file is part of PyORACC.
+
+PyORACC is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyORACC is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyORACC. If not, see <http://www.gnu.org/licenses/>.
+'''
+
+
+import io
+import pickle
+
+import pytest
+
+from ...atf.atffile import AtfFile
+from ...export import binary, jsonl
+from ...model.line import Line
+from ...model.span import Span
+from ...model.text import Text
+from ..fixtures import anzu, belsunu
+from ..model.test_labels import labelled
+
+
+@pytest.mark.parametrize('content', [belsunu(), anzu(), labelled])
+def test_roundtrip(content):
+    text = AtfFile(content, spans=True).text
+    loaded = binary.loads(binary.dumps(text))
+    assert type(loaded) is type(text)
+    assert jsonl.dumps(loaded) == jsonl.dumps(text)
+
+
+def test_nodes():
+    text = binary.loads(binary.dumps(AtfFile(belsunu(), spans=True).text))
+    line = text.children[0].children[0].children[0]
+    assert type(line) is Line
+    assert type(line.span) is Span
+    assert line.serialize() == \
+        AtfFile(belsunu()).text.children[0].children[0].children[0] \
+        .serialize()
+    assert text.line(u'o 2') is not None
+
+
+def test_values():
+    text = Text()
+    text.code = u'X000001'
+    text.links = [-1, 2 ** 70, 0.5, (u'a', None), {u'b': True, None: False}]
+    loaded = binary.loads(binary.dumps(text))
+    assert loaded.links == text.links
+    assert loaded.span is None
+    assert 'span' not in vars(loaded)
+
+
+def test_stream():
+    text = AtfFile(belsunu()).text
+    stream = io.BytesIO()
+    binary.dump(text, stream)
+    stream.seek(0)
+    assert jsonl.dumps(binary.load(stream)) == jsonl.dumps(text)
+
+
+def test_size():
+    text = AtfFile(anzu()).text
+    assert len(binary.dumps(text)) < \
+        len(pickle.dumps(text, pickle.HIGHEST_PROTOCOL))
+
+
+def test_errors():
+    data = binary.dumps(AtfFile(belsunu()).text)
+    with pytest.raises(ValueError):
+        binary.loads(b'PK' + data[2:])
+    newer = bytearray(data)
+    newer[len(binary.MAGIC)] = binary.VERSION + 1
+    with pytest.raises(ValueError):
+        binary.loads(bytes(newer))
+    with pytest.raises(TypeError):
+        binary.dumps(object())
+
+
+def test_truncated():
+    data = binary.dumps(AtfFile(belsunu()).text)
+    for end in [len(binary.MAGIC), len(binary.MAGIC) + 1, 20,
+                len(data) // 2, len(data) - 1]:
+        with pytest.raises(ValueError):
+            binary.loads(data[:end])
@@ -0,0 +1,121 @@
+'''
+Copyright 2015, 2016 University College London.
+
+This file is part of PyORACC.
+
+PyORACC is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyORACC is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyORACC. If not, see <http://www.gnu.org/licenses/>.
+'''
+
+
+import io
+import json
+
+import pytest
+
+from ...atf.atffile import AtfFile
+from ...export.jsonl import dump, dumps, export, write_jsonl
+from ...model.composite import Composite
+from ...model.text import Text
+from ..fixtures import anzu, belsunu, tiny_corpus
+
+
+multilingual = u"""&X000001 = Multilingual
+#project: test
+#atf: lang sux
+@tablet
+@obverse
+1. dim [...]
+== %sb DINGIR-MESZ [...]
+"""
+
+
+def test_text():
+    text = json.loads(dumps(AtfFile(belsunu()).text))
+    assert text['type'] == 'Text'
+    assert text['code'] == 'X001001'
+    assert 'span' not in text
+    tablet = text['children'][0]
+    assert tablet['type'] == 'OraccObject'
+    assert tablet['objecttype'] == 'tablet'
+    line = tablet['children'][0]['children'][0]
+    assert line['type'] == 'Line'
+    assert line['label'] == '1'
+    assert line['words'][0] == u'[MU]'
+
+
+def test_spans():
+    text = json.loads(dumps(AtfFile(belsunu(), spans=True).text))
+    start, end, first, last = text['span']
+    assert (start, first) == (0, 1)
+    assert 0 < end <= len(belsunu())
+
+
+def test_multilingual():
+    text = json.loads(dumps(AtfFile(multilingual).text))
+    line = text['children'][0]['children'][0]['children'][0]
+    assert line['type'] == 'Multilingual'
+    assert sorted(line['lines']) == ['', 'sb']
+    assert line['lines']['']['words'] == [u'dim', u'[...]']
+    assert line['lines']['sb']['words'] == [u'DINGIR-MESZ', u'[...]']
+
+
+def test_composite():
+    composite = AtfFile(anzu()).text
+    encoded = json.loads(dumps(composite))
+    assert encoded['type'] == 'Composite'
+    assert [text['code'] for text in encoded['texts']] == \
+        [text.code for text in composite.texts]
+
+
+def test_dump():
+    text = AtfFile(belsunu()).text
+    stream = io.StringIO()
+    dump(Composite(), stream)
+    assert json.loads(stream.getvalue()) == {'type': 'Composite',
+                                             'texts': []}
+    for node in [text, AtfFile(anzu(), spans=True).text]:
+        stream = io.StringIO()
+        dump(node, stream)
+        assert stream.getvalue() == dumps(node)
+
+
+def test_numbers():
+    text = Text()
+    text.links = [10 ** 20, -3, 0.5, True]
+    assert json.loads(dumps(text))['links'] == [10 ** 20, -3, 0.5, True]
+
+
+def test_unknown():
+    with pytest.raises(TypeError):
+        dumps(object())
+
+
+def test_write_jsonl():
+    composite = Composite()
+    composite.texts = [Text(), Text()]
+    composite.texts[0].code = u'X000001'
+    composite.texts[1].code = u'X000002'
+    stream = io.StringIO()
+    write_jsonl([composite, AtfFile(belsunu()).text], stream)
+    lines = stream.getvalue().splitlines()
+    assert [json.loads(line)['code'] for line in lines] == \
+        [u'X000001', u'X000002', u'X001001']
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_export(processes):
+    stream = io.StringIO()
+    failures = export(tiny_corpus(), stream, processes)
+    assert [path.endswith('bad.atf') for path, _ in failures] == [True]
+    assert stream.getvalue() == dumps(AtfFile(belsunu()).text) + u'\n'
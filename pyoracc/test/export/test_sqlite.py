@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+'''
+Copyright 2015, 2016 University College London.
+
+This file is part of PyORACC.
+
+PyORACC is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyORACC is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyORACC. If not, see <http://www.gnu.org/licenses/>.
+'''
+
+
+import sqlite3
+
+from ...atf.atffile import AtfFile
+from ...export.sqlite import SqliteLoader, load_corpus, text_rows
+from ..fixtures import anzu, belsunu, tiny_corpus
+from ..model.test_labels import labelled
+
+
+def test_text_rows():
+    rows = text_rows(AtfFile(belsunu()).text)
+    assert rows['texts'] == [(0, u'X001001', u'cams/gkab', u'akk-x-stdbab',
+                              u'JCS 48, 089')]
+    assert rows['objects'] == [(0, 0, u'tablet', None)]
+    assert [row[3] for row in rows['surfaces']] == [u'obverse', u'reverse']
+    assert rows['lines'][0] == (0, 0, 0, 0, 0, u'1')
+    assert rows['words'][:2] == [(0, 0, u'[MU]'), (0, 1, u'1.03-KAM')]
+    assert rows['lemmas'][0] == (0, 0, u'šatti[year]N')
+
+
+def test_translations():
+    rows = text_rows(AtfFile(labelled).text)
+    lines = dict((row[0], row[5]) for row in rows['lines'])
+    translation = rows['translations'][2]
+    assert translation[4] == u"r 1' | r 2' | r 3'"
+    assert (lines[translation[2]], lines[translation[3]]) == \
+        (u"1'", u"3'")
+
+
+def test_loader():
+    loader = SqliteLoader(batch_size=100)
+    text = AtfFile(belsunu()).text
+    composite = AtfFile(anzu()).text
+    loader.add(text)
+    loader.add(composite)
+    loader.add(text)
+    loader.finish()
+    db = loader.db
+    codes = [text.code for text in composite.texts]
+    assert [row[0] for row in db.execute(
+        "SELECT code FROM texts ORDER BY id")] == \
+        [u'X001001'] + codes + [u'X001001']
+    # IDs are renumbered so each text's rows join up
+    assert db.execute(
+        "SELECT COUNT(*) FROM lines JOIN surfaces ON surfaces.id = "
+        "lines.surface WHERE surfaces.text != lines.text").fetchone() == (0,)
+    words = db.execute(
+        "SELECT word FROM words JOIN lines ON lines.id = words.line JOIN "
+        "texts ON texts.id = lines.text WHERE texts.id = ? AND "
+        "lines.position = 0 ORDER BY words.position",
+        (len(codes) + 2,)).fetchall()
+    assert [word for word, in words] == text.children[0].children[0] \
+        .children[0].words
+    assert loader.counts['texts'] == len(codes) + 2
+    assert db.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = "
+                      "'index'").fetchone()[0] > 0
+    loader.close()
+
+
+def test_load_corpus(tmpdir):
+    filename = str(tmpdir.join('corpus.db'))
+    counts, failures = load_corpus(tiny_corpus(), filename, processes=2)
+    assert [path.endswith('bad.atf') for path, _ in failures] == [True]
+    db = sqlite3.connect(filename)
+    assert db.execute("PRAGMA journal_mode").fetchone() == (u'wal',)
+    assert db.execute("SELECT COUNT(*) FROM words").fetchone() == \
+        (counts['words'],)
+    # Loading again adds to what is there
+    counts, _ = load_corpus(tiny_corpus(), filename, processes=1)
+    assert db.execute("SELECT COUNT(DISTINCT id), COUNT(*) FROM "
+                      "lines").fetchone() == (2 * counts['lines'],) * 2
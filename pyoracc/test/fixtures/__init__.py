@@ -38,9 +38,11 @@ def anzu():
 
 
 def sample_file(name):
-    return codecs.open(os.path.join(
-                       os.path.dirname(here), 'sample_corpus', name + ".atf"),
-                       encoding='utf-8-sig').read()
+    return codecs.open(sample_file_path(name), encoding='utf-8-sig').read()
+
+
+def sample_file_path(name):
+    return os.path.join(os.path.dirname(here), 'sample_corpus', name + ".atf")
 
 
 def output_folder():
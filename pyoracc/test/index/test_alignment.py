@@ -0,0 +1,88 @@
+'''
+Copyright 2015, 2016 University College London.
+
+This file is part of PyORACC.
+
+PyORACC is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyORACC is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyORACC. If not, see <http://www.gnu.org/licenses/>.
+'''
+
+
+import io
+import json
+
+from ...atf.atffile import AtfFile
+from ...index.alignment import (Alignment, parallel_corpus, write_jsonl,
+                                write_tsv)
+from ..fixtures import belsunu
+from ..model.test_labels import labelled
+
+
+continued = u"""&X000001 = Continued
+#project: test
+#atf: lang akk
+@tablet
+@obverse
+1. a
+2. b
+3. c
+@translation labeled en project
+@label o 1
+One,
+@label+ o 1 - o 2
+and two.
+@(9) Nine
+@end translation
+"""
+
+
+def test_labelled():
+    alignment = Alignment(AtfFile(labelled).text)
+    assert [segment.labels for segment in alignment.segments] == \
+        [[u'o i 1'], [u'o ii 1'], [u"r 1'", u"r 2'", u"r 3'"], [u'b.e. 1']]
+    assert [line.label.label for line in alignment.unaligned] == [[u'2']]
+    line = alignment.segments[2].lines[1]
+    assert [segment.translation
+            for segment in alignment.segments_for(line)] == [u'Four to six']
+
+
+def test_continued():
+    """A @label+ segment is merged into the one before"""
+    alignment = Alignment(AtfFile(continued).text)
+    assert len(alignment.segments) == 1
+    segment = alignment.segments[0]
+    assert segment.labels == [u'o 1', u'o 2']
+    assert segment.translation == u'One, and two.'
+    assert len(alignment.unaligned) == 1
+
+
+def test_parallel():
+    alignment = Alignment(AtfFile(belsunu()).text)
+    assert [segment.labels[0] for segment in alignment.segments] == \
+        [u'o {}'.format(number) for number in range(1, 9)]
+    assert alignment.segments[7].translation == u'Mars was in the Crab.'
+
+
+def test_export():
+    texts = [AtfFile(labelled).text, AtfFile(belsunu()).text]
+    stream = io.StringIO()
+    write_tsv(parallel_corpus(texts), stream)
+    rows = stream.getvalue().splitlines()
+    assert rows[0] == u'code\tlabels\ttransliteration\ttranslation'
+    assert rows[3] == u"X001001\tr 1' | r 2' | r 3'\td | e | f\tFour to six"
+    assert len(rows) == 1 + 4 + 8
+    stream = io.StringIO()
+    write_jsonl(parallel_corpus(texts), stream)
+    rows = [json.loads(row) for row in stream.getvalue().splitlines()]
+    assert rows[-1]['translation'] == u'Mars was in the Crab.'
+    assert rows[-1]['labels'] == u'o 8'
@@ -0,0 +1,76 @@
+'''
+Copyright 2015, 2016 University College London.
+
+This file is part of PyORACC.
+
+PyORACC is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyORACC is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyORACC. If not, see <http://www.gnu.org/licenses/>.
+'''
+
+
+import codecs
+import os
+import shutil
+import tempfile
+
+import pytest
+
+from ...index.codes import CodeIndex
+from ..fixtures import anzu, sample_corpus, sample_file_path
+
+
+def test_build():
+    index = CodeIndex.build(sample_corpus())
+    assert index['P229574'].path == 'P229574.atf'
+    assert index['P229574'].offset == 0
+    entry = index['Q002770']
+    assert entry.path == 'anzu.atf'
+    assert entry.lineno == anzu().splitlines().index(
+        u'&Q002770 = SB Anzu 2') + 1
+    content, lineno = index.read('Q002770')
+    assert content.startswith(u'&Q002770 = SB Anzu 2\n')
+    assert u'&Q002771' not in content
+    assert lineno == entry.lineno
+    with pytest.raises(KeyError):
+        index.read('X999999')
+
+
+def test_save_load():
+    index = CodeIndex.build(sample_corpus())
+    handle, filename = tempfile.mkstemp()
+    os.close(handle)
+    try:
+        index.save(filename)
+        loaded = CodeIndex.load(filename, sample_corpus())
+    finally:
+        os.remove(filename)
+    assert loaded.entries == index.entries
+    assert loaded.read('X002001') == index.read('X002001')
+
+
+def test_stale():
+    """
+    A file changed since it was indexed is indexed again when read
+    """
+    root = tempfile.mkdtemp()
+    try:
+        path = os.path.join(root, 'anzu.atf')
+        shutil.copy(sample_file_path('anzu'), path)
+        index = CodeIndex.build(root)
+        with codecs.open(path, 'w', encoding='utf-8') as stream:
+            stream.write(u'#atf: lang akk-x-stdbab\n' + anzu())
+        content, lineno = index.read('Q002771')
+        assert content.startswith(u'&Q002771')
+        assert lineno == index['Q002771'].lineno
+    finally:
+        shutil.rmtree(root)
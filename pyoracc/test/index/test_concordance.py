@@ -0,0 +1,71 @@
+'''
+Copyright 2015, 2016 University College London.
+
+This file is part of PyORACC.
+
+PyORACC is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyORACC is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyORACC. If not, see <http://www.gnu.org/licenses/>.
+'''
+
+
+from ...atf.atffile import AtfFile
+from ...index.concordance import (KwicLine, SIGN, concordance, format_kwic,
+                                  model_lines)
+from ...index.words import LEMMA, WordIndex
+from ..fixtures import anzu, belsunu
+
+
+def texts():
+    return [AtfFile(belsunu()).text, AtfFile(anzu()).text]
+
+
+def test_sorted():
+    rows = list(concordance(model_lines(texts())))
+    assert rows == sorted(rows)
+    assert len(rows) == sum(len([word for word in words if word])
+                            for _, _, words, _ in model_lines(texts()))
+
+
+def test_external_sort():
+    """
+    Sorting in runs on disk, merged a few at a time, gives the same rows
+    """
+    rows = list(concordance(model_lines(texts())))
+    assert list(concordance(model_lines(texts()), run_size=7,
+                            fan_in=3)) == rows
+
+
+def test_from_index():
+    index = WordIndex()
+    for text in texts():
+        index.add(text)
+    assert list(concordance(index.lines())) == \
+        list(concordance(model_lines(texts())))
+
+
+def test_lemma():
+    rows = list(concordance(model_lines(texts()), keywords={u'ina[in]PRP'},
+                            field=LEMMA, context=2))
+    assert [row.label for row in rows] == [u'3', u'8', u'6', u'7', u'7',
+                                           u'5']
+    assert rows[1] == KwicLine(u'ina[in]PRP', (u'ALLA', u'<<ALLA>>'),
+                               (u'[AN]',), u'X001001', u'8', 1)
+    assert format_kwic(rows[1], 10) == \
+        u'      [AN]  ina[in]PRP  ALLA <<ALL  X001001  8'
+
+
+def test_sign():
+    rows = list(concordance(model_lines(texts()), keywords={u'alla'},
+                            field=SIGN, context=1))
+    assert [(row.left, row.right) for row in rows] == \
+        [((u'alla',), ()), ((u'ina',), (u'alla',))]
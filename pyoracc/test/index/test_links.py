@@ -0,0 +1,107 @@
+'''
+Copyright 2015, 2016 University College London.
+
+This file is part of PyORACC.
+
+PyORACC is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyORACC is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyORACC. If not, see <http://www.gnu.org/licenses/>.
+'''
+
+
+import os
+import tempfile
+
+from ...atf.atffile import AtfFile
+from ...index.links import (Edge, LinkGraph, MISSING_LINE, MISSING_TEXT,
+                            UNDEFINED)
+
+
+first = u"""&X000001 = First
+#project: test
+#atf: lang akk
+#link: def A = test:X000002 = Second
+#link: def B = X000009 = Absent
+@tablet
+@obverse
+1. a
+|| A o 2
+2. b
+>> A r 1
+3. c
+<< B o 1
+4. d
+|| C o 1
+5. e
+|| A r 9
+"""
+
+second = u"""&X000002 = Second
+#project: test
+#atf: lang akk
+@tablet
+@obverse
+1. e
+2. f
+@reverse
+1. g
+"""
+
+third = u"""&X000003 = Third
+#project: test
+#atf: lang akk
+#link: def A = X000001 = First
+@tablet
+@obverse
+1. h
+|| A o 1
+"""
+
+
+def test_resolution():
+    graph = LinkGraph()
+    graph.update([AtfFile(first + u"\n" + second + u"\n" + third).text])
+    assert graph.edges(u'X000001') == [
+        Edge(u'X000001', None, u'def', u'X000002', None),
+        Edge(u'X000001', u'o 1', u'||', u'X000002', u'o 2'),
+        Edge(u'X000001', u'o 2', u'>>', u'X000002', u'r 1')]
+    assert [(edge.source_label, reason)
+            for edge, reason in graph.dangling()] == \
+        [(None, MISSING_TEXT), (u'o 3', MISSING_TEXT),
+         (u'o 4', UNDEFINED), (u'o 5', MISSING_LINE)]
+    assert graph.incoming(u'X000001') == [
+        Edge(u'X000003', None, u'def', u'X000001', None),
+        Edge(u'X000003', u'o 1', u'||', u'X000001', u'o 1')]
+    assert graph.neighbours(u'X000002') == set([u'X000001'])
+    assert graph.neighbours(u'X000002', 2) == set([u'X000001', u'X000003'])
+
+
+def test_incremental():
+    """
+    Links resolve once their target is added, and the graph persists
+    """
+    handle, filename = tempfile.mkstemp()
+    os.close(handle)
+    try:
+        graph = LinkGraph(filename)
+        graph.add(AtfFile(first).text)
+        assert graph.edges() == []
+        graph.close()
+        graph = LinkGraph(filename)
+        graph.add(AtfFile(second).text)
+        assert len(graph.edges()) == 3
+        graph.remove(u'X000002')
+        assert graph.edges() == []
+        assert u'X000001' in graph and u'X000002' not in graph
+        graph.close()
+    finally:
+        os.remove(filename)
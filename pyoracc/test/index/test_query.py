@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+'''
+Copyright 2015, 2016 University College London.
+
+This file is part of PyORACC.
+
+PyORACC is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyORACC is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyORACC. If not, see <http://www.gnu.org/licenses/>.
+'''
+
+
+import pytest
+
+from ...atf.atffile import AtfFile
+from ...index.query import Query, select
+from ...index.words import WordIndex
+from ...model.corpus import Corpus
+from ...model.state import State
+from ..fixtures import anzu, belsunu, sample_corpus, tiny_corpus
+
+
+def labels(nodes):
+    return [node.label for node in nodes]
+
+
+def test_select():
+    atf = AtfFile(belsunu())
+    assert [surface.objecttype for surface in
+            select('text/tablet/surface', atf)] == [u'obverse', u'reverse']
+    assert labels(select(u"text[project='cams/gkab']/object/obverse/"
+                         u"line[label='1' or label='2']", atf)) == \
+        [u'1', u'2']
+    assert select(u"text[project='saao/saa10']//line", atf) == []
+    assert labels(select(u"//line[word='ALLA' and label='8']", atf)) == \
+        [u'8']
+    assert labels(select(u"text//line[lemma~'^ina\\[']", atf)) == \
+        [u'3', u'4', u'5', u'6', u'7', u'8']
+    assert len(select('//translation//line', atf)) == 8
+    assert all(isinstance(node, State) for node in select('//state', atf))
+    # A composite's texts are at the top
+    assert [text.code for text in select('text', AtfFile(anzu()))] == \
+        [u'X002001', u'Q002770', u'Q002771']
+
+
+@pytest.mark.parametrize('query', ['', 'text/', 'text[', "text[code='x'",
+                                   'tablets', 'line[lemma=]', 'line x'])
+def test_bad_query(query):
+    with pytest.raises(ValueError):
+        Query(query)
+
+
+def test_search():
+    """
+    Searching with an index parses fewer texts and finds the same lines
+    """
+    corpus = Corpus(source=sample_corpus(), lazy=True)
+    query = Query(u"//line[lemma='šarru[king]N']")
+    scanned = [(text.code, line.label)
+               for text, line in query.search(corpus)]
+    index = WordIndex()
+    codes = set(code for code, _ in scanned)
+    for code in codes:
+        index.add(corpus.get(code))
+    assert query.codes(index) == codes
+    assert [(text.code, line.label)
+            for text, line in query.search(corpus, index)] == scanned
+    assert len(scanned) == 156
+    assert Query('//line').codes(index) is None
+
+
+def test_search_translations():
+    """
+    Words of translations are not in the index, so it is not used for them
+    """
+    corpus = Corpus(source=tiny_corpus(), lazy=True)
+    index = WordIndex()
+    index.add(corpus.get(u'X001001'))
+    query = Query(u"//translation//line[word='Mars was in the Crab.']")
+    assert query.codes(index) is None
+    assert len(list(query.search(corpus, index))) == 1
+    assert Query(u"//line[word='Mars was in the Crab.']").codes(index) is None
+    # Lemmas are only on transliteration lines
+    assert Query(u"//line[lemma='none']").codes(index) == set()
+    assert Query(u"text/tablet/obverse/line[word='none']").codes(index) == \
+        set()
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+'''
+Copyright 2015, 2016 University College London.
+
+This file is part of PyORACC.
+
+PyORACC is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyORACC is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyORACC. If not, see <http://www.gnu.org/licenses/>.
+'''
+
+
+from ...atf.atffile import AtfFile
+from ...index.signs import SignIndex, matches, parse_query, signs
+from ..fixtures import anzu, belsunu
+
+
+def test_signs():
+    assert signs(u'[{m}]{d}60--EN-šu₂-nu') == \
+        [u'm', u'd', u'60', u'en', u'šu₂', u'nu']
+    assert signs(u'MAŠ₂!(BAR)') == [u'maš₂']
+    assert signs(u'[(ina)]') == [u'ina']
+    assert signs(u'MIN<(MAŠ₂)>') == [u'min', u'maš₂']
+
+
+def test_matches():
+    sequence = [u'a', u'na', u'd', u'utu']
+    assert matches(parse_query(u'na {d}UTU'), sequence)
+    assert matches(parse_query(u'a-* {d}'), sequence)
+    assert matches(parse_query(u'/n./ d'), sequence)
+    assert not matches(parse_query(u'a d'), sequence)
+    assert not matches(parse_query(u'utu a'), sequence)
+
+
+def labels(hits):
+    return [(hit.code, hit.label) for hit in hits]
+
+
+def test_search():
+    index = SignIndex()
+    index.add(AtfFile(belsunu()).text)
+    index.add(AtfFile(anzu()).text)
+    assert labels(index.search(u'ina ALLA')) == [(u'X001001', u'8')]
+    assert labels(index.search(u'a-lid')) == [(u'X001001', u'2'),
+                                              (u'X001001', u'6')]
+    assert labels(index.search(u'{d}60-en')) == [(u'X001001', u'2')]
+    assert labels(index.search(u'šu* nu')) == [(u'X001001', u'2')]
+    assert labels(index.search(u'/šu[₂₃]/-nu')) == [(u'X001001', u'2')]
+    assert labels(index.search(u'* ALLA')) == [(u'X001001', u'8')]
+    assert index.search(u'ALLA ina') == []
+    assert index.search(u'nothing') == []
+    index.remove(u'X001001')
+    assert index.search(u'ina ALLA') == []
@@ -0,0 +1,70 @@
+'''
+Copyright 2015, 2016 University College London.
+
+This file is part of PyORACC.
+
+PyORACC is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyORACC is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyORACC. If not, see <http://www.gnu.org/licenses/>.
+'''
+
+
+import os
+import tempfile
+
+from ...atf.atffile import AtfFile
+from ...index.words import Hit, LEMMA, WordIndex
+from ..fixtures import anzu, belsunu
+
+
+def belsunu_line(label):
+    return Hit(u'X001001', u'tablet', u'obverse', label)
+
+
+def test_queries():
+    index = WordIndex()
+    index.add(AtfFile(belsunu()).text)
+    index.add(AtfFile(anzu()).text)
+    assert index.find(u'ina')[:3] == [belsunu_line(u'5'), belsunu_line(u'7'),
+                                      belsunu_line(u'8')]
+    assert index.find(u'ina')[-1].code == u'Q002771'
+    assert index.find(u'nothing') == []
+    assert index.any_of([u'a-lid', u'9.30', u'nothing']) == \
+        [belsunu_line(u'2'), belsunu_line(u'3'), belsunu_line(u'6')]
+    assert index.all_of([u'ina', u'GENNA']) == [belsunu_line(u'7')]
+    assert index.all_of([u'ina', u'nothing']) == []
+    assert index.phrase([u'ina', u'ALLA']) == [belsunu_line(u'8')]
+    assert index.phrase([u'ALLA', u'ina']) == []
+    assert index.phrase([(LEMMA, u'ina[in]PRP'), u'ALLA']) == \
+        [belsunu_line(u'8')]
+
+
+def test_incremental():
+    """
+    Indexing a text again replaces it, and the index persists on disk
+    """
+    handle, filename = tempfile.mkstemp()
+    os.close(handle)
+    try:
+        index = WordIndex(filename)
+        index.add(AtfFile(belsunu()).text)
+        index.add(AtfFile(belsunu().replace(u'a-lid', u'a-li-id')).text)
+        index.close()
+        index = WordIndex(filename)
+        assert index.find(u'a-lid') == []
+        assert index.find(u'a-li-id') == [belsunu_line(u'2'),
+                                          belsunu_line(u'6')]
+        index.remove(u'X001001')
+        assert index.find(u'a-li-id') == []
+        index.close()
+    finally:
+        os.remove(filename)
@@ -25,10 +25,7 @@ from ...model.corpus import Corpus
 from ..fixtures import tiny_corpus, sample_corpus, whole_corpus
 
 
-slow = pytest.mark.skipif(
-    not pytest.config.getoption("--runslow"),
-    reason="need --runslow option to run"
-)
+slow = pytest.mark.slow
 
 
 def test_tiny():
@@ -37,6 +34,16 @@ def test_tiny():
     assert corpus.failures == 1
 
 
+def test_get():
+    corpus = Corpus(source=sample_corpus(), lazy=True)
+    assert corpus.texts == []
+    text = corpus.get('Q002770')
+    assert text.code == 'Q002770'
+    assert text.description == 'SB Anzu 2'
+    with pytest.raises(KeyError):
+        corpus.get('X999999')
+
+
 @slow
 def test_sample():
     corpus = Corpus(source=sample_corpus())
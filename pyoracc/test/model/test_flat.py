@@ -0,0 +1,132 @@
+'''
+Copyright 2015, 2016 University College London.
+
+This file is part of PyORACC.
+
+PyORACC is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyORACC is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyORACC. If not, see <http://www.gnu.org/licenses/>.
+'''
+
+
+import copy
+import pickle
+
+import pytest
+
+from ...atf.atffile import AtfFile
+from ...benchmark import _node_by_node, copyreg
+from ...export import jsonl
+from ...model.composite import Composite
+from ...model.flat import flatten, unflatten
+from ...model.layout import VERSION
+from ...model.line import Line
+from ...model.span import Span
+from ...model.text import Text
+from ..fixtures import anzu, belsunu
+from .test_labels import labelled
+
+
+@pytest.mark.parametrize('content', [belsunu(), anzu(), labelled])
+def test_pickle(content):
+    text = AtfFile(content, spans=True).text
+    for protocol in range(2, pickle.HIGHEST_PROTOCOL + 1):
+        loaded = pickle.loads(pickle.dumps(text, protocol))
+        assert type(loaded) is type(text)
+        assert jsonl.dumps(loaded) == jsonl.dumps(text)
+
+
+def test_flatten():
+    text = AtfFile(belsunu(), spans=True).text
+    version, flat = flatten(text)
+    assert version == VERSION
+    # Nothing but tuples, lists and plain values
+    assert pickle.loads(pickle.dumps(flat)) == flat
+    loaded = unflatten((version, flat))
+    line = loaded.children[0].children[0].children[0]
+    assert type(line.span) is Span
+    assert line.words == text.children[0].children[0].children[0].words
+
+
+def test_shared_strings():
+    text = Text()
+    text.children = [Line(u'1'), Line(u'2')]
+    text.children[0].words = [u''.join([u'a', u'na'])]
+    text.children[1].words = [u''.join([u'an', u'a'])]
+    assert text.children[0].words[0] is not text.children[1].words[0]
+    version, flat = flatten(text)
+    first, second = [line[2][0] for line in flat[-2][1:]]
+    # Equal strings are one object, which pickle writes once
+    assert first is second
+
+
+def test_size():
+    text = AtfFile(anzu()).text
+    flat = len(pickle.dumps(text, 2))
+    copyreg.dispatch_table[Composite] = _node_by_node
+    copyreg.dispatch_table[Text] = _node_by_node
+    try:
+        assert flat < len(pickle.dumps(text, 2))
+    finally:
+        del copyreg.dispatch_table[Composite]
+        del copyreg.dispatch_table[Text]
+
+
+def test_values():
+    text = Text()
+    text.links = [(u'a', 1), {u'b': [Text()]}, {None: u'c'}]
+    loaded = pickle.loads(pickle.dumps(text))
+    assert loaded.links[0] == (u'a', 1)
+    assert type(loaded.links[1][u'b'][0]) is Text
+    assert loaded.links[2] == {None: u'c'}
+
+
+def test_copy():
+    composite = AtfFile(anzu()).text
+    copied = copy.deepcopy(composite)
+    assert type(copied) is Composite
+    assert copied.texts[0] is not composite.texts[0]
+    assert jsonl.dumps(copied) == jsonl.dumps(composite)
+
+
+def test_shallow_copy():
+    composite = AtfFile(anzu()).text
+    copied = copy.copy(composite)
+    assert type(copied) is Composite
+    assert copied is not composite
+    assert copied.texts is composite.texts
+    text = composite.texts[0]
+    assert copy.copy(text).children is text.children
+
+
+def test_extra():
+    """
+    Attributes beyond the fields are kept, except for caches
+    """
+    text = AtfFile(belsunu()).text
+    text.labels()
+    text.checked = True
+    line = text.children[0].children[0].children[0]
+    line.parallel = [Line(u'1')]
+    loaded = pickle.loads(pickle.dumps(text))
+    assert loaded.checked is True
+    line = loaded.children[0].children[0].children[0]
+    assert type(line.parallel[0]) is Line
+    assert line.parallel[0].label == u'1'
+    assert '_labels' not in vars(loaded)
+    assert loaded.line(u'o 1') is line
+
+
+def test_version():
+    version, flat = flatten(AtfFile(belsunu()).text)
+    with pytest.raises(ValueError):
+        unflatten((version + 1, flat))
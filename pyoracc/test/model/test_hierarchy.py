@@ -0,0 +1,75 @@
+'''
+Copyright 2015, 2016 University College London.
+
+This file is part of PyORACC.
+
+PyORACC is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyORACC is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyORACC. If not, see <http://www.gnu.org/licenses/>.
+'''
+
+
+import pickle
+
+import pytest
+
+from ...atf.atffile import AtfFile
+from ...index.query import select
+from ...model.hierarchy import (ancestors, context, id_map, link_parents,
+                                node_id, parent)
+from ...model.line import Line
+from ...model.visitor import walk
+from ..fixtures import anzu, belsunu
+
+
+def test_parents():
+    text = link_parents(AtfFile(belsunu()).text)
+    line = select(u"//line[label='3']", text)[0]
+    assert [node_id(node) for node in ancestors(line)] == \
+        [u'X001001', u'X001001.tablet', u'X001001.tablet.obverse']
+    found, obj, surface = context(line)
+    assert found is text
+    assert (obj.objecttype, surface.objecttype) == (u'tablet', u'obverse')
+    assert parent(text) is None
+    # Links do not stop a tree being pickled
+    assert pickle.loads(pickle.dumps(text)).code == u'X001001'
+
+
+def test_ids():
+    text = link_parents(AtfFile(belsunu()).text)
+    ids = id_map(text)
+    assert len(ids) == len(list(walk(text)))
+    line = ids[u'X001001.tablet.obverse.3']
+    assert isinstance(line, Line) and line.label == u'3'
+    assert node_id(line.notes[0]) == u'X001001.tablet.obverse.3.note1'
+    assert u'X001001.tablet.obverse.ruling1' in ids
+    assert u'X001001.tablet.translation1.obverse.8' in ids
+
+
+def test_composite_ids():
+    """Texts of a composite are named by code; repeated names get a number"""
+    composite = link_parents(AtfFile(anzu()).text)
+    ids = id_map(composite)
+    assert len(ids) == len(list(walk(composite))) - 1
+    assert u'Q002770.tablet.obverse' in ids
+    assert u'Q002770.tablet.obverse~2' in ids
+
+
+def test_stale():
+    text = link_parents(AtfFile(belsunu()).text)
+    line = text.children[0].children[0].children[0]
+    text.children[0].children[0].children.remove(line)
+    with pytest.raises(ValueError):
+        node_id(line)
+    text.children[0].children[0].children.insert(0, line)
+    link_parents(text)
+    assert node_id(line) == u'X001001.tablet.obverse.1'
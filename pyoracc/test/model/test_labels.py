@@ -0,0 +1,114 @@
+'''
+Copyright 2015, 2016 University College London.
+
+This file is part of PyORACC.
+
+PyORACC is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyORACC is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyORACC. If not, see <http://www.gnu.org/licenses/>.
+'''
+
+
+from ...atf.atffile import AtfFile
+from ...index.query import select
+from ...model.line import Line
+
+
+labelled = u"""&X001001 = Test
+#project: test
+#atf: lang akk
+@tablet
+@obverse
+@column 1
+1. a
+2. b
+@column 2
+1. c
+@reverse
+1'. d
+2'. e
+3'. f
+@bottom
+1. g
+@translation labeled en project
+@label o i 1
+One
+@(o ii 1) Three
+@(r 1' - 3') Four to six
+@(e. 1) Seven
+@(2) Nothing
+@end translation
+"""
+
+
+def words(lines):
+    return [line.words[0] for line in lines]
+
+
+def test_lookup():
+    text = AtfFile(labelled).text
+    assert text.line(u'o i 2').words == [u'b']
+    assert text.line([u'r', u"2'"]).words == [u'e']
+    assert text.line(u'b.e. 1') is text.line(u'e. 1')
+    assert text.line(u'r 1') is None
+    references = [line.label
+                  for line in select('//translation//line', text)]
+    index = text.labels()
+    assert [words(index.reference(reference))
+            for reference in references] == \
+        [[u'a'], [u'c'], [u'd', u'e', u'f'], [u'g'], []]
+    assert index.range(u"r 3'", u"r 1'") == []
+
+
+def test_invalidation():
+    text = AtfFile(labelled).text
+    index = text.labels()
+    assert text.labels() is index
+    reverse = select('text/tablet/reverse', text)[0]
+    line = Line(u"4'")
+    line.words.append(u'h')
+    reverse.children.append(line)
+    assert text.line(u"r 4'") is line
+    assert text.labels() is not index
+    # Relabelling a line is noticed when it is looked up
+    line.label = u"5'"
+    assert text.line(u"r 4'") is None
+    assert text.line(u"r 5'") is line
+
+
+def test_replacement():
+    text = AtfFile(labelled).text
+    reverse = select('text/tablet/reverse', text)[0]
+    old = text.line(u"r 1'")
+    # A line replaced in place, with the same label
+    line = reverse.children[0] = Line(u"1'")
+    assert text.line(u"r 1'") is line
+    assert text.line(u"r 1'") is not old
+    # A surface replaced in place, with lines of the same labels
+    bottom = select('text/tablet/bottom', text)[0]
+    tablet = select('text/tablet', text)[0]
+    copy = type(bottom)(u'bottom')
+    copy.children = [Line(u'1')]
+    tablet.children[tablet.children.index(bottom)] = copy
+    assert text.line(u'b.e. 1') is copy.children[0]
+
+
+def test_new_label():
+    text = AtfFile(labelled).text
+    reverse = select('text/tablet/reverse', text)[0]
+    text.labels()
+    # Only the new labels are looked up
+    reverse.children[1].label = u"9'"
+    assert text.line(u"r 9'") is reverse.children[1]
+    line = reverse.children[0] = Line(u"7'")
+    assert text.line(u"r 7'") is line
+    assert text.line(u"r 8'") is None
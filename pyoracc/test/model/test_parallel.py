@@ -0,0 +1,239 @@
+'''
+Copyright 2015, 2016 University College London.
+
+This file is part of PyORACC.
+
+PyORACC is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyORACC is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyORACC. If not, see <http://www.gnu.org/licenses/>.
+'''
+
+
+import os
+import signal
+import time
+
+import pytest
+
+from ...export import jsonl
+from ...model import corpus
+from ...model.corpus import (RunStats, SharedTexts, atf_paths, iter_corpus,
+                             schedule)
+from ..fixtures import sample_corpus, tiny_corpus
+
+
+shared_memory = pytest.mark.skipif(corpus.shared_memory is None,
+                                   reason="needs multiprocessing."
+                                          "shared_memory")
+
+
+def _slow(text):
+    time.sleep(10)
+
+
+def _greedy(text):
+    return len(bytearray(2 ** 29))
+
+
+def _worker(text):
+    return os.getpid()
+
+
+def _unsendable(text):
+    return lambda: None
+
+
+def _large(text):
+    return b'x' * 2 ** 27
+
+
+def _killed(text):
+    os.kill(os.getpid(), signal.SIGKILL)
+
+
+def _encoded(results):
+    return [(path, [jsonl.dumps(text) for text in texts], error)
+            for path, texts, error in results]
+
+
+@shared_memory
+def test_shared():
+    results = list(iter_corpus(tiny_corpus(), processes=2, shared=True))
+    assert [type(texts) for _, texts, _ in results] == [list, SharedTexts]
+    texts = results[1][1]
+    assert len(texts) == 1
+    # Nothing is decoded until it is used
+    assert texts.texts == [None]
+    assert texts[-1] is texts[0]
+    assert texts[0].code == u'X001001'
+    texts.close()
+    with pytest.raises(OSError):
+        corpus.shared_memory.SharedMemory(texts.segment.name)
+
+
+@shared_memory
+def test_shared_matches_pipe():
+    assert _encoded(iter_corpus(sample_corpus(), processes=2, shared=True)) \
+        == _encoded(iter_corpus(sample_corpus(), processes=2))
+
+
+@shared_memory
+@pytest.mark.skipif(not os.path.isdir('/dev/shm'),
+                    reason="needs to see the shared memory segments")
+def test_shared_stopped():
+    # Stopping early frees the texts not handed on
+    before = set(os.listdir('/dev/shm'))
+    results = iter_corpus(sample_corpus(), processes=2, shared=True)
+    path, texts, error = next(results)
+    results.close()
+    assert set(os.listdir('/dev/shm')) - before == \
+        set([texts.segment.name.lstrip('/')])
+    # but not those which were
+    assert texts[0].code
+    texts.close()
+    assert set(os.listdir('/dev/shm')) == before
+
+
+@shared_memory
+def test_shared_once(tmpdir, monkeypatch):
+    # Each file is parsed once: none of the batches fail and are tried again
+    calls = tmpdir.join('calls')
+    parse_file = corpus.parse_file
+
+    def counted(task):
+        with open(str(calls), 'a') as log:
+            log.write(task[0] + '\n')
+        return parse_file(task)
+    monkeypatch.setattr(corpus, 'parse_file', counted)
+    results = list(iter_corpus(sample_corpus(), processes=2, shared=True))
+    assert all(error is None or 'parse' in error for _, _, error in results)
+    assert sorted(calls.read().split('\n')[:-1]) == \
+        sorted(atf_paths(sample_corpus()))
+
+
+def test_shared_needs_texts():
+    with pytest.raises(ValueError):
+        list(iter_corpus(tiny_corpus(), jsonl.dumps, shared=True))
+
+
+def test_schedule(tmpdir):
+    sizes = [5000, 3000] + [10] * 40
+    paths = []
+    for number, size in enumerate(sizes):
+        path = tmpdir.join('{}.atf'.format(number))
+        path.write('x' * size)
+        paths.append(str(path))
+    batches = schedule(paths, 2)
+    assert sorted(path for batch in batches for path in batch) == \
+        sorted(paths)
+    # Largest first, each alone, then the rest grouped
+    assert batches[:2] == [[paths[0]], [paths[1]]]
+    assert len(batches[2]) > 1
+    # Later batches are no larger than earlier ones
+    totals = [sum(sizes[paths.index(path)] for path in batch)
+              for batch in batches]
+    assert totals[2:] == sorted(totals[2:], reverse=True)
+
+
+def test_in_order():
+    stats = RunStats()
+    parallel = _encoded(iter_corpus(sample_corpus(), processes=2,
+                                    stats=stats))
+    assert [path for path, _, _ in parallel] == atf_paths(sample_corpus())
+    assert parallel == _encoded(iter_corpus(sample_corpus(), processes=1))
+    assert sorted(stats.times) == atf_paths(sample_corpus())
+    assert 0 < len(stats.busy) <= 2
+    assert all(0 < part <= 1 for part in stats.utilisation().values())
+
+
+def test_streamed():
+    stats = RunStats()
+    results = iter_corpus(sample_corpus(), processes=2, stats=stats)
+    path, _, _ = next(results)
+    assert path == atf_paths(sample_corpus())[0]
+    # The first result comes before the rest are parsed
+    assert len(stats.times) < len(atf_paths(sample_corpus()))
+    results.close()
+
+
+def test_unordered():
+    results = _encoded(iter_corpus(sample_corpus(), processes=2,
+                                   ordered=False))
+    serial = _encoded(iter_corpus(sample_corpus(), processes=1))
+    assert len(results) == len(serial)
+    assert sorted(results) == sorted(serial)
+
+
+def test_timeout():
+    stats = RunStats()
+    start = time.time()
+    results = list(iter_corpus(tiny_corpus(), _slow, processes=1,
+                               stats=stats, timeout=0.5))
+    assert time.time() - start < 5
+    # A file which fails to parse has no texts to be slow with
+    assert results[0][2].startswith(u'PyOracc could not parse')
+    path, texts, error = results[1]
+    assert texts == []
+    assert error.startswith(u'Timed out after 0.5')
+    assert 0.5 <= stats.times[path] < 5
+
+
+@pytest.mark.skipif(not os.path.exists('/proc/self/statm'),
+                    reason="needs the size of this process")
+def test_memory():
+    # Allow for the size of this process, which the workers start as
+    with open('/proc/self/statm') as statm:
+        size = int(statm.read().split()[0]) * os.sysconf('SC_PAGE_SIZE')
+    results = list(iter_corpus(tiny_corpus(), _greedy, processes=1,
+                               memory=size + 2 ** 28))
+    assert results[1][2].startswith(u'Ran out of memory')
+    results = list(iter_corpus(tiny_corpus(), _greedy, processes=1,
+                               memory=size + 2 ** 30))
+    assert results[1][1:] == ([2 ** 29], None)
+    # Room for the result, but not for it to be sent as well
+    results = list(iter_corpus(tiny_corpus(), _large, processes=1,
+                               memory=size + 2 ** 27 + 2 ** 26))
+    assert results[1][2].startswith(u'Ran out of memory')
+
+
+def test_unsendable():
+    # The batch fails as a whole, then the file on its own
+    results = list(iter_corpus(tiny_corpus(), _unsendable, processes=2))
+    assert results[1][0].endswith('belsunu.atf')
+    assert results[1][2].startswith(u'Failed in a worker')
+
+
+def test_lost(monkeypatch):
+    monkeypatch.setattr(corpus, 'GRACE', 0.5)
+    start = time.time()
+    results = list(iter_corpus(tiny_corpus(), _killed, processes=1,
+                               timeout=0.5))
+    assert time.time() - start < 10
+    assert results[1][2].startswith(u'Worker lost after')
+
+
+def test_recycle():
+    results = list(iter_corpus(sample_corpus(), _worker, processes=2,
+                               recycle=1))
+    workers = [texts[0] for _, texts, _ in results if texts]
+    assert len(set(workers)) == len(workers)
+    assert [path for path, _, _ in results] == atf_paths(sample_corpus())
+
+
+def test_retry(tmpdir):
+    # The files after one which went over a limit are parsed after all
+    for name in ['a', 'b', 'c']:
+        tmpdir.join(name + '.atf').write(u'&X001001 = Test\n' if name == 'a'
+                                         else u'')
+    results = list(iter_corpus(str(tmpdir), _slow, processes=1,
+                               timeout=0.2))
+    assert [error is None for _, _, error in results] == [False, True, True]
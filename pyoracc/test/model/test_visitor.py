@@ -0,0 +1,106 @@
+'''
+Copyright 2015, 2016 University College London.
+
+This file is part of PyORACC.
+
+PyORACC is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyORACC is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyORACC. If not, see <http://www.gnu.org/licenses/>.
+'''
+
+
+from ...atf.atffile import AtfFile
+from ...model.line import Line
+from ...model.oraccnamedobject import OraccNamedObject
+from ...model.oraccobject import OraccObject
+from ...model.translation import Translation
+from ...model.visitor import SKIP, Visitor, walk
+from ..fixtures import belsunu
+
+
+def test_walk():
+    text = AtfFile(belsunu()).text
+    nodes = list(walk(text))
+    assert nodes[0] is text
+    assert [node.objecttype for node in nodes
+            if isinstance(node, OraccObject)][:3] == \
+        [u'tablet', u'obverse', u'reverse']
+    ancestors = []
+    for node in walk(text, ancestors=ancestors):
+        if isinstance(node, Line):
+            assert ancestors[0] is text
+            assert ancestors[-1].children.count(node) == 1
+    # Pruning leaves out translations
+    lines = [node for node in walk(text, lambda node:
+                                   isinstance(node, Translation))
+             if isinstance(node, Line)]
+    assert len(lines) == len([node for node in nodes
+                              if isinstance(node, Line)]) - 8
+
+
+def test_deep():
+    """Walking does not recurse, so depth is not limited"""
+    root = node = OraccObject(u'tablet')
+    for _ in range(5000):
+        node.children.append(OraccObject(u'tablet'))
+        node = node.children[0]
+    assert len(list(walk(root))) == 5001
+
+
+class Outline(Visitor):
+    def __init__(self):
+        self.visited = []
+
+    def visit_text(self, text):
+        self.visited.append(text.code)
+
+    def visit_oraccobject(self, obj):
+        self.visited.append(obj.objecttype)
+        if obj.objecttype == u'obverse':
+            return SKIP
+
+    def visit_translation(self, translation):
+        return SKIP
+
+    def generic_visit(self, node):
+        self.visited.append(type(node).__name__)
+
+
+def test_visitor():
+    outline = Outline()
+    outline.visit(AtfFile(belsunu()).text)
+    visited = outline.visited
+    # The lines of the obverse and the translation are skipped
+    assert visited == [u'X001001', u'tablet', u'obverse', u'reverse', 'State']
+    # Named objects go to the method for their base class
+    outline = Outline()
+    outline.visit(OraccNamedObject(u'column', u'1'))
+    assert outline.visited == [u'column']
+
+
+class LineCounter(Visitor):
+    lines = 0
+
+    def visit_line(self, line):
+        self.lines += 1
+
+
+def test_default_visit():
+    """
+    Nodes with no method of their own, and no generic_visit, are passed over
+    """
+    text = AtfFile(belsunu()).text
+    counter = LineCounter()
+    counter.visit(text)
+    assert counter.lines == \
+        sum(1 for node in walk(text) if isinstance(node, Line))
+    assert counter.lines > 0
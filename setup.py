@@ -42,12 +42,18 @@ setup(name='pyoracc',
       download_url='https://github.com/ucl/pyoracc/archive/master.tar.gz',
       packages=['pyoracc',
                 'pyoracc/atf',
+                'pyoracc/export',
+                'pyoracc/index',
                 'pyoracc/model',
                 'pyoracc/test',
                 'pyoracc/test/atf',
+                'pyoracc/test/export',
+                'pyoracc/test/index',
+                'pyoracc/test/model',
                 'pyoracc/test/fixtures'],
       install_requires=['mako', 'ply'],
       setup_requires=['mako', 'ply'],
+      extras_require={'arrow': ['pyarrow']},
       package_data={'pyoracc': ['test/fixtures/*/*.atf']},
       zip_safe=False,
       cmdclass=dict(build_py=MyBuildPy)